@@ -12,23 +12,36 @@ setup(name='tap-activecampaign',
           'backoff==1.8.0',
           'requests==2.23.0',
           'pyhumps==1.3.1',
+          'simplejson==3.11.1',
           'singer-python==5.12.2'
       ],
       entry_points='''
           [console_scripts]
           tap-activecampaign=tap_activecampaign:main
+          tap-activecampaign-index=tap_activecampaign.changeindex:main
       ''',
       packages=find_packages(),
       package_data={
           'tap_activecampaign': [
               'schemas/*.json',
+              'schemas.bundle.json',
               'tests/*.py'
           ]
       },
       extras_require={
+          'async': [
+              'aiohttp',
+          ],
           'dev': [
               'ipdb',
           ],
+          'fast': [
+              'brotli',
+              'orjson',
+          ],
+          'http2': [
+              'httpx[http2]',
+          ],
           'test': [
               'pylint',
               'nose',
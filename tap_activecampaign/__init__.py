@@ -3,9 +3,7 @@ import json
 import argparse
 import singer
 from singer import metadata, utils
-from tap_activecampaign.client import ActiveCampaignClient
-from tap_activecampaign.discover import discover
-from tap_activecampaign.sync import sync
+from tap_activecampaign import codec
 
 LOGGER = singer.get_logger()
 
@@ -17,6 +15,8 @@ REQUIRED_CONFIG_KEYS = [
 ]
 
 def do_discover():
+    # Discovery needs no credentials nor network access: the schemas are read from the bundle
+    from tap_activecampaign.discover import discover
 
     LOGGER.info('Starting discover')
     catalog = discover()
@@ -27,24 +27,53 @@ def do_discover():
 @singer.utils.handle_top_exception(LOGGER)
 def main():
 
-    parsed_args = singer.utils.parse_args(REQUIRED_CONFIG_KEYS)
+    # The credentials are only required to sync
+    parsed_args = singer.utils.parse_args([])
+    codec.configure(parsed_args.config.get('json_codec'))
+
+    if parsed_args.discover:
+        do_discover()
+        return
+
+    singer.utils.check_config(parsed_args.config, REQUIRED_CONFIG_KEYS)
+
+    # Imported here so that discovery does not import the client and sync modules
+    from tap_activecampaign.client import ActiveCampaignClient, get_pool_size
+    from tap_activecampaign.sync import sync
+    from tap_activecampaign import changeindex, writer
 
     with ActiveCampaignClient(parsed_args.config['api_url'],
                               parsed_args.config['api_token'],
                               parsed_args.config['user_agent'],
-                              parsed_args.config.get('request_timeout')) as client:
+                              parsed_args.config.get('request_timeout'),
+                              parsed_args.config.get('requests_per_second'),
+                              parsed_args.config.get('burst'),
+                              get_pool_size(parsed_args.config),
+                              parsed_args.config.get('http_transport')) as client:
 
         state = {}
         if parsed_args.state:
             state = parsed_args.state
 
-        if parsed_args.discover:
-            do_discover()
-        elif parsed_args.catalog:
-            sync(client=client,
-                 config=parsed_args.config,
-                 catalog=parsed_args.catalog,
-                 state=state)
+        if parsed_args.catalog:
+            # Messages are written on an output thread; stop() writes the queued ones before exit
+            writer.start(parsed_args.config.get('output_queue_size'))
+            changeindex.open_index(parsed_args.config.get('change_index_path'))
+            try:
+                sync(client=client,
+                     config=parsed_args.config,
+                     catalog=parsed_args.catalog,
+                     state=state)
+            except BaseException:
+                # The error of the sync is the one reported; the output thread already logged its own
+                writer.stop(raise_error=False)
+                changeindex.close_index()
+                raise
+            # The change index stores the hashes of the records delivered until the last STATE message
+            try:
+                writer.stop()
+            finally:
+                changeindex.close_index()
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,167 @@
+import argparse
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import singer
+from tap_activecampaign import writer
+
+LOGGER = singer.get_logger()
+
+# Keys looked up per query, below SQLite's limit of bound parameters
+LOOKUP_BATCH_SIZE = 500
+
+# Rows waiting for a STATE message before the stream writes one, so that a stream writing
+#  no STATE for a while (e.g. FULL_TABLE) does not hold the rows of every page in memory
+MAX_UNDELIVERED_ROWS = 10000
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS record_hashes (
+    stream TEXT NOT NULL,
+    key TEXT NOT NULL,
+    hash BLOB NOT NULL,
+    seen_at INTEGER NOT NULL,
+    PRIMARY KEY (stream, key)
+) WITHOUT ROWID
+'''
+
+
+def hash_record(record):
+    """ Compact hash of a transformed record, independent of the key order """
+    content = json.dumps(record, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.blake2b(content.encode('utf-8'), digest_size=16).digest()
+
+
+def get_record_key(record, key_properties):
+    return json.dumps([record.get(key) for key in key_properties], default=str)
+
+
+class ChangeIndex(object):
+    """
+    SQLite index of the hash of each record written, by stream and primary key, so that a
+    record is only written again when it changed. Records are looked up one page at a time,
+    and stored once delivered; at most about MAX_UNDELIVERED_ROWS rows wait in memory.
+    Every record seen is stamped with the time of the run, so `compact` can remove the
+    records that were not seen for a while (e.g. deleted in ActiveCampaign).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.run_at = int(time.time())
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute(SCHEMA)
+        self.connection.commit()
+        # Streams syncing on worker threads share the connection
+        self.lock = threading.Lock()
+
+    def get_hashes(self, stream_name, keys):
+        """ Return {key: hash} of the keys that are in the index """
+        hashes = {}
+        for start in range(0, len(keys), LOOKUP_BATCH_SIZE):
+            batch = keys[start:start + LOOKUP_BATCH_SIZE]
+            query = 'SELECT key, hash FROM record_hashes WHERE stream = ? AND key IN ({})'.format(
+                ','.join('?' * len(batch)))
+            with self.lock:
+                hashes.update(self.connection.execute(query, [stream_name] + batch).fetchall())
+        return hashes
+
+    def filter_changed(self, stream_name, records, key_properties):
+        """
+        Return the indexes in `records` of the new or changed records of a page, and the
+        rows to `save` once the records are written
+        """
+        keys = [get_record_key(record, key_properties) for record in records]
+        hashes = [hash_record(record) for record in records]
+        previous_hashes = self.get_hashes(stream_name, list(set(keys)))
+        changed = [index for index, (key, record_hash) in enumerate(zip(keys, hashes))
+                   if previous_hashes.get(key) != record_hash]
+        rows = [(stream_name, key, record_hash, self.run_at) for key, record_hash in zip(keys, hashes)]
+        return changed, rows
+
+    def save(self, rows):
+        """ Store the hashes of a page, and stamp its unchanged records as seen """
+        with self.lock:
+            if self.connection is None:
+                # Closed before the records were delivered: they are written again on the next run
+                return
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO record_hashes (stream, key, hash, seen_at) VALUES (?, ?, ?, ?)', rows)
+            self.connection.commit()
+
+    def save_when_delivered(self, rows):
+        """
+        Store the hashes of a page once its records are delivered, i.e. once the STATE message
+        that follows them has been flushed to the target, like the bookmarks. A record lost on
+        the way (failed output, killed tap) is therefore written again on the next run.
+        """
+        writer.after_state(lambda: self.save(rows), size=len(rows))
+
+    def is_delivery_due(self):
+        """ Return True if a STATE message should be written to store the rows waiting for one """
+        return writer.get_pending_size() >= MAX_UNDELIVERED_ROWS
+
+    def compact(self, max_age_days=None, stream_name=None):
+        """
+        Remove the records not seen for `max_age_days` days (or every record of `stream_name`)
+        and reclaim the space. Return the number of records removed.
+        """
+        with self.lock:
+            conditions = []
+            params = []
+            if max_age_days is not None:
+                conditions.append('seen_at < ?')
+                params.append(int(time.time() - max_age_days * 86400))
+            if stream_name:
+                conditions.append('stream = ?')
+                params.append(stream_name)
+            removed = 0
+            if conditions:
+                removed = self.connection.execute(
+                    'DELETE FROM record_hashes WHERE {}'.format(' AND '.join(conditions)), params).rowcount
+            self.connection.commit()
+            self.connection.execute('VACUUM')
+        return removed
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+            self.connection = None
+
+
+INDEX = None
+
+
+def open_index(path):
+    """ Open the change index used by every stream, if a path is configured """
+    global INDEX
+    if path and INDEX is None:
+        INDEX = ChangeIndex(path)
+        LOGGER.info('Writing only new or changed records, using the change index {}'.format(path))
+    return INDEX
+
+
+def close_index():
+    global INDEX
+    if INDEX:
+        INDEX.close()
+        INDEX = None
+
+
+def main():
+    """ tap-activecampaign-index: compact the change index """
+    parser = argparse.ArgumentParser(description='Compact the change index of tap-activecampaign')
+    parser.add_argument('index', help='Path of the change index (config change_index_path)')
+    parser.add_argument('--max-age-days', type=float,
+                        help='Remove the records not seen for this many days, e.g. deleted records')
+    parser.add_argument('--stream', help='Only remove records of this stream (all of them without --max-age-days)')
+    args = parser.parse_args()
+
+    index = ChangeIndex(args.index)
+    try:
+        removed = index.compact(args.max_age_days, args.stream)
+    finally:
+        index.close()
+    LOGGER.info('Removed {} records from {}'.format(removed, args.index))
@@ -1,44 +1,54 @@
+import asyncio
+import socket
+import threading
 import backoff
 import requests
-from singer import metrics, utils
+import urllib3
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from singer import metrics
 import singer
+from tap_activecampaign import codec, timing
+from tap_activecampaign.ratelimit import TokenBucket, DEFAULT_REQUESTS_PER_SECOND, DEFAULT_BURST
+from tap_activecampaign.jsonstream import PageParser, TruncatedPageError, CHUNK_SIZE
+from tap_activecampaign.errors import Server5xxError, Server429Error, ActiveCampaignError, \
+    ActiveCampaignBadRequestError, ActiveCampaignUnauthorizedError, ActiveCampaignForbiddenError, \
+    ActiveCampaignNotFoundError, ActiveCampaignUnprocessableEntityError, ActiveCampaignRateLimitError, \
+    ActiveCampaignInternalServerError, ActiveCampaignIncompleteResponseError
 
 LOGGER = singer.get_logger()
 REQUEST_TIMEOUT = 300
 
-DEFAULT_API_VERSION = '3'
-
-
-class Server5xxError(Exception):
-    pass
-
+# Backoff policy shared by both clients
+MAX_TRIES = 5
+BACKOFF_FACTOR = 2
 
-class Server429Error(Exception):
-    pass
-
-
-class ActiveCampaignError(Exception):
-    pass
-class ActiveCampaignBadRequestError(ActiveCampaignError):
-    pass
+DEFAULT_API_VERSION = '3'
 
-class ActiveCampaignUnauthorizedError(ActiveCampaignError):
-    pass
+# Connections kept per host: at least requests' default, more when more requests run at once
+DEFAULT_POOL_SIZE = 10
 
-class ActiveCampaignForbiddenError(ActiveCampaignError):
-    pass
+# Values of `http_transport`: requests (HTTP/1.1, the default), or httpx over HTTP/2
+REQUESTS_TRANSPORT = 'requests'
+HTTP2_TRANSPORTS = ('http2', 'h2c')
 
-class ActiveCampaignNotFoundError(ActiveCampaignError):
-    pass
+# Brotli is only asked for when urllib3 can decode it (`pip install brotli`)
+ACCEPT_ENCODING = 'gzip, br' if getattr(urllib3.response, 'brotli', None) else 'gzip'
 
-class ActiveCampaignUnprocessableEntityError(ActiveCampaignError):
-    pass
+# aiohttp is only used by AsyncActiveCampaignClient and takes longer to import than the rest
+#  of the tap, so it is imported on first use (discovery never imports it)
+_AIOHTTP = []
 
-class ActiveCampaignRateLimitError(Server429Error):
-    pass
 
-class ActiveCampaignInternalServerError(Server5xxError):
-    pass
+def get_aiohttp():
+    """ Return the aiohttp module, or None if it is not installed """
+    if not _AIOHTTP:
+        try:
+            import aiohttp
+        except ImportError:
+            aiohttp = None
+        _AIOHTTP.append(aiohttp)
+    return _AIOHTTP[0]
 
 
 # Errors Reference: https://developers.activecampaign.com/reference#errors
@@ -90,6 +100,108 @@ def should_retry_error(exception):
     else:
         return False
 
+def should_retry_async_error(exception):
+    """
+        Return true if an AsyncActiveCampaignClient exception is required to retry.
+        aiohttp connection errors and asyncio timeouts are not always OSError subclasses.
+    """
+    if isinstance(exception, (asyncio.TimeoutError, get_aiohttp().ClientConnectionError)):
+        return True
+    return should_retry_error(exception)
+
+def add_backoff_sleep(details):
+    """ on_backoff handler adding the sleep before the next try to the timings of its stream """
+    timing.add(details['kwargs'].get('endpoint'), 'backoff_sleep', details['wait'])
+
+def get_request_timeout(request_timeout):
+    # if request_timeout is other than 0, "0" or "" then use request_timeout
+    if request_timeout and float(request_timeout):
+        return float(request_timeout)
+    # If value is 0, "0" or "" then set default to 300 seconds.
+    return REQUEST_TIMEOUT
+
+def get_pool_size(config):
+    """
+    Return the number of pooled connections for the requests that can run at once:
+    `max_concurrent_streams` streams, each with `max_concurrent_pages` pages and
+    `max_concurrent_children` child syncs in flight. `http_pool_size` overrides it.
+    """
+    if config.get('http_pool_size'):
+        return int(config['http_pool_size'])
+    streams = int(config.get('max_concurrent_streams') or 1)
+    pages = int(config.get('max_concurrent_pages') or 1)
+    children = int(config.get('max_concurrent_children') or 1)
+    return max(DEFAULT_POOL_SIZE, streams * (pages + children))
+
+class KeepAliveAdapter(HTTPAdapter):
+    """
+    HTTPAdapter whose pooled connections send TCP keep-alive probes, so that a connection idle
+    while the rate limiter waits is kept open rather than silently dropped by a NAT or proxy.
+    """
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['socket_options'] = HTTPConnection.default_socket_options + [
+            (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+        super().init_poolmanager(*args, **kwargs)
+
+def get_session(transport, pool_size):
+    """
+    Return the session sending the requests of ActiveCampaignClient: an httpx client multiplexing
+    the requests over HTTP/2 when `transport` is `http2` (or `h2c`, HTTP/2 over cleartext with
+    prior knowledge) and httpx is installed, a requests session otherwise.
+    """
+    if transport in HTTP2_TRANSPORTS:
+        from tap_activecampaign import http2
+        if http2.is_available():
+            LOGGER.info('Sending requests over HTTP/2 ({})'.format(transport))
+            return http2.Http2Session(pool_size, prior_knowledge=transport == 'h2c')
+        LOGGER.warning('http_transport {} requires httpx with HTTP/2 support '
+                       '(pip install tap-activecampaign[http2]), using requests'.format(transport))
+    elif transport and transport != REQUESTS_TRANSPORT:
+        raise ValueError('Unknown http_transport {}, expected one of: {}'.format(
+            transport, ', '.join((REQUESTS_TRANSPORT,) + HTTP2_TRANSPORTS)))
+
+    session = requests.Session()
+    # Pool as many connections as requests can run at once, kept alive between requests
+    adapter = KeepAliveAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+def get_wire_bytes(session, response):
+    """ Return the bytes of the body of a closed response received on the wire, before decoding """
+    if isinstance(response, requests.Response) and hasattr(response.raw, 'tell'):
+        # urllib3 counts the bytes read from the socket, before decoding gzip or br
+        return response.raw.tell()
+    if not isinstance(session, requests.Session):
+        # Http2Response of the httpx session
+        return response.wire_bytes
+    return 0
+
+class TransportStats(object):
+    """
+    Responses received by a client, with the bytes of their bodies on the wire (compressed)
+    and decoded. Updated from every thread using the client.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.responses = 0
+        self.wire_bytes = 0
+        self.decoded_bytes = 0
+
+    def add_response(self, wire_bytes):
+        with self.lock:
+            self.responses += 1
+            self.wire_bytes += wire_bytes
+
+    def add_decoded(self, decoded_bytes):
+        with self.lock:
+            self.decoded_bytes += decoded_bytes
+
+    def __str__(self):
+        ratio = self.decoded_bytes / self.wire_bytes if self.wire_bytes else 0
+        return '{} responses, {} bytes on the wire, {} bytes decoded ({:.1f}x)'.format(
+            self.responses, self.wire_bytes, self.decoded_bytes, ratio)
+
 def get_exception_for_status_code(status_code):
     # Map the status code with `STATUS_CODE_EXCEPTION_MAPPING` dictionary and accordingly return the error.
     if status_code > 500:
@@ -98,6 +210,15 @@ def get_exception_for_status_code(status_code):
 
     return STATUS_CODE_EXCEPTION_MAPPING.get(status_code, {}).get("raise_exception", ActiveCampaignError)
 
+def decode_json(response):
+    """
+    Decode the body of a requests response with the selected JSON codec
+    rather than requests' own json(), which uses simplejson or the json module.
+    """
+    if isinstance(response, requests.Response):
+        return codec.loads(response.content)
+    return response.json()
+
 # Example 422 error
 # {
 #   "errors": [
@@ -141,61 +262,88 @@ class ActiveCampaignClient(object):
                  api_url,
                  api_token,
                  user_agent=None,
-                 request_timeout=None):
+                 request_timeout=None,
+                 requests_per_second=None,
+                 burst=None,
+                 pool_size=None,
+                 transport=None):
         self.__api_url = api_url
         self.__api_token = api_token
         self.__user_agent = user_agent
-        self.__session = requests.Session()
+        self.__session = get_session(transport, int(pool_size or DEFAULT_POOL_SIZE))
+        self.__session.headers['Accept-Encoding'] = ACCEPT_ENCODING
+        # Headers of every request, built once
+        self.__headers = {'Api-Token': self.__api_token, 'Accept': 'application/json'}
+        if self.__user_agent:
+            self.__headers['User-Agent'] = self.__user_agent
+        self.__post_headers = dict(self.__headers, **{'Content-Type': 'application/json'})
+        self.transport_stats = TransportStats()
         self.__verified = False
+        # One request budget shared by every thread using this client
+        self.rate_limiter = TokenBucket(
+            rate=float(requests_per_second or DEFAULT_REQUESTS_PER_SECOND),
+            burst=int(burst or DEFAULT_BURST))
         self.base_url = '{}/api/{}/'.format(self.__api_url, DEFAULT_API_VERSION)
 
-        # if request_timeout is other than 0, "0" or "" then use request_timeout
-        if request_timeout and float(request_timeout):
-            self.request_timeout = float(request_timeout)
-        else: # If value is 0, "0" or "" then set default to 300 seconds.
-            self.request_timeout = REQUEST_TIMEOUT
+        self.request_timeout = get_request_timeout(request_timeout)
+        # PageCache of the paths shared by several streams, set by sync
+        self.page_cache = None
 
     # Backoff for Server5xxError, Server429Error, OSError and Exception with ConnectionResetError.
     @backoff.on_exception(backoff.expo,
                           (Exception),
                           giveup=lambda e: not should_retry_error(e),
-                          max_tries=5,
-                          factor=2)
+                          max_tries=MAX_TRIES,
+                          on_backoff=add_backoff_sleep,
+                          factor=BACKOFF_FACTOR)
     def __enter__(self):
         self.__verified = self.check_api_token()
         return self
 
     def __exit__(self, exception_type, exception_value, traceback):
         self.__session.close()
+        LOGGER.info('HTTP transport: {}'.format(self.transport_stats))
 
     def check_api_token(self):
         if self.__api_token is None:
             raise Exception('Error: Missing api_token.')
-        headers = {}
-        if self.__user_agent:
-            headers['User-Agent'] = self.__user_agent
-        headers['Api-Token'] = self.__api_token
-        headers['Accept'] = 'application/json'
         url = self.base_url
         response = self.__session.get(
             # Simple endpoint that returns 1 record w/ default organization URN
             url=url,
-            headers=headers,
+            headers=self.__headers,
             timeout=self.request_timeout)
-        if response.status_code != 200:
-            raise_for_error(response)
-        else:
-            return True
+        try:
+            if response.status_code != 200:
+                raise_for_error(response)
+            else:
+                self.transport_stats.add_decoded(len(response.content))
+                return True
+        finally:
+            self.release(response)
+
+    def release(self, response, endpoint=None):
+        """
+        Close a response, on success and error paths alike, so that its connection returns to
+        the pool (or is dropped if its body was not read), and count its bytes on the wire
+        """
+        response.close()
+        wire_bytes = get_wire_bytes(self.__session, response)
+        self.transport_stats.add_response(wire_bytes)
+        timing.add_bytes(endpoint, wire_bytes)
 
     # Backoff for Server5xxError, Server429Error, OSError and Exception with ConnectionResetError.
     @backoff.on_exception(backoff.expo,
                           (Exception),
                           giveup=lambda e: not should_retry_error(e),
-                          max_tries=5,
-                          factor=2)
-    # Rate limit: https://developers.activecampaign.com/reference#rate-limits
-    @utils.ratelimit(5, 1)
-    def request(self, method, path=None, url=None, api_version=None, **kwargs):
+                          max_tries=MAX_TRIES,
+                          on_backoff=add_backoff_sleep,
+                          factor=BACKOFF_FACTOR)
+    def request(self, method, path=None, url=None, api_version=None, data_key=None, keep_keys=None, raw=False,
+                conditional=False, **kwargs):
+        # Rate limit: https://developers.activecampaign.com/reference#rate-limits
+        waited = self.rate_limiter.acquire()
+
         if not self.__verified:
             self.__verified = self.check_api_token()
 
@@ -210,20 +358,250 @@ class ActiveCampaignClient(object):
             del kwargs['endpoint']
         else:
             endpoint = None
+        if waited:
+            timing.add(endpoint, 'rate_limit_wait', waited)
+
+        headers = self.__post_headers if method == 'POST' else self.__headers
+        if 'headers' in kwargs:
+            # e.g. the validators of a conditional request
+            headers = dict(kwargs.pop('headers'), **headers)
+
+        with timing.phase(endpoint, 'request'):
+            with metrics.http_request_timer(endpoint) as timer:
+                response = self.__session.request(method, url, stream=True, timeout=self.request_timeout,
+                                                  headers=headers, **kwargs)
+                timer.tags[metrics.Tag.http_status_code] = response.status_code
+
+            try:
+                return self.read_response(response, data_key, keep_keys, raw, conditional)
+            finally:
+                self.release(response, endpoint)
+
+    def read_response(self, response, data_key=None, keep_keys=None, raw=False, conditional=False):
+        # A conditional request answered 304 Not Modified has no body
+        not_modified = conditional and response.status_code == 304
+        if response.status_code != 200 and not not_modified:
+            raise_for_error(response)
+
+        # The body as bytes (None if not modified) with the validators of the page, for the snapshot cache
+        if conditional:
+            content = None if not_modified else response.content
+            self.transport_stats.add_decoded(len(content or b''))
+            return content, response.headers.get('ETag'), response.headers.get('Last-Modified')
+
+        # The body as bytes, e.g. for the page cache
+        if raw:
+            self.transport_stats.add_decoded(len(response.content))
+            return response.content
+
+        # Streaming mode: decode the records under data_key while the body arrives
+        if data_key:
+            return self.parse_page(response, data_key, keep_keys)
 
-        if 'headers' not in kwargs:
-            kwargs['headers'] = {}
-        kwargs['headers']['Api-Token'] = self.__api_token
-        kwargs['headers']['Accept'] = 'application/json'
+        # Log invalid JSON (e.g. unterminated string errors)
+        try:
+            response_json = decode_json(response)
+        except Exception as err:
+            LOGGER.error('{}'.format(err))
+            LOGGER.error('response content: {}'.format(response.content))
+            raise Exception(err)
+
+        self.transport_stats.add_decoded(len(response.content))
+        return response_json
+
+    def parse_page(self, response, data_key, keep_keys=None):
+        """
+        Parse the page body incrementally and return {data_key: [records], 'meta': {...}}.
+        Other top-level objects (sideloads) are skipped unless they are in `keep_keys`, and a
+        truncated or invalid body is reported by position instead of logging the whole content.
+        """
+        parser = PageParser(response.iter_content(chunk_size=CHUNK_SIZE), data_key,
+                            ('meta',) + tuple(keep_keys or ()))
+        try:
+            records = list(parser)
+        except TruncatedPageError as err:
+            LOGGER.error('{}: {}'.format(response.url, err))
+            raise ActiveCampaignIncompleteResponseError(str(err)) from None
+        except ValueError as err:
+            LOGGER.error('{}: {}'.format(response.url, err))
+            raise Exception(err) from None
+        finally:
+            response.close()
+            self.transport_stats.add_decoded(parser.bytes_read)
+
+        page = dict(parser.values)
+        if parser.has_data_key:
+            page[data_key] = records
+        return page
+
+    def get(self, path, api_version=None, **kwargs):
+        if self.page_cache and self.page_cache.is_cached(path):
+            return self.get_cached(path, api_version, **kwargs)
+        return self.request('GET', path=path, api_version=api_version, **kwargs)
+
+    def get_conditional(self, path, params, etag=None, last_modified=None, endpoint=None):
+        """
+        GET a page with the validators of a previous response, and return (content, etag, last_modified).
+        `content` is None if the server answered 304 Not Modified.
+        """
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        return self.request('GET', path=path, params=params, endpoint=endpoint, headers=headers, conditional=True)
+
+    def get_cached(self, path, api_version=None, data_key=None, keep_keys=None, **kwargs):
+        """
+        GET a page of a path shared by several streams through the page cache.
+        The whole page is decoded, as without `data_key`, since the body is in memory anyway.
+        """
+        content = self.page_cache.get(
+            path, str(kwargs.get('params')),
+            lambda: self.request('GET', path=path, api_version=api_version, raw=True, **kwargs))
+        try:
+            return codec.loads(content)
+        except Exception as err:
+            LOGGER.error('{}'.format(err))
+            LOGGER.error('response content: {}'.format(content))
+            raise Exception(err)
+
+    def post(self, path, api_version=None, **kwargs):
+        return self.request('POST', path=path, api_version=api_version, **kwargs)
+
+async def retry_async(coroutine_function, *args, **kwargs):
+    """
+    Await `coroutine_function` with the same policy as the `backoff.on_exception` decorators
+    of ActiveCampaignClient: exponential waits with full jitter, up to MAX_TRIES tries.
+    """
+    wait = backoff.expo(factor=BACKOFF_FACTOR)
+    tries = 0
+    while True:
+        tries += 1
+        try:
+            return await coroutine_function(*args, **kwargs)
+        except Exception as err:
+            if tries >= MAX_TRIES or not should_retry_async_error(err):
+                raise
+            seconds = backoff.full_jitter(next(wait))
+            timing.add(kwargs.get('endpoint'), 'backoff_sleep', seconds)
+            LOGGER.info('Backing off {}(...) for {:.1f}s ({})'.format(
+                coroutine_function.__name__, seconds, repr(err)))
+            await asyncio.sleep(seconds)
+
+
+class AsyncResponse(object):
+    """
+    Fully read aiohttp response with the `status_code`, `content` and `json()` interface
+    that `raise_for_error` expects from a requests response.
+    """
+    def __init__(self, status_code, content):
+        self.status_code = status_code
+        self.content = content
+
+    def json(self):
+        return codec.loads(self.content)
+
+
+class AsyncActiveCampaignClient(object):
+    """
+    asyncio version of ActiveCampaignClient, with the same error mapping, backoff policy,
+    timeout and headers. Requires aiohttp (`pip install tap-activecampaign[async]`).
+    Pass the `rate_limiter` of an ActiveCampaignClient to share its request budget.
+    The streams do not use it: it is a building block for callers running their own event loop.
+    """
+    def __init__(self,
+                 api_url,
+                 api_token,
+                 user_agent=None,
+                 request_timeout=None,
+                 requests_per_second=None,
+                 burst=None,
+                 rate_limiter=None):
+        if get_aiohttp() is None:
+            raise ImportError('AsyncActiveCampaignClient requires aiohttp, install tap-activecampaign[async]')
+        self.__api_url = api_url
+        self.__api_token = api_token
+        self.__user_agent = user_agent
+        self.__session = None
+        self.__verified = False
+        self.base_url = '{}/api/{}/'.format(self.__api_url, DEFAULT_API_VERSION)
+        self.request_timeout = get_request_timeout(request_timeout)
+        self.rate_limiter = rate_limiter or TokenBucket(
+            rate=float(requests_per_second or DEFAULT_REQUESTS_PER_SECOND),
+            burst=int(burst or DEFAULT_BURST))
+
+    async def __aenter__(self):
+        self.__verified = await retry_async(self.check_api_token)
+        return self
+
+    async def __aexit__(self, exception_type, exception_value, traceback):
+        await self.close()
+
+    async def close(self):
+        if self.__session is not None:
+            await self.__session.close()
+            self.__session = None
+
+    def get_session(self):
+        # aiohttp sessions must be created inside the running event loop
+        if self.__session is None:
+            aiohttp = get_aiohttp()
+            self.__session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=self.request_timeout))
+        return self.__session
+
+    async def send(self, method, url, **kwargs):
+        async with self.get_session().request(method, url, **kwargs) as response:
+            return AsyncResponse(response.status, await response.read())
+
+    async def check_api_token(self):
+        if self.__api_token is None:
+            raise Exception('Error: Missing api_token.')
+        headers = {}
+        if self.__user_agent:
+            headers['User-Agent'] = self.__user_agent
+        headers['Api-Token'] = self.__api_token
+        headers['Accept'] = 'application/json'
+        response = await self.send('GET', self.base_url, headers=headers)
+        if response.status_code != 200:
+            raise_for_error(response)
+        else:
+            return True
+
+    async def request(self, method, path=None, url=None, api_version=None, **kwargs):
+        # Backoff for Server5xxError, Server429Error, OSError, timeouts and connection errors.
+        return await retry_async(self.request_once, method, path, url, api_version, **kwargs)
+
+    async def request_once(self, method, path=None, url=None, api_version=None, **kwargs):
+        # Rate limit: https://developers.activecampaign.com/reference#rate-limits
+        waited = await self.rate_limiter.acquire_async()
+
+        if not self.__verified:
+            self.__verified = await self.check_api_token()
+
+        if not api_version:
+            api_version = DEFAULT_API_VERSION
+
+        if not url and path:
+            url = '{}/api/{}/{}'.format(self.__api_url, api_version, path)
+
+        endpoint = kwargs.pop('endpoint', None)
+        if waited:
+            timing.add(endpoint, 'rate_limit_wait', waited)
+
+        headers = dict(kwargs.pop('headers', {}))
+        headers['Api-Token'] = self.__api_token
+        headers['Accept'] = 'application/json'
 
         if self.__user_agent:
-            kwargs['headers']['User-Agent'] = self.__user_agent
+            headers['User-Agent'] = self.__user_agent
 
         if method == 'POST':
-            kwargs['headers']['Content-Type'] = 'application/json'
+            headers['Content-Type'] = 'application/json'
 
         with metrics.http_request_timer(endpoint) as timer:
-            response = self.__session.request(method, url, stream=True, timeout=self.request_timeout, **kwargs)
+            response = await self.send(method, url, headers=headers, **kwargs)
             timer.tags[metrics.Tag.http_status_code] = response.status_code
 
         if response.status_code != 200:
@@ -231,7 +609,7 @@ class ActiveCampaignClient(object):
 
         # Log invalid JSON (e.g. unterminated string errors)
         try:
-            response_json = response.json()
+            response_json = decode_json(response)
         except Exception as err:
             LOGGER.error('{}'.format(err))
             LOGGER.error('response content: {}'.format(response.content))
@@ -239,8 +617,8 @@ class ActiveCampaignClient(object):
 
         return response_json
 
-    def get(self, path, api_version=None, **kwargs):
-        return self.request('GET', path=path, api_version=api_version, **kwargs)
+    async def get(self, path, api_version=None, **kwargs):
+        return await self.request('GET', path=path, api_version=api_version, **kwargs)
 
-    def post(self, path, api_version=None, **kwargs):
-        return self.request('POST', path=path, api_version=api_version, **kwargs)
\ No newline at end of file
+    async def post(self, path, api_version=None, **kwargs):
+        return await self.request('POST', path=path, api_version=api_version, **kwargs)
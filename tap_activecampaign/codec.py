@@ -0,0 +1,127 @@
+import json
+
+import simplejson
+import singer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+LOGGER = singer.get_logger()
+
+# Codec names accepted by the `json_codec` config value; `auto` picks the first installed one
+#  of orjson and ujson, else the standard library.
+AUTO = 'auto'
+
+
+class StdlibCodec(object):
+    """
+    Decode with the json module and encode like singer-python's format_message:
+    simplejson with Decimals written as JSON numbers.
+    """
+    name = 'json'
+
+    def loads(self, content):
+        return json.loads(content)
+
+    def dumps(self, obj):
+        return simplejson.dumps(obj, use_decimal=True)
+
+
+class OrjsonCodec(StdlibCodec):
+    """
+    orjson for decoding and encoding. Values orjson does not handle the way singer-python does
+    (Decimals, datetimes, integers over 64 bits, non-string keys) make orjson raise, and that
+    message is encoded by StdlibCodec instead, so it is serialized (or fails) exactly as before.
+    The output differs from StdlibCodec only in whitespace and in non-ASCII characters being
+    written as UTF-8 rather than \\u escapes.
+    """
+    name = 'orjson'
+    # orjson is a compiled extension, whose members pylint cannot see
+    # pylint: disable=no-member
+
+    def loads(self, content):
+        try:
+            return orjson.loads(content)
+        except orjson.JSONDecodeError:
+            # NaN, Infinity and integers over 64 bits are accepted by the json module
+            return super().loads(content)
+
+    def dumps(self, obj):
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_PASSTHROUGH_DATETIME).decode('utf-8')
+        except TypeError:
+            return super().dumps(obj)
+
+
+class UjsonCodec(StdlibCodec):
+    """
+    ujson for decoding. Messages are still encoded by StdlibCodec: ujson writes Decimals
+    as floats, which would lose the precision singer-python keeps.
+    """
+    name = 'ujson'
+
+    def loads(self, content):
+        try:
+            return ujson.loads(content)
+        except ValueError:
+            return super().loads(content)
+
+
+CODECS = {
+    OrjsonCodec.name: (OrjsonCodec, orjson),
+    UjsonCodec.name: (UjsonCodec, ujson),
+    StdlibCodec.name: (StdlibCodec, json),
+}
+
+
+def get_codec(name=None):
+    """
+    Return the codec for a `json_codec` config value. A codec that is not installed
+    falls back to the standard library with a warning.
+    """
+    name = (name or AUTO).lower()
+    if name == AUTO:
+        for codec_class, module in CODECS.values():
+            if module is not None:
+                return codec_class()
+    if name not in CODECS:
+        raise ValueError('Unknown json_codec: {} (expected one of {})'.format(
+            name, ', '.join([AUTO] + list(CODECS))))
+    codec_class, module = CODECS[name]
+    if module is None:
+        LOGGER.warning('json_codec {} is not installed, using json'.format(name))
+        return StdlibCodec()
+    return codec_class()
+
+
+CODEC = get_codec()
+
+
+def configure(name=None):
+    """ Select the codec used by loads and dumps """
+    global CODEC
+    CODEC = get_codec(name)
+    LOGGER.info('Using the {} JSON codec'.format(CODEC.name))
+    return CODEC
+
+
+def loads(content):
+    """ Decode a JSON document (str or bytes) """
+    return CODEC.loads(content)
+
+
+def dumps(obj):
+    """ Encode a JSON document to a str """
+    return CODEC.dumps(obj)
+
+
+def format_message(message):
+    """ Serialize a singer message to one line of JSON, like singer.messages.format_message """
+    return CODEC.dumps(message.asdict())
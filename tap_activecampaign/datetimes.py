@@ -0,0 +1,87 @@
+import re
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+
+import singer
+from singer import Transformer
+from singer.transform import NO_INTEGER_DATETIME_PARSING
+from singer.utils import strftime, strptime_to_utc
+
+LOGGER = singer.get_logger()
+
+# Number of distinct datetime strings kept parsed. Records repeat the same values
+#  (cdate/udate of a new record, bookmarks), so a small cache covers most lookups.
+CACHE_SIZE = 16384
+
+# Datetime formats returned by the ActiveCampaign API:
+#   2021-03-01 05:30:00, 2021-03-01T05:30:00-05:00, 2021-03-01T05:30:00.123Z, 2021-03-01
+# Anything else is parsed by dateutil, like the singer Transformer does.
+DATETIME_RE = re.compile(
+    r'^(\d{4})-(\d{2})-(\d{2})'
+    r'(?:[T ](\d{2}):(\d{2})(?::(\d{2})(?:\.(\d{1,6}))?)?)?'
+    r'(?:(Z)|([+-])(\d{2}):?(\d{2}))?$')
+
+# Placeholder the API returns for dates that were never set
+EMPTY_DATETIME = '0000-00-00 00:00:00'
+
+
+def parse_fast(value):
+    """
+    Parse the formats in DATETIME_RE to a UTC datetime. Return None if the value has another format.
+    """
+    match = DATETIME_RE.match(value)
+    if not match:
+        return None
+    year, month, day, hour, minute, second, fraction, utc, sign, offset_hours, offset_minutes = match.groups()
+    try:
+        dttm = datetime(int(year), int(month), int(day),
+                        int(hour or 0), int(minute or 0), int(second or 0),
+                        int(fraction.ljust(6, '0')) if fraction else 0)
+    except ValueError:
+        return None
+    if sign:
+        offset = timedelta(hours=int(offset_hours), minutes=int(offset_minutes))
+        if offset:
+            return (dttm - offset if sign == '+' else dttm + offset).replace(tzinfo=timezone.utc)
+    return dttm.replace(tzinfo=timezone.utc)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def parse_datetime(value):
+    """
+    Return the UTC datetime of an API or bookmark datetime string, or None if it is empty or invalid.
+    """
+    if not value or value == EMPTY_DATETIME:
+        return None
+    dttm = parse_fast(value)
+    if dttm is None:
+        try:
+            dttm = strptime_to_utc(value)
+        except Exception as err:
+            LOGGER.warning('{}, ({})'.format(err, value))
+            return None
+    return dttm
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def transform_datetime(value):
+    """
+    Transform the datetime string to the singer format "%Y-%m-%dT%H:%M:%S.%fZ".
+    Same result as singer's Transformer, without reparsing repeated values.
+    """
+    dttm = parse_datetime(value)
+    if dttm is None:
+        return None
+    return strftime(dttm)
+
+
+class ActiveCampaignTransformer(Transformer):
+    """
+    singer Transformer using the cached datetime parsing for date-time fields
+    """
+    def _transform_datetime(self, value):
+        if self.integer_datetime_fmt != NO_INTEGER_DATETIME_PARSING or not isinstance(value, str):
+            return super()._transform_datetime(value)
+        if value == '':
+            return None
+        return transform_datetime(value)
@@ -1,31 +1,59 @@
 import singer
 from singer.catalog import Catalog, CatalogEntry, Schema
-from tap_activecampaign.schema import get_schemas
+from tap_activecampaign.schema import get_field_metadata, load_schemas
 from tap_activecampaign.streams import flatten_streams
 
 LOGGER = singer.get_logger()
 
-def discover():
-    schemas, field_metadata = get_schemas()
-    catalog = Catalog([])
 
+def get_catalog_entry(stream_name, schema_dict, stream_metadata):
+    try:
+        schema = Schema.from_dict(schema_dict)
+        mdata = get_field_metadata(schema_dict, stream_metadata)
+    except Exception as err:
+        LOGGER.error(err)
+        LOGGER.error('stream_name: {}'.format(stream_name))
+        LOGGER.error('type schema_dict: {}'.format(type(schema_dict)))
+        raise err
+
+    return CatalogEntry(
+        stream=stream_name,
+        tap_stream_id=stream_name,
+        key_properties=stream_metadata.get('key_properties', None),
+        schema=schema,
+        metadata=mdata
+    )
+
+
+class LazyCatalog(Catalog):
+    """
+    Catalog of every stream whose entries (singer Schema and metadata) are built on first use:
+    get_stream builds the entry of one stream, reading `streams` (e.g. to dump the catalog)
+    builds the others, in the order of flatten_streams.
+    """
+
+    def __init__(self, flat_streams, schemas): # pylint: disable=super-init-not-called
+        self.flat_streams = flat_streams
+        self.schemas = schemas
+        self.entries = {}
+
+    def get_entry(self, stream_name):
+        entry = self.entries.get(stream_name)
+        if entry is None:
+            entry = self.entries[stream_name] = get_catalog_entry(
+                stream_name, self.schemas[stream_name], self.flat_streams[stream_name])
+        return entry
+
+    @property
+    def streams(self):
+        return [self.get_entry(stream_name) for stream_name in self.flat_streams]
+
+    def get_stream(self, tap_stream_id):
+        if tap_stream_id not in self.flat_streams:
+            return None
+        return self.get_entry(tap_stream_id)
+
+
+def discover():
     flat_streams = flatten_streams()
-    for stream_name, schema_dict in schemas.items():
-        try:
-            schema = Schema.from_dict(schema_dict)
-            mdata = field_metadata[stream_name]
-        except Exception as err:
-            LOGGER.error(err)
-            LOGGER.error('stream_name: {}'.format(stream_name))
-            LOGGER.error('type schema_dict: {}'.format(type(schema_dict)))
-            raise err
-
-        catalog.streams.append(CatalogEntry(
-            stream=stream_name,
-            tap_stream_id=stream_name,
-            key_properties=flat_streams.get(stream_name, {}).get('key_properties', None),
-            schema=schema,
-            metadata=mdata
-        ))
-
-    return catalog
+    return LazyCatalog(flat_streams, load_schemas(flat_streams))
@@ -0,0 +1,38 @@
+# Exceptions of the ActiveCampaign API, in their own module so that the streams can catch them
+#  without importing the client and its HTTP stack
+
+
+class Server5xxError(Exception):
+    pass
+
+
+class Server429Error(Exception):
+    pass
+
+
+class ActiveCampaignError(Exception):
+    pass
+class ActiveCampaignBadRequestError(ActiveCampaignError):
+    pass
+
+class ActiveCampaignUnauthorizedError(ActiveCampaignError):
+    pass
+
+class ActiveCampaignForbiddenError(ActiveCampaignError):
+    pass
+
+class ActiveCampaignNotFoundError(ActiveCampaignError):
+    pass
+
+class ActiveCampaignUnprocessableEntityError(ActiveCampaignError):
+    pass
+
+class ActiveCampaignRateLimitError(Server429Error):
+    pass
+
+class ActiveCampaignInternalServerError(Server5xxError):
+    pass
+
+# ConnectionError (OSError), so the request is retried like a dropped connection
+class ActiveCampaignIncompleteResponseError(ActiveCampaignError, ConnectionError):
+    pass
@@ -0,0 +1,115 @@
+import contextlib
+import logging
+import requests
+import singer
+from tap_activecampaign import codec
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    import h2
+except ImportError:
+    h2 = None
+
+LOGGER = singer.get_logger()
+
+# httpx logs every request at INFO, the http_request_duration metric already covers them
+logging.getLogger('httpx').setLevel(logging.WARNING)
+
+
+def is_available():
+    """ Return True if httpx and its HTTP/2 dependency are installed """
+    return httpx is not None and h2 is not None
+
+
+@contextlib.contextmanager
+def requests_errors():
+    """
+    Raise the httpx errors as the requests exceptions they correspond to, so that the error
+    mapping and backoff of ActiveCampaignClient (which retries OSError) apply to both transports
+    """
+    try:
+        yield
+    except httpx.TimeoutException as err:
+        raise requests.exceptions.Timeout(str(err)) from err
+    except httpx.TransportError as err:
+        raise requests.exceptions.ConnectionError(str(err)) from err
+
+
+class Http2Response(object):
+    """
+    Streamed httpx response with the interface of a requests response that
+    ActiveCampaignClient and `raise_for_error` use.
+    """
+    def __init__(self, response):
+        self.response = response
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.url = str(response.url)
+
+    @property
+    def content(self):
+        with requests_errors():
+            return self.response.read()
+
+    @property
+    def wire_bytes(self):
+        # Bytes of the body received, before decoding gzip or br
+        return self.response.num_bytes_downloaded
+
+    def iter_content(self, chunk_size=None):
+        with requests_errors():
+            yield from self.response.iter_bytes(chunk_size)
+
+    def json(self):
+        return codec.loads(self.content)
+
+    def close(self):
+        self.response.close()
+
+
+class Http2Session(object):
+    """
+    httpx client with the `request`/`get`/`close` interface of the requests.Session used by
+    ActiveCampaignClient. Concurrent requests to the API share one multiplexed HTTP/2
+    connection (negotiated with ALPN over TLS) instead of one socket each.
+    With `prior_knowledge`, HTTP/2 is spoken over cleartext (h2c) without negotiation,
+    e.g. to a local proxy; the server must support it.
+    """
+    def __init__(self, pool_size, prior_knowledge=False, transport=None):
+        self.client = httpx.Client(
+            http1=not prior_knowledge,
+            http2=True,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            transport=transport)
+
+    @property
+    def headers(self):
+        return self.client.headers
+
+    def request(self, method, url, params=None, headers=None, timeout=None, stream=False, data=None, json=None):
+        # Querystrings are built by the streams and sent as is, e.g. `filters[id][gt]=100`
+        if isinstance(params, str):
+            if params:
+                url = '{}?{}'.format(url, params)
+            params = None
+        with requests_errors():
+            request = self.client.build_request(method, url, params=params, headers=headers,
+                                                content=data, json=json, timeout=timeout)
+            response = Http2Response(self.client.send(request, stream=True))
+        if not stream:
+            try:
+                with requests_errors():
+                    response.response.read()
+            finally:
+                response.close()
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def close(self):
+        self.client.close()
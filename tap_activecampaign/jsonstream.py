@@ -0,0 +1,205 @@
+import codecs
+import re
+
+from tap_activecampaign import codec
+
+CHUNK_SIZE = 65536
+WHITESPACE = ' \t\n\r'
+
+# Characters that change the scanner state outside of strings
+STRUCTURE_RE = re.compile(r'[\[\]{}"]')
+# Characters of a string up to its closing quote, with escaped characters
+STRING_CONTENT_RE = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*', re.DOTALL)
+SCALAR_END_RE = re.compile(r'[\s,\]}]')
+
+
+class TruncatedPageError(ValueError):
+    """
+    The response body ended before the page was complete
+    """
+
+
+class PageParser:
+    """
+    Incremental parser of an API page: {"<data_key>": [<records>], "meta": {"total": "..."}, ...}
+    Iterating the parser decodes and yields the records under `data_key` as the body arrives.
+    Other top-level values in `keep_keys` are decoded into `values`; the rest (e.g. sideloaded
+    objects) are scanned and dropped without being decoded. Only the record being decoded is
+    kept in memory.
+    """
+    def __init__(self, chunks, data_key, keep_keys=('meta',)):
+        self.chunks = iter(chunks)
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.data_key = data_key
+        self.keep_keys = keep_keys
+        self.values = {}
+        self.has_data_key = False
+        self.record_count = 0
+        self.buffer = ''
+        self.pos = 0
+        self.consumed = 0 # characters dropped from the start of the buffer
+        self.eof = False
+        self.bytes_read = 0 # decoded bytes of the body, after any Content-Encoding
+
+    def fill(self):
+        """ Append the next chunk of the body to the buffer. Return False at the end of the body. """
+        if self.eof:
+            return False
+        for chunk in self.chunks:
+            self.bytes_read += len(chunk)
+            text = self.decoder.decode(chunk)
+            if text:
+                self.buffer += text
+                return True
+        self.eof = True
+        try:
+            self.buffer += self.decoder.decode(b'', final=True)
+        except UnicodeDecodeError:
+            raise self.error('incomplete UTF-8 character', truncated=True) from None
+        return False
+
+    def drop(self, count):
+        """ Drop the first `count` characters of the buffer """
+        self.buffer = self.buffer[count:]
+        self.pos -= count
+        self.consumed += count
+
+    def error(self, message, truncated=False):
+        position = self.consumed + self.pos
+        if truncated:
+            return TruncatedPageError('Response body ended at character {} after {} records: {}'.format(
+                position, self.record_count, message))
+        excerpt = self.buffer[max(self.pos - 40, 0):self.pos + 40]
+        return ValueError('Invalid JSON at character {} after {} records: {}, near {!r}'.format(
+            position, self.record_count, message, excerpt))
+
+    def peek(self):
+        """ Skip whitespace and return the next character, or '' at the end of the body """
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if self.pos > 0:
+                self.drop(self.pos)
+            if not self.fill():
+                return ''
+
+    def expect(self, characters):
+        """ Consume the next character, which must be one of `characters` """
+        char = self.peek()
+        if not char:
+            raise self.error('expected {!r}'.format(characters), truncated=True)
+        if char not in characters:
+            raise self.error('expected {!r}'.format(characters))
+        self.pos += 1
+        return char
+
+    def more(self, start, end, keep):
+        """
+        Read more of the body while scanning a value from `start`, up to `end`. Return the
+        characters dropped from the buffer, which is all of the scanned part unless `keep`.
+        """
+        dropped = start if keep else end
+        self.drop(dropped)
+        if not self.fill():
+            raise self.error('incomplete value', truncated=True)
+        return dropped
+
+    def string_end(self, start, index, keep):
+        """ Return (start, end) of the string value at `start`, whose content starts at `index` """
+        while True:
+            index = STRING_CONTENT_RE.match(self.buffer, index).end()
+            if index < len(self.buffer) and self.buffer[index] == '"':
+                return start, index + 1
+            # The buffer ends inside the string, or right after a backslash
+            dropped = self.more(start, index, keep)
+            start, index = start - dropped, index - dropped
+
+    def scan_value(self, keep=True):
+        """ Return (start, end) of the value at the current position """
+        start = self.pos
+        first = self.buffer[start]
+        if first == '"':
+            return self.string_end(start, start + 1, keep)
+        if first in '{[':
+            depth = 0
+            index = start
+            while True:
+                match = STRUCTURE_RE.search(self.buffer, index)
+                if not match:
+                    scanned = len(self.buffer)
+                    dropped = self.more(start, scanned, keep)
+                    start, index = start - dropped, scanned - dropped
+                    continue
+                char = match.group()
+                if char == '"':
+                    start, index = self.string_end(start, match.end(), keep)
+                    continue
+                index = match.end()
+                depth += 1 if char in '{[' else -1
+                if depth == 0:
+                    return start, index
+        # Number, true, false or null
+        while True:
+            match = SCALAR_END_RE.search(self.buffer, start)
+            if match:
+                return start, match.start()
+            if not self.fill():
+                # A page cannot end with a scalar, it is always inside the page object
+                raise self.error('incomplete value', truncated=True)
+
+    def read_value(self):
+        """ Decode the value at the current position """
+        start, end = self.scan_value()
+        try:
+            value = codec.loads(self.buffer[start:end])
+        except ValueError as err:
+            self.pos = start
+            raise self.error(str(err)) from None
+        self.pos = end
+        if self.pos > CHUNK_SIZE:
+            self.drop(self.pos)
+        return value
+
+    def skip_value(self):
+        """ Scan past the value at the current position without decoding it """
+        _, end = self.scan_value(keep=False)
+        self.pos = end
+        self.drop(self.pos)
+
+    def __iter__(self):
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+        else:
+            while True:
+                if self.peek() != '"':
+                    self.expect('"')
+                key = self.read_value()
+                self.expect(':')
+                char = self.peek()
+                if not char:
+                    raise self.error('expected a value', truncated=True)
+                if key == self.data_key and char == '[':
+                    self.has_data_key = True
+                    self.pos += 1
+                    if self.peek() == ']':
+                        self.pos += 1
+                    else:
+                        while True:
+                            if not self.peek():
+                                raise self.error('expected a record', truncated=True)
+                            record = self.read_value()
+                            self.record_count += 1
+                            yield record
+                            if self.expect(',]') == ']':
+                                break
+                elif key == self.data_key or key in self.keep_keys:
+                    self.values[key] = self.read_value()
+                else:
+                    self.skip_value()
+                if self.expect(',}') == '}':
+                    break
+        if self.peek():
+            raise self.error('extra data after the page')
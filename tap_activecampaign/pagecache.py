@@ -0,0 +1,80 @@
+import collections
+import threading
+
+# Memory bound of the response bodies kept for streams that share an endpoint path
+DEFAULT_PAGE_CACHE_MB = 64
+
+
+class PageCache(object):
+    """
+    Bounded cache of raw page bodies for the paths that several selected streams read,
+    e.g. `fields`, which holds the fields, fieldOptions and fieldRels of the same page.
+    Bodies are kept as bytes, so each stream decodes its own copy of the records.
+    A page is dropped once every stream sharing its path has read it, or when the cache
+    is over `max_bytes`, least recently used first.
+    :param paths: {path: number of streams reading it}
+    :param max_bytes: Total size of the cached bodies
+    """
+
+    def __init__(self, paths, max_bytes=DEFAULT_PAGE_CACHE_MB * 1024 * 1024):
+        self.paths = {path: readers for path, readers in paths.items() if readers > 1}
+        self.max_bytes = max_bytes
+        self.pages = collections.OrderedDict()
+        self.size = 0
+        self.fetching = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def is_cached(self, path):
+        return path in self.paths
+
+    def get(self, path, querystring, fetch):
+        """
+        Return the body of the page, from the cache or from `fetch()`. Threads asking for a
+        page that is being fetched wait for that request instead of sending their own.
+        """
+        key = (path, querystring)
+        while True:
+            with self.lock:
+                entry = self.pages.get(key)
+                if entry is not None:
+                    self.hits += 1
+                    self.read(key, entry)
+                    return entry[0]
+                event = self.fetching.get(key)
+                if event is None:
+                    event = self.fetching[key] = threading.Event()
+                    self.misses += 1
+                    break
+            # Once the other request is done the page is cached, or it failed and this thread fetches it
+            event.wait()
+
+        try:
+            content = fetch()
+            with self.lock:
+                self.put(key, content)
+            return content
+        finally:
+            with self.lock:
+                del self.fetching[key]
+            event.set()
+
+    def read(self, key, entry):
+        """ Count a read of a cached page and drop it after the last stream sharing the path """
+        entry[1] -= 1
+        if entry[1] <= 0:
+            del self.pages[key]
+            self.size -= len(entry[0])
+        else:
+            self.pages.move_to_end(key)
+
+    def put(self, key, content):
+        if len(content) > self.max_bytes:
+            return
+        # The fetching stream has read the page; the others still have to
+        self.pages[key] = [content, self.paths[key[0]] - 1]
+        self.size += len(content)
+        while self.size > self.max_bytes:
+            _, (evicted, _) = self.pages.popitem(last=False)
+            self.size -= len(evicted)
@@ -0,0 +1,69 @@
+import asyncio
+import threading
+import time
+
+# Rate limit: https://developers.activecampaign.com/reference#rate-limits
+DEFAULT_REQUESTS_PER_SECOND = 5
+DEFAULT_BURST = 1
+
+
+class TokenBucket(object):
+    """
+    Token bucket rate limiter shared by every thread (and event loop) using a client.
+    Tokens refill at `rate` per second up to `burst`. Each request reserves one token
+    under the lock; when the bucket is empty the reservation goes into debt and the
+    caller sleeps outside the lock until its token is due, so waiters are served in
+    the order they arrived.
+    :param rate: Tokens added per second
+    :param burst: Maximum number of tokens the bucket holds
+    :param clock: Monotonic clock, replaceable in tests
+    :param sleep: Blocking sleep used by `acquire`, replaceable in tests
+    """
+
+    def __init__(self, rate=DEFAULT_REQUESTS_PER_SECOND, burst=DEFAULT_BURST,
+                 clock=time.monotonic, sleep=time.sleep):
+        if rate <= 0:
+            raise ValueError('rate must be greater than 0, got {}'.format(rate))
+        if burst < 1:
+            raise ValueError('burst must be at least 1, got {}'.format(burst))
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.clock = clock
+        self.sleep = sleep
+        self.__lock = threading.Lock()
+        self.__tokens = self.burst
+        self.__updated = clock()
+        # Total time callers waited for a token, and how many of them had to wait
+        self.wait_seconds = 0.0
+        self.wait_count = 0
+        self.acquire_count = 0
+
+    def reserve(self):
+        """
+        Take a token and return the number of seconds the caller must wait before using it.
+        """
+        with self.__lock:
+            now = self.clock()
+            self.__tokens = min(self.burst, self.__tokens + (now - self.__updated) * self.rate)
+            self.__updated = now
+            self.__tokens -= 1
+            wait = 0.0 if self.__tokens >= 0 else -self.__tokens / self.rate
+            self.acquire_count += 1
+            if wait > 0:
+                self.wait_seconds += wait
+                self.wait_count += 1
+            return wait
+
+    def acquire(self):
+        """ Block until a token is available. Return the seconds waited. """
+        wait = self.reserve()
+        if wait > 0:
+            self.sleep(wait)
+        return wait
+
+    async def acquire_async(self):
+        """ Wait on the event loop until a token is available. Return the seconds waited. """
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
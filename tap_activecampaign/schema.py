@@ -1,47 +1,127 @@
 import os
 import json
+import hashlib
 import singer
 from singer import metadata
 from tap_activecampaign.streams import flatten_streams
 
 LOGGER = singer.get_logger()
 
+# All the stream schemas in one file, built from schemas/*.json by `python -m tap_activecampaign.schema`
+SCHEMA_BUNDLE = 'schemas.bundle.json'
+
 # Reference:
 # https://github.com/singer-io/getting-started/blob/master/docs/DISCOVERY_MODE.md#Metadata
 
 def get_abs_path(path):
     return os.path.join(os.path.dirname(os.path.realpath(__file__)), path)
 
-def get_schemas():
+def get_schema_path(stream_name):
+    return get_abs_path('schemas/{}.json'.format(stream_name))
+
+def hash_file(path):
+    with open(path, 'rb') as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+def get_file_hashes(stream_names):
+    """ Size and sha256 of each schema file, stored in the bundle when it is built """
+    return {stream_name: {'size': os.path.getsize(get_schema_path(stream_name)),
+                          'sha256': hash_file(get_schema_path(stream_name))}
+            for stream_name in stream_names}
+
+def is_bundle_fresh(files, stream_names, bundle_mtime):
+    """
+    Return True if the schema files are the ones the bundle was built from. Each file is only
+    stat'ed: a different size means it changed, and a file modified after the bundle (e.g. an
+    edit keeping the size) is hashed and compared with the hash stored at build time.
+    """
+    if set(files) != set(stream_names):
+        return False
+    for stream_name in stream_names:
+        path = get_schema_path(stream_name)
+        stat = os.stat(path)
+        if stat.st_size != files[stream_name]['size']:
+            return False
+        if stat.st_mtime > bundle_mtime and hash_file(path) != files[stream_name]['sha256']:
+            return False
+    return True
+
+def load_schema_files(stream_names):
     schemas = {}
-    field_metadata = {}
-
-    flat_streams = flatten_streams()
-    for stream_name, stream_metadata in flat_streams.items():
-        schema_path = get_abs_path('schemas/{}.json'.format(stream_name))
-        with open(schema_path) as file:
-            schema = json.load(file)
-        schemas[stream_name] = schema
-        mdata = metadata.new()
-
-        # Documentation:
-        # https://github.com/singer-io/getting-started/blob/master/docs/DISCOVERY_MODE.md#singer-python-helper-functions
-        # Reference:
-        # https://github.com/singer-io/singer-python/blob/master/singer/metadata.py#L25-L44
-        mdata = metadata.get_standard_metadata(
-            schema=schema,
-            key_properties=stream_metadata.get('key_properties', None),
-            valid_replication_keys=stream_metadata.get('replication_keys', None),
-            replication_method=stream_metadata.get('replication_method', None)
-        )
-        mdata = metadata.to_map(mdata)
-        # Loop through all keys and make replication keys of automatic inclusion
-        for field_name in schema['properties'].keys():
-            
-            if stream_metadata.get('replication_keys') and field_name in stream_metadata.get('replication_keys'):
-                mdata = metadata.write(mdata, ('properties', field_name), 'inclusion', 'automatic')
-
-        mdata = metadata.to_list(mdata)
-        field_metadata[stream_name] = mdata
+    for stream_name in stream_names:
+        with open(get_schema_path(stream_name)) as file:
+            schemas[stream_name] = json.load(file)
+    return schemas
+
+def build_schema_bundle(path=None):
+    """ Write the schemas of every stream, with the size and hash of their files, to the bundle """
+    path = path or get_abs_path(SCHEMA_BUNDLE)
+    stream_names = list(flatten_streams())
+    bundle = {
+        'files': get_file_hashes(stream_names),
+        'schemas': load_schema_files(stream_names)
+    }
+    tmp_path = '{}.tmp'.format(path)
+    with open(tmp_path, 'w') as file:
+        json.dump(bundle, file, indent=2)
+        file.write('\n')
+    os.replace(tmp_path, path)
+    return path
+
+def load_schema_bundle(stream_names, path=None):
+    """
+    Return the schemas of the bundle, or None if there is no bundle or it does not match the
+    schema files (a schema was edited, added or removed since the bundle was built)
+    """
+    path = path or get_abs_path(SCHEMA_BUNDLE)
+    try:
+        with open(path) as file:
+            bundle = json.load(file)
+            bundle_mtime = os.fstat(file.fileno()).st_mtime
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as err:
+        LOGGER.warning('Ignoring unreadable schema bundle {} ({})'.format(path, err))
+        return None
 
+    if set(bundle.get('schemas', {})) != set(stream_names) or \
+            not is_bundle_fresh(bundle.get('files', {}), stream_names, bundle_mtime):
+        LOGGER.warning('The schema bundle is stale, reading the schema files. '
+                       'Run `python -m tap_activecampaign.schema` to rebuild it.')
+        return None
+    return bundle['schemas']
+
+def get_field_metadata(schema, stream_metadata):
+    """ Return the metadata list of a stream for its schema and stream class attributes """
+    # Documentation:
+    # https://github.com/singer-io/getting-started/blob/master/docs/DISCOVERY_MODE.md#singer-python-helper-functions
+    # Reference:
+    # https://github.com/singer-io/singer-python/blob/master/singer/metadata.py#L25-L44
+    mdata = metadata.get_standard_metadata(
+        schema=schema,
+        key_properties=stream_metadata.get('key_properties', None),
+        valid_replication_keys=stream_metadata.get('replication_keys', None),
+        replication_method=stream_metadata.get('replication_method', None)
+    )
+    mdata = metadata.to_map(mdata)
+    # Loop through all keys and make replication keys of automatic inclusion
+    for field_name in schema['properties'].keys():
+
+        if stream_metadata.get('replication_keys') and field_name in stream_metadata.get('replication_keys'):
+            mdata = metadata.write(mdata, ('properties', field_name), 'inclusion', 'automatic')
+
+    return metadata.to_list(mdata)
+
+def load_schemas(flat_streams):
+    """ Return the schema of each stream, from the bundle if it is fresh, else from the schema files """
+    return load_schema_bundle(flat_streams) or load_schema_files(flat_streams)
+
+def get_schemas(flat_streams=None):
+    flat_streams = flat_streams or flatten_streams()
+    schemas = load_schemas(flat_streams)
+    field_metadata = {stream_name: get_field_metadata(schemas[stream_name], stream_metadata)
+                      for stream_name, stream_metadata in flat_streams.items()}
     return schemas, field_metadata
+
+if __name__ == '__main__':
+    LOGGER.info('Wrote {}'.format(build_schema_bundle()))
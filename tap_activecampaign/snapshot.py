@@ -0,0 +1,69 @@
+import hashlib
+import json
+import os
+import time
+import singer
+
+LOGGER = singer.get_logger()
+
+SKIP = 'skip'
+REPLAY = 'replay'
+
+
+def hash_content(content):
+    return hashlib.sha256(content).hexdigest()
+
+
+class SnapshotCache(object):
+    """
+    Local copy of the pages of small FULL_TABLE streams, one JSON file per stream in `directory`:
+    {"saved_at": <epoch seconds>, "pages": [{"querystring", "hash", "etag", "last_modified", "content"}]}
+    The content hash, and the ETag/Last-Modified validators when the API sends them, tell whether
+    the stream changed since the snapshot.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def get_path(self, stream_name):
+        return os.path.join(self.directory, '{}.json'.format(stream_name))
+
+    def load(self, stream_name):
+        """ Return the snapshot of the stream, or None if there is none or it cannot be read """
+        try:
+            with open(self.get_path(stream_name)) as snapshot_file:
+                return json.load(snapshot_file)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as err:
+            LOGGER.warning('Stream {}: ignoring unreadable snapshot ({})'.format(stream_name, err))
+            return None
+
+    def save(self, stream_name, pages):
+        """ Write the snapshot of the stream, replacing the previous one at once """
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.get_path(stream_name)
+        tmp_path = '{}.tmp'.format(path)
+        with open(tmp_path, 'w') as snapshot_file:
+            json.dump({'saved_at': time.time(), 'pages': pages}, snapshot_file)
+        os.replace(tmp_path, path)
+
+
+def make_page(querystring, content, etag=None, last_modified=None):
+    return {
+        'querystring': querystring,
+        'hash': hash_content(content),
+        'etag': etag,
+        'last_modified': last_modified,
+        'content': content.decode('utf-8'),
+    }
+
+
+def is_fresh(snapshot, max_age):
+    """ Return True if the snapshot was saved less than `max_age` seconds ago """
+    return bool(snapshot) and max_age > 0 and time.time() - snapshot.get('saved_at', 0) < max_age
+
+
+def is_unchanged(snapshot, pages):
+    """ Return True if the fetched pages have the same content as the snapshot """
+    return bool(snapshot) and [page['hash'] for page in pages] == [page['hash'] for page in snapshot['pages']]
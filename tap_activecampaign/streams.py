@@ -1,10 +1,36 @@
+import collections
+import datetime
+import functools
+import threading
+import time
+import typing
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
 import singer
-from singer import metrics, metadata, Transformer, utils
-from singer.utils import strptime_to_utc
-from tap_activecampaign.transform import transform_json
-from tap_activecampaign.client import ActiveCampaignClient
+from singer import metrics, metadata, utils
+from tap_activecampaign.transform import get_date_keys, prepare_record
+from tap_activecampaign.datetimes import ActiveCampaignTransformer, parse_datetime, transform_datetime
+from tap_activecampaign.snapshot import SnapshotCache, REPLAY, SKIP, is_fresh, is_unchanged, make_page
+from tap_activecampaign import changeindex, codec, timing, writer
+from tap_activecampaign.errors import ActiveCampaignBadRequestError, ActiveCampaignUnprocessableEntityError
+
+# The client (and its HTTP stack) is only imported to sync, discovery does not need it
+if typing.TYPE_CHECKING:
+    from tap_activecampaign.client import ActiveCampaignClient
 
 LOGGER = singer.get_logger()
+
+# Server-side filters may compare dates in the account's timezone rather than UTC, so they
+#  are sent one day before the bookmark. process_records still drops the older records.
+BOOKMARK_QUERY_LOOKBACK = datetime.timedelta(days=1)
+
+# Defaults for writing the bookmark while paging streams sorted by bookmark
+DEFAULT_CHECKPOINT_PAGES = 100
+DEFAULT_CHECKPOINT_SECONDS = 300
+
+# Parent records whose children can be queued before the parent stream waits for the child syncs
+CHILD_QUEUE_SIZE = 1000
+
 # streams: API URL endpoints to be called
 # properties:
 #   <root node>: Plural stream name for the endpoint
@@ -15,10 +41,370 @@ LOGGER = singer.get_logger()
 #        and setting the state
 #   params: Query, sort, and other endpoint specific parameters
 #   data_key: JSON element containing the records for the endpoint
-#   bookmark_query_field: Typically a date-time field used for filtering the query
+#   bookmark_query_field: Query param used to filter the results on the server by the bookmark
+#        date, e.g. filters[updated_after] or filters[<replication_key>][gt]. If the endpoint
+#        rejects it, the stream falls back to filtering all records in process_records.
+#   bookmark_sort_param: Query param that sorts the results by the bookmark, e.g. orders[udate].
+#        With a bookmark_query_field filters[<replication_key>][gt], pages are requested in
+#        ascending order after the last safe bookmark (see move_cursor) instead of by offset, so
+#        records updated while paging do not shift the pages, and the bookmark can be saved while
+#        paging. The sort is only sent in that mode; other streams keep the default order.
+#   pagination: 'offset' (offset/limit) or 'keyset'. Keyset pages are requested in ascending id
+#        order (keyset_order_param) after the last id seen (keyset_filter_param), so deep pages
+#        cost the same as the first one. Falls back to offset if the ids are not ascending.
 #   bookmark_type: Data type for bookmark, integer or datetime
 #   children: A collection of child endpoints (where the endpoint path includes the parent id)
 #   parent: On each of the children, the singular stream name for parent element
+#   include: On a FULL_TABLE child, the relation sideloaded with include=<include> on the parent
+#        endpoint. With the `sideload` config, the child records are read from the parent page
+#        (under the child's data_key) instead of being requested for each parent.
+#   include_parent_keys: API fields of a sideloaded child record holding its parent id
+#   snapshot: Small FULL_TABLE reference stream that can be synced through a local snapshot of
+#        its pages (see sync_snapshot), with the `snapshot_dir` config
+
+def get_bool_config(config, key):
+    """ Read a boolean config value that may also be given as "true"/"false". """
+    value = config.get(key)
+    if isinstance(value, str):
+        return value.lower() == 'true'
+    return bool(value)
+
+
+class CheckpointInterval:
+    """
+    Decide when a checkpoint is due while paging a stream.
+    :param pages: Save at most every `pages` pages
+    :param seconds: ... or once `seconds` have passed since the last save
+    """
+
+    def __init__(self, pages=DEFAULT_CHECKPOINT_PAGES, seconds=DEFAULT_CHECKPOINT_SECONDS):
+        self.pages = pages
+        self.seconds = seconds
+        self.pages_since_save = 0
+        self.saved_at = time.monotonic()
+
+    def page_done(self):
+        self.pages_since_save += 1
+
+    def is_due(self):
+        return self.pages_since_save >= self.pages or time.monotonic() - self.saved_at >= self.seconds
+
+    def saved(self):
+        self.pages_since_save = 0
+        self.saved_at = time.monotonic()
+
+
+class BookmarkCheckpoint(CheckpointInterval):
+    """
+    Track the bookmark that is safe to save while a stream is paged in ascending bookmark order.
+    Once a value greater than the previous one is seen, every record with the previous value
+    has been processed, so that value is safe. The highest value itself is not, because more
+    records with that value may be on the next page.
+    Checkpointing only starts once the endpoint is verified to honour the sort param (see
+    `is_sort_honoured`), and is turned off for the rest of the stream if any record arrives out
+    of order.
+    """
+
+    def __init__(self, pages=DEFAULT_CHECKPOINT_PAGES, seconds=DEFAULT_CHECKPOINT_SECONDS):
+        super().__init__(pages, seconds)
+        # None until the first page is compared with the same page sorted in descending order
+        self.verified = None
+        self.ordered = True
+        self.last_value = None
+        self.safe_value = None
+        self.saved_value = None
+
+    def add_page(self, values):
+        """
+        Add the normalized bookmark values of a page, in the order the records were returned
+        """
+        for value in values:
+            if value is None or (self.last_value is not None and value < self.last_value):
+                self.ordered = False
+                return
+            if self.last_value is not None and value > self.last_value:
+                self.safe_value = self.last_value
+            self.last_value = value
+        self.page_done()
+
+    def get_value_to_save(self):
+        """
+        Return the bookmark to save if a checkpoint is due and it moved forward, else None
+        """
+        if not self.ordered or self.safe_value is None or self.safe_value == self.saved_value:
+            return None
+        if not self.is_due():
+            return None
+        self.saved_value = self.safe_value
+        self.saved()
+        return self.saved_value
+
+
+def is_sort_honoured(asc_values, desc_values):
+    """
+    Return True if the bookmark values of the first page requested in ascending order and of
+    the same page requested in descending order show that the endpoint sorts by the bookmark.
+    Pages that ascend by chance (e.g. sorted by id) come back in the same order for both, so at
+    least two distinct values are needed, and the descending page must start at the top.
+    """
+    if None in asc_values or None in desc_values or len(set(asc_values) | set(desc_values)) < 2:
+        return False
+    if asc_values != sorted(asc_values) or desc_values != sorted(desc_values, reverse=True):
+        return False
+    return desc_values[0] >= asc_values[-1] and desc_values[0] > asc_values[0]
+
+
+class SyncContext:
+    """
+    Catalog schema, metadata and transformer of a stream, built once per sync instead of
+    for every page and record, and the per-stream settings of the record pipeline.
+    """
+    def __init__(self, catalog, stream_name, bookmark_field=None, last_datetime=None,
+                 created_timestamp=None, key_properties=None):
+        stream = catalog.get_stream(stream_name)
+        self.catalog = catalog
+        self.schema = stream.schema.to_dict()
+        self.metadata = metadata.to_map(stream.metadata)
+        self.transformer = ActiveCampaignTransformer()
+        self.bookmark_field = bookmark_field
+        self.last_datetime = last_datetime
+        # Bookmarks are compared as UTC datetimes, parsed once per stream
+        self.last_dttm = parse_datetime(last_datetime)
+        # Fallback for an empty bookmark, e.g. the update date of a new record
+        self.created_timestamp = created_timestamp
+        self.key_properties = key_properties or []
+        # Keys checked for the 0000-00-00 00:00:00 placeholder
+        self.date_keys = get_date_keys(self.schema)
+
+    def prepare(self, record):
+        """
+        Decamelize and fix the API record in place and fill an empty bookmark from the created timestamp
+        """
+        prepare_record(record, self.schema, self.date_keys)
+        bookmark_field = self.bookmark_field
+        if bookmark_field and not record.get(bookmark_field):
+            record[bookmark_field] = record.get(self.created_timestamp) if self.created_timestamp else None
+        return record
+
+    def transform(self, record):
+        """ Transform the record to the stream schema """
+        # The transformer keeps the errors of failed types; only report this record's errors
+        self.transformer.errors = []
+        return self.transformer.transform(record, self.schema, self.metadata)
+
+    def close(self):
+        """ Log the paths removed or filtered over the whole sync """
+        self.transformer.log_warning()
+
+
+def prune_child_index(index, last_datetime):
+    """
+    Remove the parents up to the parent bookmark `last_datetime` from a child index:
+    they are not written again, so their children are not synced again either
+    """
+    last_dttm = parse_datetime(last_datetime)
+    if not last_dttm:
+        return
+    for parent_id, value in list(index.items()):
+        value_dttm = parse_datetime(value)
+        if value_dttm is None or value_dttm <= last_dttm:
+            del index[parent_id]
+
+
+class ChildFetcher:
+    """
+    Sync the selected child streams of each parent record, e.g. the products of each order.
+    With `max_workers` > 1 the children of each parent are synced on a pool of worker threads
+    while the parent stream keeps paging. Each worker has its own child stream objects and every
+    request goes through the parent's client, so the pool shares its rate limit. Each child sync
+    writes its records as they are processed, through `writer`.
+    At most CHILD_QUEUE_SIZE parents are queued; `wait` returns once all of them are synced.
+    With an `index_field` (the parent bookmark), the state keeps the bookmark of each parent
+    whose children were synced after the last saved parent bookmark, and the children are
+    skipped when the parent is written again unchanged (e.g. when an interrupted sync resumes).
+    """
+    def __init__(self, parent_stream, children, catalog, state, start_date, selected_streams, max_workers=1,
+                 index_field=None, last_datetime=None):
+        self.parent_stream = parent_stream
+        self.child_stream_names = [name for name in children if name in (selected_streams or [])]
+        self.catalog = catalog
+        self.state = state
+        self.start_date = start_date
+        self.selected_streams = selected_streams
+        self.local = threading.local()
+        self.streams = []
+        self.streams_lock = threading.Lock()
+        self.schemas_written = False
+        self.pending = collections.deque()
+        self.executor = None
+        if max_workers > 1 and self.child_stream_names:
+            self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='child-sync')
+        self.index_field = index_field
+        self.indexes = {}
+        self.skipped = 0
+        if index_field and self.child_stream_names:
+            self.load_indexes(last_datetime)
+
+    def load_indexes(self, last_datetime):
+        """
+        Get the parent id -> parent bookmark index of each child stream from the state.
+        Parents up to the saved parent bookmark are not written again, so they are removed.
+        """
+        with writer.STATE_LOCK:
+            child_index = self.state.setdefault('child_index', {})
+            for child_stream_name in self.child_stream_names:
+                index = child_index.setdefault(child_stream_name, {})
+                prune_child_index(index, last_datetime)
+                self.indexes[child_stream_name] = index
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            # Do not start the queued children; running ones finish before the error is raised
+            self.cancel()
+
+    def get_stream(self, child_stream_name):
+        """ Return the child stream object of the current thread """
+        streams = getattr(self.local, 'streams', None)
+        if streams is None:
+            streams = self.local.streams = {}
+        if child_stream_name not in streams:
+            stream = STREAMS[child_stream_name](self.parent_stream.client, self.parent_stream.config)
+            streams[child_stream_name] = stream
+            with self.streams_lock:
+                self.streams.append(stream)
+        return streams[child_stream_name]
+
+    def sync_parent(self, child_stream_name, parent_id, parent_value=None):
+        """ Sync one child stream of one parent record, then add the parent to the index """
+        child_stream_obj = self.get_stream(child_stream_name)
+        LOGGER.info(
+            'START Sync for Stream: {}, parent_stream: {}, parent_id: {}'\
+                .format(child_stream_name, self.parent_stream.stream_name, parent_id))
+        child_path = child_stream_obj.path.format(str(parent_id))
+
+        child_total_records = child_stream_obj.sync(
+            client=self.parent_stream.client,
+            catalog=self.catalog,
+            state=self.state,
+            start_date=self.start_date,
+            path=child_path,
+            selected_streams=self.selected_streams,
+            parent=child_stream_obj.parent,
+            parent_id=parent_id)
+        LOGGER.info(
+            'FINISHED Sync for Stream: {}, parent_id: {}, total_records: {}'\
+                .format(child_stream_name, parent_id, child_total_records))
+        index = self.indexes.get(child_stream_name)
+        if index is not None and parent_value:
+            with writer.STATE_LOCK:
+                index[str(parent_id)] = parent_value
+        return child_total_records
+
+    def submit(self, records, data=None):
+        """
+        Sync the children of a page of parent records, or queue them on the worker threads.
+        Children sideloaded in the page `data` are written from it right away.
+        Raises the error of a failed child sync.
+        """
+        if not self.child_stream_names:
+            return
+        if not self.schemas_written:
+            for child_stream_name in self.child_stream_names:
+                LOGGER.info('START Syncing: {}'.format(child_stream_name))
+                self.get_stream(child_stream_name).write_schema(self.catalog, child_stream_name)
+            self.schemas_written = True
+
+        sideloaded = []
+        if data is not None:
+            for child_stream_name in list(self.parent_stream.sideloaded):
+                child_data_key = STREAMS[child_stream_name].data_key
+                if child_data_key in data:
+                    self.sync_sideloaded(child_stream_name, records, data[child_data_key])
+                    sideloaded.append(child_stream_name)
+                else:
+                    LOGGER.warning('Stream {}: the page has no sideloaded {}, requesting {} for each parent'.format(
+                        self.parent_stream.stream_name, child_data_key, child_stream_name))
+                    self.parent_stream.sideloaded.remove(child_stream_name)
+        requested = [name for name in self.child_stream_names if name not in sideloaded]
+
+        for record in records:
+            parent_id = self.parent_stream.get_parent_id(record)
+            parent_value = transform_datetime(record.get(self.index_field)) if self.index_field else None
+            for child_stream_name in requested:
+                index = self.indexes.get(child_stream_name)
+                if index is not None and parent_value and index.get(str(parent_id)) == parent_value:
+                    # The children were synced since the parent last changed
+                    self.skipped += 1
+                    continue
+                if self.executor is None:
+                    self.sync_parent(child_stream_name, parent_id, parent_value)
+                    continue
+                # Collect finished child syncs (raising their errors) and wait while the queue is full
+                while self.pending and (self.pending[0].done() or len(self.pending) >= CHILD_QUEUE_SIZE):
+                    self.pending.popleft().result()
+                self.pending.append(self.executor.submit(self.sync_parent, child_stream_name, parent_id, parent_value))
+
+    def sync_sideloaded(self, child_stream_name, records, child_records):
+        """
+        Write the sideloaded child records of each parent record, as sync_parent would write
+        the records requested from the child endpoint
+        """
+        child_stream_obj = self.get_stream(child_stream_name)
+        records_by_parent = collections.defaultdict(list)
+        for child_record in child_records:
+            for key in child_stream_obj.include_parent_keys:
+                if child_record.get(key) is not None:
+                    records_by_parent[str(child_record[key])].append(child_record)
+                    break
+
+        time_extracted = utils.now()
+        child_total_records = 0
+        for record in records:
+            parent_id = self.parent_stream.get_parent_id(record)
+            _, record_count = child_stream_obj.process_records(
+                catalog=self.catalog,
+                stream_name=child_stream_name,
+                records=records_by_parent.get(str(parent_id), []),
+                time_extracted=time_extracted,
+                parent=child_stream_obj.parent,
+                parent_id=parent_id)
+            child_total_records += record_count
+        LOGGER.info('Stream: {}, {} sideloaded records of {} parents'.format(
+            child_stream_name, child_total_records, len(records)))
+
+    def wait(self):
+        """ Wait until the children of every submitted parent are synced """
+        while self.pending:
+            self.pending.popleft().result()
+
+    def cancel(self):
+        """ Drop the queued child syncs and wait for the running ones """
+        for future in self.pending:
+            future.cancel()
+        self.pending.clear()
+        if self.executor:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
+    def close(self):
+        """ Wait for the queued child syncs and log the transform warnings of the child streams """
+        try:
+            self.wait()
+        finally:
+            self.cancel()
+        for stream in self.streams:
+            if stream.context:
+                stream.context.close()
+                stream.context = None
+        if self.skipped:
+            LOGGER.info('Stream {}: skipped {} child syncs of unchanged parents'.format(
+                self.parent_stream.stream_name, self.skipped))
+
 
 class ActiveCampaign:
     """
@@ -36,11 +422,35 @@ class ActiveCampaign:
     data_key = None
     created_timestamp = None
     bookmark_query_field = None
+    bookmark_sort_param = None
+    pagination = 'offset'
+    keyset_order_param = 'orders[id]'
+    keyset_filter_param = 'filters[id][gt]'
     links = []
     children = []
+    include = None
+    include_parent_keys = []
+    snapshot = False
     
-    def __init__(self, client: ActiveCampaignClient = None):
+    def __init__(self, client: 'ActiveCampaignClient' = None, config=None):
         self.client = client
+        self.config = config or {}
+        self.checkpoint = None
+        self.offset_checkpoint = None
+        self.keyset_pagination = False
+        # After falling back from keyset to offset pagination, keep paging in id order
+        self.keyset_ordered = False
+        self.last_id = None
+        self.keyset_offset = 0
+        # Pages sorted by bookmark: the bookmark the next page starts after, the offset within
+        #  that bookmark, and the records with the last bookmark of the page, to skip on the next page
+        self.bookmark_pagination = False
+        self.cursor_value = None
+        self.cursor_offset = 0
+        self.cursor_seen = {}
+        self.context = None
+        self.child_fetcher = None
+        self.sideloaded = []
 
     def write_schema(self, catalog, stream_name):
         """ 
@@ -54,7 +464,7 @@ class ActiveCampaign:
             # schema = {'properties': {'id': {'type': 'integer'}, 'email': {'type': 'string'}}}
             # key_properties = ['id']
             # write_schema(stream, schema, key_properties)
-            singer.write_schema(stream_name, schema, stream.key_properties)
+            writer.write_schema(stream_name, schema, stream.key_properties)
         except OSError as err:
             LOGGER.error('OS Error while writing schema for: {}'.format(stream_name))
             raise err
@@ -65,7 +475,7 @@ class ActiveCampaign:
         Example: write_record("users", {"id": 2, "email": "mike@stitchdata.com"})
         """
         try:
-            singer.messages.write_record(stream_name, record, time_extracted=time_extracted)
+            writer.write_record(stream_name, record, time_extracted=time_extracted)
         except OSError as err:
             LOGGER.error('OS Error while writing record for: {}'.format(stream_name))
             LOGGER.error('Stream: {}, record: {}'.format(stream_name, record))
@@ -91,19 +501,199 @@ class ActiveCampaign:
 
     def write_bookmark(self, state, stream, value):
         """ Write bookmark in state. """
-        if 'bookmarks' not in state:
-            state['bookmarks'] = {}
-        state['bookmarks'][stream] = value
-        LOGGER.info('Write state for stream: {}, value: {}'.format(stream, value))
-        singer.write_state(state)
+        # The bookmark must not get ahead of the children of the parents before it
+        self.wait_for_children()
+        with writer.STATE_LOCK:
+            if 'bookmarks' not in state:
+                state['bookmarks'] = {}
+            state['bookmarks'][stream] = value
+            if stream == self.stream_name:
+                # The state only keeps the child index of the parents after the bookmark
+                child_index = state.get('child_index', {})
+                for child_stream_name in self.children:
+                    if child_index.get(child_stream_name):
+                        prune_child_index(child_index[child_stream_name], value)
+            LOGGER.info('Write state for stream: {}, value: {}'.format(stream, value))
+            writer.write_state(state)
+
+    def write_checkpoint(self, state, last_datetime, records, bookmark_field, path, querystring, data):
+        """
+        Add a page of a stream sorted by bookmark to the checkpoint and save the safe bookmark when due.
+        `data` is the API page, whose meta.total tells whether more pages follow.
+        """
+        if not self.bookmark_pagination:
+            # The endpoint rejected the sort param
+            self.checkpoint.ordered = False
+            return
+        values = [self.transform_datetime(record.get(bookmark_field)) for record in records]
+        if self.checkpoint.verified is None:
+            if int(data.get('meta', {}).get('total', 0)) <= len(records):
+                # A single page: the bookmark is written after it anyway, no need to verify the sort
+                return
+            self.checkpoint.verified = self.verify_sort(path, querystring, bookmark_field, values)
+            if not self.checkpoint.verified:
+                LOGGER.warning('Stream {}: the endpoint does not sort by {}, the bookmark is written after the last page'.format(
+                    self.stream_name, bookmark_field))
+                self.checkpoint.ordered = False
+                return
+        self.checkpoint.add_page(values)
+        if not self.checkpoint.ordered:
+            LOGGER.warning('Stream {}: records are not sorted by {}, the bookmark is written after the last page'.format(
+                self.stream_name, bookmark_field))
+            return
+        checkpoint_value = self.checkpoint.get_value_to_save()
+        # Early pages of an unfiltered stream are older than the bookmark; never move it back
+        if checkpoint_value and checkpoint_value > self.transform_datetime(last_datetime):
+            self.write_bookmark(state, self.stream_name, checkpoint_value)
+
+    def verify_sort(self, path, querystring, bookmark_field, values):
+        """
+        Request the first page again in descending bookmark order and return True if the endpoint
+        honours `bookmark_sort_param`, so records ascending by chance do not enable checkpoints
+        """
+        asc_param = '{}=ASC'.format(self.bookmark_sort_param)
+        if asc_param not in querystring.split('&'):
+            return False
+        desc_querystring = '&'.join('{}=DESC'.format(self.bookmark_sort_param) if param == asc_param else param
+                                    for param in querystring.split('&'))
+        try:
+            data = self.client.get(path=path, params=desc_querystring, endpoint=self.stream_name)
+        except Exception as err: # pylint: disable=broad-except
+            LOGGER.warning('Stream {}: could not verify the sort order ({})'.format(self.stream_name, err))
+            return False
+        desc_values = [self.transform_datetime(prepare_record(record).get(bookmark_field))
+                       for record in self.get_records(data or {})]
+        return is_sort_honoured(values, desc_values)
+
+    def get_offset_checkpoint(self, state):
+        """ Return the offset checkpoint saved for a FULL_TABLE stream, if any. """
+        return (state or {}).get('offsets', {}).get(self.stream_name)
+
+    def write_offset_checkpoint(self, state, offset, total):
+        """
+        Save the next offset to request and the meta.total seen while paging a FULL_TABLE stream.
+        Pass offset None to remove the checkpoint once the stream is complete.
+        """
+        self.wait_for_children()
+        with writer.STATE_LOCK:
+            offsets = state.setdefault('offsets', {})
+            if offset is None:
+                offsets.pop(self.stream_name, None)
+            else:
+                offsets[self.stream_name] = {'offset': offset, 'total': total}
+                if self.keyset_pagination:
+                    offsets[self.stream_name]['last_id'] = self.last_id
+            LOGGER.info('Write offset checkpoint for stream: {}, offset: {}, total: {}'.format(
+                self.stream_name, offset, total))
+            writer.write_state(state)
+
+    def get_change_index(self):
+        """
+        Return the change index if the stream writes only new or changed records: the streams
+        in `change_index_streams`, or every FULL_TABLE stream if it is not set
+        """
+        change_index = changeindex.INDEX
+        if change_index is None:
+            return None
+        stream_names = self.config.get('change_index_streams')
+        if stream_names:
+            if isinstance(stream_names, str):
+                stream_names = [stream_name.strip() for stream_name in stream_names.split(',')]
+            return change_index if self.stream_name in stream_names else None
+        return change_index if self.replication_method == 'FULL_TABLE' else None
+
+    def wait_for_children(self):
+        """ Wait until the children of every parent record processed so far are synced """
+        if self.child_fetcher:
+            self.child_fetcher.wait()
+
+    def get_sideloaded_children(self, selected_streams):
+        """
+        Return the selected children read from the sideloads of this stream's pages, with the `sideload` config
+        """
+        if not get_bool_config(self.config, 'sideload'):
+            return []
+        return [name for name in self.children
+                if name in (selected_streams or []) and STREAMS[name].include
+                and STREAMS[name].replication_method == 'FULL_TABLE']
+
+    def get_parent_id(self, record):
+        """ Return the id of a parent record: its `id`, else its first key property """
+        id_fields = self.key_properties
+        parent_id_field = 'id' if 'id' in id_fields else id_fields[0]
+        return record.get(parent_id_field)
+
+    def get_record_key(self, record):
+        """ Return the key property values of a (prepared) record """
+        return tuple(record.get(key) for key in self.key_properties)
+
+    def move_cursor(self, records, bookmark_field):
+        """
+        Move the bookmark cursor past a page of records sorted by bookmark (prepared in place).
+        The next page is requested after the highest bookmark below the last bookmark of the page,
+        from offset 0, so records updated while paging move to the end instead of shifting the
+        pages. The records with the last bookmark are requested again and skipped if unchanged.
+        If the whole page has one bookmark, the next page is the next offset after the cursor.
+        """
+        values = [self.transform_datetime(record.get(bookmark_field)) for record in records]
+        last_value = values[-1]
+        below = [index for index, value in enumerate(values) if value < last_value]
+        if below:
+            self.cursor_value = records[below[-1]][bookmark_field]
+            self.cursor_offset = 0
+            self.cursor_seen = {}
+        else:
+            self.cursor_offset += len(records)
+        for record, value in zip(records, values):
+            if value == last_value:
+                self.cursor_seen[self.get_record_key(record)] = record.get(bookmark_field)
+
+    def get_resume_offset(self, state, path):
+        """
+        Return the (offset, total) to resume a FULL_TABLE stream from, or (0, 0) to start over.
+        The stream resumes only if meta.total moved by at most `offset_checkpoint_tolerance`
+        records since the checkpoint, as rows added or deleted before the offset shift the pages.
+        """
+        checkpoint = self.get_offset_checkpoint(state)
+        if not checkpoint:
+            return 0, 0
+
+        if self.keyset_pagination and checkpoint.get('last_id') is not None:
+            # Rows added or deleted before the last id do not shift keyset pages
+            self.last_id = checkpoint['last_id']
+            LOGGER.info('Stream {}: resuming after id {}'.format(self.stream_name, self.last_id))
+            return checkpoint['offset'], checkpoint['offset']
+
+        data = self.get_page(path, self.get_querystring(0, 1, None))
+        total = int((data or {}).get('meta', {}).get('total', 0))
+        tolerance = int(self.config.get('offset_checkpoint_tolerance') or 0)
+        if abs(total - checkpoint['total']) > tolerance:
+            LOGGER.info('Stream {}: total records moved from {} to {}, restarting at offset 0'.format(
+                self.stream_name, checkpoint['total'], total))
+            return 0, 0
+
+        LOGGER.info('Stream {}: resuming at offset {} of {} total records'.format(
+            self.stream_name, checkpoint['offset'], total))
+        return checkpoint['offset'], total
 
     def transform_datetime(self, this_dttm):
         """
         Transform the datetime to standard datetime format "%Y-%m%dT%H:%M:%S.000000Z"
         """
-        with Transformer() as transformer:
-            new_dttm = transformer._transform_datetime(this_dttm)
-        return new_dttm
+        return transform_datetime(this_dttm)
+
+    def get_sync_context(self, catalog, bookmark_field=None, last_datetime=None):
+        """
+        Return the sync context of the stream, reusing it while the catalog and bookmark are the same
+        (e.g. for each parent of a child stream).
+        """
+        context = self.context
+        if context is None or context.catalog is not catalog or context.last_datetime != last_datetime:
+            if context:
+                context.close()
+            self.context = SyncContext(catalog, self.stream_name, bookmark_field, last_datetime,
+                                       self.created_timestamp, self.key_properties)
+        return self.context
 
     def process_records(self,
                         catalog, #pylint: disable=too-many-branches
@@ -114,58 +704,121 @@ class ActiveCampaign:
                         max_bookmark_value=None,
                         last_datetime=None,
                         parent=None,
-                        parent_id=None):
+                        parent_id=None,
+                        emitted_records=None,
+                        skip_records=None):
         """
-        This function perform following operation,
+        This function perform following operation, in one pass over each API record,
+        • Decamelize the keys, remove links and set zero dates to None (in place)
+        • Set an empty bookmark to the created timestamp and verify the key fields
         • Transform all the records
         • Update bookmark value to replication key value of record if it is greater than last bookmark value
         • Write only those records of which replication key value is after bookmark value of the last sync for incremental stream.
         • Write all records for FULL_TABLE stream
+        • Append the API records that were written to `emitted_records`, if given
+        • Skip the records of `skip_records` ({key values: bookmark}) that still have the same bookmark
         • Return updated maximum bookmark value and total count of records
         """
-        stream = catalog.get_stream(stream_name)
-        schema = stream.schema.to_dict()
-        stream_metadata = metadata.to_map(stream.metadata)
+        context = self.get_sync_context(catalog, bookmark_field, last_datetime)
+        last_dttm = context.last_dttm
+        max_bookmark_dttm = parse_datetime(max_bookmark_value)
+        # With a change index, the records to write are collected and looked up once per page
+        change_index = self.get_change_index()
+        pending = []
+
+        # Time of each stage of the page, added to the timings of the stream once per page
+        clock = time.perf_counter
+        started, started_cpu = clock(), time.thread_time()
+        prepare_seconds = transform_seconds = bookmark_seconds = write_seconds = change_index_seconds = 0.0
+        processed = 0
 
         with metrics.record_counter(stream_name) as counter:
+
+            def emit(transformed_record, record):
+                nonlocal write_seconds
+                write_started = clock()
+                self.write_record(stream_name, transformed_record, time_extracted=time_extracted)
+                write_seconds += clock() - write_started
+                counter.increment()
+                if emitted_records is not None:
+                    emitted_records.append(record)
+
             for record in records:
+                record_started = clock()
+                processed += 1
+                context.prepare(record)
+                # Verify key id_fields are present
+                for key in context.key_properties:
+                    if not record.get(key):
+                        LOGGER.error('Stream: {}, Missing key {} in record: {}'.format(
+                            self.stream_name, key, record))
+                        raise RuntimeError
+                if skip_records and skip_records.get(self.get_record_key(record)) == record.get(bookmark_field):
+                    # Already written from the previous page, unchanged since
+                    continue
+
                 # If child object, add parent_id to record
                 if parent_id and parent:
                     record[parent + '_id'] = parent_id
 
+                transform_started = clock()
+                prepare_seconds += transform_started - record_started
                 # Transform record for Singer.io
-                with Transformer() as transformer:
-                    try:
-                        transformed_record = transformer.transform(
-                            record,
-                            schema,
-                            stream_metadata)
-                    except Exception as err:
-                        LOGGER.error('Transformer Error: {}'.format(err))
-                        LOGGER.error('Stream: {}, record: {}'.format(stream_name, record))
-                        raise err
-
-                    # Reset max_bookmark_value to new value if higher
-                    if transformed_record.get(bookmark_field):
-                        if max_bookmark_value is None or \
-                            transformed_record[bookmark_field] > self.transform_datetime(max_bookmark_value):
-                            max_bookmark_value = transformed_record[bookmark_field]
-
-                    # If bookmark_field is not none that means stream is incremental.
-                    # So, in that case, the tap writes only those records of which the replication key value is greater than last saved bookmark key value
-                    # For, FULL_TABLE stream bookmark_field is none. So, in the `else` part it writes all records for the FULL_TABLE stream
-                    if bookmark_field and (bookmark_field in transformed_record):
-                        last_dttm = self.transform_datetime(last_datetime)
-                        bookmark_dttm = self.transform_datetime(transformed_record[bookmark_field])
-                        # Keep only records whose bookmark is after the last_datetime
-                        if bookmark_dttm:
-                            if bookmark_dttm > last_dttm:
-                                self.write_record(stream_name, transformed_record, \
-                                    time_extracted=time_extracted)
-                                counter.increment()
-                    else:
-                        self.write_record(stream_name, transformed_record, time_extracted=time_extracted)
-                        counter.increment()
+                try:
+                    transformed_record = context.transform(record)
+                except Exception as err:
+                    LOGGER.error('Transformer Error: {}'.format(err))
+                    LOGGER.error('Stream: {}, record: {}'.format(stream_name, record))
+                    raise err
+
+                bookmark_started = clock()
+                transform_seconds += bookmark_started - transform_started
+                bookmark_dttm = parse_datetime(transformed_record.get(bookmark_field)) if bookmark_field else None
+
+                # Reset max_bookmark_value to new value if higher
+                if bookmark_dttm:
+                    if max_bookmark_dttm is None or bookmark_dttm > max_bookmark_dttm:
+                        max_bookmark_value = transformed_record[bookmark_field]
+                        max_bookmark_dttm = bookmark_dttm
+                bookmark_seconds += clock() - bookmark_started
+
+                # If bookmark_field is not none that means stream is incremental.
+                # So, in that case, the tap writes only those records of which the replication key value is greater than last saved bookmark key value
+                # For, FULL_TABLE stream bookmark_field is none. So, in the `else` part it writes all records for the FULL_TABLE stream
+                if bookmark_field and (bookmark_field in transformed_record):
+                    # Keep only records whose bookmark is after the last_datetime
+                    if bookmark_dttm:
+                        if bookmark_dttm > last_dttm:
+                            if change_index:
+                                pending.append((transformed_record, record))
+                                continue
+                            emit(transformed_record, record)
+                else:
+                    if change_index:
+                        pending.append((transformed_record, record))
+                        continue
+                    emit(transformed_record, record)
+
+            if pending:
+                # Write only the new or changed records
+                change_index_started = clock()
+                changed, rows = change_index.filter_changed(
+                    stream_name, [transformed_record for transformed_record, _ in pending], context.key_properties)
+                change_index_seconds += clock() - change_index_started
+                for index in changed:
+                    emit(*pending[index])
+                change_index_started = clock()
+                change_index.save_when_delivered(rows)
+                change_index_seconds += clock() - change_index_started
+
+            timing.add(stream_name, 'process_records', clock() - started, time.thread_time() - started_cpu)
+            timing.add(stream_name, 'prepare', prepare_seconds, count=processed)
+            timing.add(stream_name, 'transform', transform_seconds, count=processed)
+            timing.add(stream_name, 'bookmark', bookmark_seconds, count=processed)
+            if pending:
+                timing.add(stream_name, 'change_index', change_index_seconds, count=len(pending))
+            timing.add(stream_name, 'write', write_seconds, count=counter.value)
+            timing.add_records(stream_name, counter.value)
 
             # return maximum bookmark value and total no of records
             return max_bookmark_value, counter.value
@@ -183,8 +836,6 @@ class ActiveCampaign:
             parent=None,
             parent_id=None):
 
-        static_params = self.params
-        bookmark_query_field = self.bookmark_query_field
         bookmark_field = next(iter(self.replication_keys or []), None)
         # Get the latest bookmark for the stream and set the last_integer/datetime
         last_datetime = None
@@ -194,9 +845,12 @@ class ActiveCampaign:
         max_bookmark_value = last_datetime
         LOGGER.info('stream: {}, bookmark_field: {}, last_datetime: {}'.format(
             self.stream_name, bookmark_field, last_datetime))
-        now_datetime = utils.now()
-        last_dttm = strptime_to_utc(last_datetime)
         endpoint_total = 0
+        # Schema, metadata and transformer are shared by every page of the stream
+        self.get_sync_context(catalog, bookmark_field, last_datetime)
+
+        if self.snapshot and not parent_id and self.config.get('snapshot_dir'):
+            return self.sync_snapshot(catalog, path, last_datetime)
 
         # pagination: loop thru all pages of data
         # Pagination reference: https://developers.activecampaign.com/reference#pagination
@@ -209,132 +863,342 @@ class ActiveCampaign:
         record_count = limit # Initialize, reset for each API call
         page = 1
 
-        while offset <= total_records: # break out of loop when record_count < limit (or not data returned)
-            params = {
-                'offset': offset,
-                'limit': limit,
-                **static_params # adds in endpoint specific, sort, filter params
-            }
-
-            if bookmark_query_field:
-                params[bookmark_query_field] = last_datetime
-
-            # Need URL querystring for 1st page; subsequent pages provided by next_url
-            # querystring: Squash query params into string
-            querystring = None
-            querystring = '&'.join(['%s=%s' % (key, value) for (key, value) in params.items()])
-
-            LOGGER.info('URL for Stream {}: {}{}{}'.format(
-                self.stream_name,
-                self.client.base_url,
-                path,
-                '?{}'.format(querystring) if params else ''))
-
-            # API request data
-            endpoint_total, total_records, record_count, page, offset, max_bookmark_value = self.get_and_transform_records(
-                                querystring, path, max_bookmark_value, state, catalog, start_date, last_datetime, endpoint_total, 
-                                  limit, total_records, record_count, page, offset, parent, parent_id, selected_streams)
+        self.keyset_pagination = self.pagination == 'keyset'
+        self.keyset_ordered = False
+        self.last_id = None
+        self.bookmark_pagination = self.is_bookmark_pageable(bookmark_field)
+        self.cursor_value = None
+        self.cursor_offset = 0
+        self.cursor_seen = {}
+        self.sideloaded = [] if parent_id else self.get_sideloaded_children(selected_streams)
+
+        # FULL_TABLE streams can save their offset while paging and resume from it
+        self.offset_checkpoint = None
+        if self.replication_method == 'FULL_TABLE' and not parent_id and get_bool_config(self.config, 'offset_checkpoints'):
+            self.offset_checkpoint = CheckpointInterval(
+                pages=int(self.config.get('checkpoint_pages') or DEFAULT_CHECKPOINT_PAGES),
+                seconds=float(self.config.get('checkpoint_seconds') or DEFAULT_CHECKPOINT_SECONDS))
+            offset, total_records = self.get_resume_offset(state, path)
+            page = offset // limit + 1
+
+        # Streams paged by bookmark save a safe bookmark every few pages, so an interrupted sync
+        #  does not restart from the previous run's bookmark.
+        self.checkpoint = None
+        if self.bookmark_pagination:
+            self.checkpoint = BookmarkCheckpoint(
+                pages=int(self.config.get('checkpoint_pages') or DEFAULT_CHECKPOINT_PAGES),
+                seconds=float(self.config.get('checkpoint_seconds') or DEFAULT_CHECKPOINT_SECONDS))
+
+        # Once the first page has returned meta.total, the remaining offsets are known and
+        #  can be fetched up to `max_concurrent_pages` at a time. Pages are still processed in
+        #  offset order, so bookmarks and record counts match a sequential run.
+        max_concurrent_pages = int(self.config.get('max_concurrent_pages') or 1)
+
+        # The children of each parent record are synced by the child fetcher, on up to
+        #  `max_concurrent_children` worker threads while the parent keeps paging.
+        max_concurrent_children = int(self.config.get('max_concurrent_children') or 1)
+
+        #  With `child_sync_index`, children of parents that did not change since their last
+        #  sync are skipped.
+        index_field = bookmark_field if get_bool_config(self.config, 'child_sync_index') else None
+
+        with ChildFetcher(self, self.children, catalog, state, start_date, selected_streams,
+                          max_concurrent_children, index_field, last_datetime) as self.child_fetcher:
+            while offset <= total_records: # break out of loop when record_count < limit (or not data returned)
+                # Keyset and bookmark pages depend on the previous page, so they cannot be prefetched
+                if page > 1 and max_concurrent_pages > 1 and not self.keyset_pagination and not self.bookmark_pagination:
+                    pages = self.prefetch_pages(
+                        path, range(offset, total_records + 1, limit), limit, last_datetime, max_concurrent_pages)
+                else:
+                    pages = [(offset, self.get_querystring(offset, limit, last_datetime), None)]
+
+                for offset, querystring, data in pages:
+                    # API request data
+                    endpoint_total, total_records, record_count, page, offset, max_bookmark_value = self.get_and_transform_records(
+                                        querystring, path, max_bookmark_value, state, catalog, start_date, last_datetime, endpoint_total, 
+                                          limit, total_records, record_count, page, offset, parent, parent_id, selected_streams, data)
+        self.child_fetcher = None
 
         # Update the state with the max_bookmark_value for the endpoint
-        # ActiveCampaign API does not allow page/batch sorting; bookmark written for endpoint
+        # Unless the stream is sorted by bookmark, the bookmark is only safe once every page was read
         if bookmark_field:
             self.write_bookmark(state, self.stream_name, max_bookmark_value)
 
+        if self.offset_checkpoint:
+            self.write_offset_checkpoint(state, None, None)
+
+        # A child stream keeps its context for the next parent
+        if not parent_id:
+            self.context.close()
+            self.context = None
+
         # Return total_records (for all pages and date windows)
         return endpoint_total
 
-    def transform_data(self, data):
+    def sync_snapshot(self, catalog, path, last_datetime):
+        """
+        Sync a small FULL_TABLE stream through its local snapshot. The pages are requested with the
+        ETag/Last-Modified of the snapshot pages, or not at all while the snapshot is younger than
+        `snapshot_max_age` seconds. If their content did not change, the records are written from
+        the snapshot, or not written at all with `snapshot_mode` skip.
+        The snapshot is saved once the STATE message that follows the records has been flushed,
+        so skip only applies to content the target has received.
+        """
+        cache = SnapshotCache(self.config['snapshot_dir'])
+        snapshot = cache.load(self.stream_name)
+        snapshot_mode = (self.config.get('snapshot_mode') or REPLAY).lower()
+        if snapshot_mode not in (REPLAY, SKIP):
+            raise ValueError('Unknown snapshot_mode: {} (expected {} or {})'.format(snapshot_mode, REPLAY, SKIP))
+
+        fresh = is_fresh(snapshot, float(self.config.get('snapshot_max_age') or 0))
+        if fresh:
+            LOGGER.info('Stream {}: using the snapshot without requests'.format(self.stream_name))
+            pages = snapshot['pages']
+            unchanged = True
+        else:
+            pages = self.get_snapshot_pages(path, snapshot)
+            unchanged = is_unchanged(snapshot, pages)
+
+        endpoint_total = 0
+        if unchanged and snapshot_mode == SKIP:
+            LOGGER.info('Stream {}: unchanged since the snapshot, no records written'.format(self.stream_name))
+        else:
+            if unchanged:
+                LOGGER.info('Stream {}: unchanged since the snapshot, writing its records'.format(self.stream_name))
+            for page in pages:
+                _, record_count = self.process_records(
+                    catalog=catalog,
+                    stream_name=self.stream_name,
+                    records=self.get_records(codec.loads(page['content'])),
+                    time_extracted=utils.now(),
+                    last_datetime=last_datetime)
+                endpoint_total = endpoint_total + record_count
+
+        if not fresh:
+            writer.after_state(functools.partial(cache.save, self.stream_name, pages))
+        self.context.close()
+        self.context = None
+        return endpoint_total
+
+    def get_snapshot_pages(self, path, snapshot):
+        """
+        Request every page of the stream, conditionally on the snapshot page with the same querystring,
+        and return the pages to save in the snapshot
+        """
+        previous_pages = {page['querystring']: page for page in (snapshot or {}).get('pages', [])}
+        pages = []
+        offset = 0
+        limit = 100
+        while True:
+            querystring = self.get_querystring(offset, limit, None)
+            previous_page = previous_pages.get(querystring, {})
+            LOGGER.info('URL for Stream {}: {}{}?{}'.format(self.stream_name, self.client.base_url, path, querystring))
+            content, etag, last_modified = self.client.get_conditional(
+                path, querystring, previous_page.get('etag'), previous_page.get('last_modified'), endpoint=self.stream_name)
+            if content is None:
+                # 304 Not Modified
+                page = dict(previous_page, etag=etag or previous_page.get('etag'),
+                            last_modified=last_modified or previous_page.get('last_modified'))
+            else:
+                page = make_page(querystring, content, etag, last_modified)
+            pages.append(page)
+
+            data = codec.loads(page['content'])
+            records = self.get_records(data)
+            total_records = int((data or {}).get('meta', {}).get('total', 0)) if isinstance(data, dict) else 0
+            offset = offset + limit
+            if len(records) < limit or (total_records and offset >= total_records):
+                return pages
+
+    def is_bookmark_pageable(self, bookmark_field):
+        """
+        Return True if the stream can be paged by bookmark: it is filtered with
+        filters[<replication_key>][gt] and sorted with orders[<replication_key>]
+        """
+        return bool(bookmark_field) and self.pagination == 'offset' \
+            and self.bookmark_query_field == 'filters[{}][gt]'.format(bookmark_field) \
+            and self.bookmark_sort_param == 'orders[{}]'.format(bookmark_field)
+
+    def get_querystring(self, offset, limit, last_datetime):
+        """
+        Build the querystring for the page starting at `offset`
+        """
+        params = {
+            'offset': offset,
+            'limit': limit,
+            **self.params # adds in endpoint specific, sort, filter params
+        }
+
+        if self.keyset_pagination:
+            # The position comes from the last id instead of the offset
+            self.keyset_offset = offset
+            del params['offset']
+            params[self.keyset_order_param] = 'ASC'
+            if self.last_id is not None:
+                params[self.keyset_filter_param] = self.last_id
+        elif self.keyset_ordered:
+            # The offsets continue the pages already written in id order
+            params[self.keyset_order_param] = 'ASC'
+
+        if self.bookmark_pagination:
+            # The position comes from the cursor instead of the offset
+            params['offset'] = self.cursor_offset
+
+        if self.bookmark_query_field:
+            if self.bookmark_pagination and self.cursor_value is not None:
+                params[self.bookmark_query_field] = quote(self.cursor_value, safe=':')
+            else:
+                params[self.bookmark_query_field] = self.get_bookmark_query_value(last_datetime)
+
+        if self.bookmark_pagination:
+            params[self.bookmark_sort_param] = 'ASC'
+
+        if self.sideloaded:
+            params['include'] = ','.join(STREAMS[name].include for name in self.sideloaded)
+
+        # querystring: Squash query params into string
+        return '&'.join(['%s=%s' % (key, value) for (key, value) in params.items()])
+
+    def get_bookmark_query_value(self, last_datetime):
+        """
+        Return the date sent in `bookmark_query_field`, one day before the bookmark
+        """
+        query_dttm = parse_datetime(last_datetime) - BOOKMARK_QUERY_LOOKBACK
+        return query_dttm.strftime('%Y-%m-%d')
+
+    def get_page(self, path, querystring):
+        """
+        Request one page of the endpoint.
+        If the endpoint rejects the server-side filter, sort or keyset params, drop them for the
+        rest of the stream and request the page again.
+        """
+        LOGGER.info('URL for Stream {}: {}{}?{}'.format(
+            self.stream_name,
+            self.client.base_url,
+            path,
+            querystring))
+
+        # Optionally decode the records while the page arrives, skipping sideloaded objects
+        kwargs = {}
+        if get_bool_config(self.config, 'streaming_pages'):
+            kwargs['data_key'] = self.data_key
+            if self.sideloaded:
+                kwargs['keep_keys'] = [STREAMS[name].data_key for name in self.sideloaded]
+
+        try:
+            return self.client.get(
+                path=path,
+                params=querystring,
+                endpoint=self.stream_name,
+                **kwargs)
+        except (ActiveCampaignBadRequestError, ActiveCampaignUnprocessableEntityError) as err:
+            server_side_params = [param for param in (self.bookmark_query_field, self.bookmark_sort_param) if param]
+            if self.keyset_pagination:
+                server_side_params += [self.keyset_order_param, self.keyset_filter_param]
+            if self.sideloaded:
+                server_side_params.append('include')
+            params = querystring.split('&')
+            remaining_params = [param for param in params if param.split('=')[0] not in server_side_params]
+            if remaining_params == params:
+                raise err
+            LOGGER.warning('Stream {}: server-side params {} were rejected ({}), filtering records in the tap instead'.format(
+                self.stream_name, server_side_params, err))
+            self.bookmark_query_field = None
+            self.bookmark_sort_param = None
+            # The sort and filter are sent from the first page on, so the cursor has not moved yet
+            self.bookmark_pagination = False
+            # The children are requested for each parent instead
+            self.sideloaded = []
+            if self.keyset_pagination:
+                self.keyset_pagination = False
+                remaining_params.insert(0, 'offset={}'.format(self.keyset_offset))
+            return self.get_page(path, '&'.join(remaining_params))
+
+    def prefetch_pages(self, path, offsets, limit, last_datetime, max_workers):
+        """
+        Yield (offset, querystring, data) for each offset in order, keeping up to `max_workers`
+        page requests in flight. Every request goes through the client, so the pool shares
+        its rate limit.
+        """
+        offsets = iter(offsets)
+        pending = collections.deque()
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            def submit_next():
+                offset = next(offsets, None)
+                if offset is not None:
+                    querystring = self.get_querystring(offset, limit, last_datetime)
+                    pending.append((offset, querystring, executor.submit(self.get_page, path, querystring)))
+
+            for _ in range(max_workers):
+                submit_next()
+
+            while pending:
+                offset, querystring, future = pending.popleft()
+                data = future.result()
+                submit_next()
+                yield offset, querystring, data
+
+    def is_keyset_page(self, records):
         """
-        Transform data with transform_json from transform.py
+        Return True if the record ids are strictly ascending and after the last id,
+        i.e. the endpoint honored the keyset order and filter params.
+        """
+        previous_id = self.last_id
+        for record in records:
+            try:
+                record_id = int(record.get('id'))
+            except (TypeError, ValueError):
+                return False
+            if previous_id is not None and record_id <= previous_id:
+                return False
+            previous_id = record_id
+        return True
+
+    def get_records(self, data):
+        """
+        Return the list of API records of the page. process_records decamelizes and fixes them in place.
         """
         data_key = self.data_key
         
         # The data_key identifies the array/list of records below the <root> element
-        transformed_data = [] # initialize the record list
-        data_list = []
-        data_dict = {}
         if data_key in data:
             if isinstance(data[data_key], list):
-                transformed_data = transform_json(data, self.stream_name, data_key)
-            elif isinstance(data[data_key], dict):
-                data_list.append(data[data_key])
-                data_dict[data_key] = data_list
-                transformed_data = transform_json(data_dict, self.stream_name, data_key)
-        else: # data_key not in data
-            if isinstance(data, list):
-                data_list = data
-                data_dict[data_key] = data_list
-                transformed_data = transform_json(data_dict, self.stream_name, data_key)
-            elif isinstance(data, dict):
-                data_list.append(data)
-                data_dict[data_key] = data_list
-                transformed_data = transform_json(data_dict, self.stream_name, data_key)
-        
-        return transformed_data
-
-    def sync_child_stream(self, children, transformed_data, catalog, state, start_date, selected_streams):
+                return data[data_key]
+            if isinstance(data[data_key], dict):
+                return [data[data_key]]
+            return []
+        # data_key not in data
+        if isinstance(data, list):
+            return data
+        if isinstance(data, dict):
+            return [data]
+        return []
+
+    def sync_child_stream(self, children, transformed_data, catalog, state, start_date, selected_streams, data=None):
         """
         sync the child stream. Loop through all children and if it is selected then collect data based on parent_id.
+        While the stream is syncing, the children are queued on its child fetcher.
+        `data` is the parent page, which holds the sideloaded children, if any.
         """
-        id_fields = self.key_properties
-        
-        for child_stream_name in children:
-            if child_stream_name in selected_streams:
-                LOGGER.info('START Syncing: {}'.format(child_stream_name))
-                child_stream_obj = STREAMS[child_stream_name](self.client)
-                child_stream_obj.write_schema(catalog, child_stream_name)
-                # For each parent record
-                for record in transformed_data:
-                    i = 0
-                    # Set parent_id
-                    for id_field in id_fields:
-                        if i == 0:
-                            parent_id_field = id_field
-                        if id_field == 'id':
-                            parent_id_field = id_field
-                        i = i + 1
-                    parent_id = record.get(parent_id_field)
-
-                    # sync_endpoint for child
-                    LOGGER.info(
-                        'START Sync for Stream: {}, parent_stream: {}, parent_id: {}'\
-                            .format(child_stream_name, self.stream_name, parent_id))
-                    child_path = child_stream_obj.path.format(str(parent_id))
-
-                    child_total_records = child_stream_obj.sync(
-                        client=self.client,
-                        catalog=catalog,
-                        state=state,
-                        start_date=start_date,
-                        path=child_path,
-                        selected_streams=selected_streams,
-                        parent=child_stream_obj.parent,
-                        parent_id=parent_id)
-                    LOGGER.info(
-                        'FINISHED Sync for Stream: {}, parent_id: {}, total_records: {}'\
-                            .format(child_stream_name, parent_id, child_total_records))
-                    # End transformed data record loop
-                # End if child in selected streams
-            # End child streams for parent
-        # End if children
+        if self.child_fetcher:
+            self.child_fetcher.submit(transformed_data, data)
+            return
+        with ChildFetcher(self, children, catalog, state, start_date, selected_streams) as child_fetcher:
+            child_fetcher.submit(transformed_data, data)
 
     def get_and_transform_records(self, querystring, path, max_bookmark_value, state, catalog, start_date, last_datetime, endpoint_total, 
-                                  limit, total_records, record_count, page, offset, parent, parent_id, selected_streams):
+                                  limit, total_records, record_count, page, offset, parent, parent_id, selected_streams, data=None):
         
         """
-        Get the records using the client get request and transform it using transform_records
+        Get the records using the client get request and transform it using transform_records.
+        `data` is the already fetched page, if it was prefetched.
         """
         
         bookmark_field = next(iter(self.replication_keys or []), None)
-        created_timestamp_field = self.created_timestamp
-        id_fields = self.key_properties
 
         # API request data
-        data = {}
-        data = self.client.get(
-            path=path,
-            params=querystring,
-            endpoint=self.stream_name)
+        if data is None:
+            data = self.get_page(path, querystring)
         
         # time_extracted: datetime when the data was extracted from the API
         time_extracted = utils.now()
@@ -342,29 +1206,25 @@ class ActiveCampaign:
         if not data or data is None or data == {}:
             LOGGER.info('No data for URL {}{}{}'.format(self.client.base_url, path, querystring)) # No data results
         else: # has data
-            transformed_data = self.transform_data(data)
+            # Decamelized and transformed in place by process_records
+            transformed_data = self.get_records(data)
             
             if not transformed_data or transformed_data is None:
                 LOGGER.info('No transformed data for data = {}'.format(data)) # No data results
 
-            i = 0
-            for record in transformed_data:
-                # Some endpoints update date is null upon creation
-                if bookmark_field:
-                    created_value = None
-                    if created_timestamp_field:
-                        created_value = record.get(created_timestamp_field)
-                    bookmark_value = record.get(bookmark_field)
-                    if not bookmark_value:
-                        transformed_data[i][bookmark_field] = created_value
-                # Verify key id_fields are present
-                for key in id_fields:
-                    if not record.get(key):
-                        LOGGER.error('Stream: {}, Missing key {} in record: {}'.format(
-                            self.stream_name, key, record))
-                        raise RuntimeError
-                i = i + 1
-        
+            if self.keyset_pagination and not self.is_keyset_page(transformed_data):
+                LOGGER.warning('Stream {}: ids are not ascending after id {}, falling back to offset pagination at offset {}'.format(
+                    self.stream_name, self.last_id, offset))
+                self.keyset_pagination = False
+                if self.last_id is not None:
+                    # The ids ascended until now, so the endpoint honours the id order but not the
+                    #  id filter: discard the page and request the same position by offset, in id order
+                    self.keyset_ordered = True
+                    return endpoint_total, max(total_records, offset), record_count, page, offset, max_bookmark_value
+
+            # Children are only synced for the parents written in this run
+            emitted_records = [] if self.children else None
+
             # Process records and get the max_bookmark_value and record_count for the set of records
             max_bookmark_value, record_count = self.process_records(
                 catalog=catalog,
@@ -375,22 +1235,51 @@ class ActiveCampaign:
                 max_bookmark_value=max_bookmark_value,
                 last_datetime=last_datetime,
                 parent=parent,
-                parent_id=parent_id)
+                parent_id=parent_id,
+                emitted_records=emitted_records,
+                skip_records=self.cursor_seen if self.bookmark_pagination else None)
             LOGGER.info('Stream {}, batch processed {} records'.format(
                 self.stream_name, record_count))
             endpoint_total = endpoint_total + record_count
 
+            if self.checkpoint and self.checkpoint.ordered:
+                self.write_checkpoint(state, last_datetime, transformed_data, bookmark_field, path, querystring, data)
+
+            change_index = self.get_change_index()
+            if change_index and change_index.is_delivery_due():
+                # The hashes of the records written so far are stored once a STATE message follows them
+                writer.write_state(state)
+
             # Loop thru parent batch records for each children objects (if should stream)
             children = self.children
 
             if children:
                 # sync child stream
-                self.sync_child_stream(children, transformed_data, catalog, state, start_date, selected_streams)
+                self.sync_child_stream(children, emitted_records, catalog, state, start_date, selected_streams, data)
+
+            if self.bookmark_pagination and not (self.checkpoint.verified and self.checkpoint.ordered):
+                # The cursor could skip records unless the sort is honoured: page by offset in the default order
+                self.bookmark_pagination = False
+                self.checkpoint.ordered = False
+                if self.cursor_value is not None or self.cursor_offset:
+                    LOGGER.warning('Stream {}: records are not sorted by {} after {}, restarting at offset 0'.format(
+                        self.stream_name, bookmark_field, self.cursor_value))
+                    return endpoint_total, 0, record_count, page + 1, 0, max_bookmark_value
 
             # Parent record batch
             # Get pagination details
             api_total = int(data.get('meta', {}).get('total', 0))
-            if api_total == 0:
+            if self.bookmark_pagination:
+                # meta.total only counts the records after the cursor; keep paging while pages are full
+                total_records = offset + len(transformed_data)
+                if transformed_data:
+                    self.move_cursor(transformed_data, bookmark_field)
+            elif self.keyset_pagination:
+                # meta.total only counts the records after the last id; keep paging while pages are full
+                total_records = offset + len(transformed_data)
+                if transformed_data:
+                    self.last_id = int(transformed_data[-1]['id'])
+            elif api_total == 0:
                 total_records = record_count
             else:
                 total_records = api_total
@@ -406,6 +1295,12 @@ class ActiveCampaign:
                 offset,
                 to_rec,
                 total_records))
+
+            if self.offset_checkpoint:
+                self.offset_checkpoint.page_done()
+                if self.offset_checkpoint.is_due():
+                    self.write_offset_checkpoint(state, offset + limit, total_records)
+                    self.offset_checkpoint.saved()
             # Pagination: increment the offset by the limit (batch-size) and page
             offset = offset + limit
             page = page + 1
@@ -420,6 +1315,8 @@ class Accounts(ActiveCampaign):
     """
     stream_name = 'accounts'
     replication_keys = ['updated_timestamp']
+    bookmark_query_field = 'filters[updated_timestamp][gt]'
+    bookmark_sort_param = 'orders[updated_timestamp]'
     path = 'accounts'
     data_key = 'accounts'
     created_timestamp = 'created_timestamp'
@@ -431,6 +1328,8 @@ class AccountContact(ActiveCampaign):
     """
     stream_name = 'account_contacts'
     replication_keys = ['updated_timestamp']
+    bookmark_query_field = 'filters[updated_timestamp][gt]'
+    bookmark_sort_param = 'orders[updated_timestamp]'
     path = 'accountContacts'
     data_key = 'accountContacts'
     created_timestamp = 'created_timestamp'
@@ -442,6 +1341,8 @@ class AccountCustomFields(ActiveCampaign):
     """
     stream_name = 'account_custom_fields'
     replication_keys = ['updated_timestamp']
+    bookmark_query_field = 'filters[updated_timestamp][gt]'
+    bookmark_sort_param = 'orders[updated_timestamp]'
     path = 'accountCustomFieldMeta'
     data_key = 'accountCustomFieldMeta'
     created_timestamp = 'created_timestamp'
@@ -453,6 +1354,8 @@ class AccountCustomFieldValues(ActiveCampaign):
     """
     stream_name = 'account_custom_field_values'
     replication_keys = ['updated_timestamp']
+    bookmark_query_field = 'filters[updated_timestamp][gt]'
+    bookmark_sort_param = 'orders[updated_timestamp]'
     path = 'accountCustomFieldData'
     data_key = 'accountCustomFieldData'
     created_timestamp = 'created_timestamp'
@@ -475,6 +1378,8 @@ class Automations(ActiveCampaign):
     """
     stream_name = 'automations'
     replication_keys = ['mdate']
+    bookmark_query_field = 'filters[mdate][gt]'
+    bookmark_sort_param = 'orders[mdate]'
     path = 'automations'
     data_key = 'automations'
     created_timestamp = 'cdate'
@@ -489,6 +1394,7 @@ class Brandings(ActiveCampaign):
     replication_method = 'FULL_TABLE'
     path = 'brandings'
     data_key = 'brandings'
+    snapshot = True
 
 class Calendars(ActiveCampaign):
     """
@@ -497,6 +1403,8 @@ class Calendars(ActiveCampaign):
     """
     stream_name = 'calendars'
     replication_keys = ['mdate']
+    bookmark_query_field = 'filters[mdate][gt]'
+    bookmark_sort_param = 'orders[mdate]'
     path = 'calendars'
     data_key = 'calendars'
     created_timestamp = 'cdate'
@@ -509,6 +1417,8 @@ class Campaigns(ActiveCampaign):
     """
     stream_name = 'campaigns'
     replication_keys = ['updated_timestamp']
+    bookmark_query_field = 'filters[updated_timestamp][gt]'
+    bookmark_sort_param = 'orders[updated_timestamp]'
     path = 'campaigns'
     data_key = 'campaigns'
     created_timestamp = 'created_timestamp'
@@ -520,6 +1430,8 @@ class CampaignLinks(ActiveCampaign):
     """
     stream_name = 'campaign_links'
     replication_keys = ['updated_timestamp']
+    bookmark_query_field = 'filters[updated_timestamp][gt]'
+    bookmark_sort_param = 'orders[updated_timestamp]'
     path = 'links'
     data_key = 'links'
     created_timestamp = 'created_timestamp'
@@ -535,6 +1447,8 @@ class Contacts(ActiveCampaign):
     data_key = 'contacts'
     created_timestamp = 'created_timestamp'
     bookmark_query_field = 'filters[updated_after]'
+    pagination = 'keyset'
+    keyset_filter_param = 'id_greater'
     links = ['contactGoals', 'contactLogs', 'geoIps', 'trackingLogs']
 
 class ContactAutomations(ActiveCampaign):
@@ -544,6 +1458,8 @@ class ContactAutomations(ActiveCampaign):
     """
     stream_name = 'contact_automations'
     replication_keys = ['lastdate']
+    bookmark_query_field = 'filters[lastdate][gt]'
+    bookmark_sort_param = 'orders[lastdate]'
     path = 'contactAutomations'
     data_key = 'contactAutomations'
     created_timestamp = 'adddate'
@@ -585,6 +1501,8 @@ class ContactCustomFieldValues(ActiveCampaign):
     """
     stream_name = 'contact_custom_field_values'
     replication_keys = ['udate']
+    bookmark_query_field = 'filters[udate][gt]'
+    bookmark_sort_param = 'orders[udate]'
     path = 'fieldValues'
     data_key = 'fieldValues'
     created_timestamp = 'cdate'
@@ -596,6 +1514,8 @@ class ContactDeals(ActiveCampaign):
     """
     stream_name = 'contact_deals'
     replication_keys = ['updated_timestamp']
+    bookmark_query_field = 'filters[updated_timestamp][gt]'
+    bookmark_sort_param = 'orders[updated_timestamp]'
     path = 'contactDeals'
     data_key = 'contactDeals'
     created_timestamp = 'created_timestamp'
@@ -607,6 +1527,8 @@ class DealStages(ActiveCampaign):
     """
     stream_name = 'deal_stages'
     replication_keys = ['udate']
+    bookmark_query_field = 'filters[udate][gt]'
+    bookmark_sort_param = 'orders[udate]'
     path = 'dealStages'
     data_key = 'dealStages'
     created_timestamp = 'cdate'
@@ -619,6 +1541,8 @@ class DealGroups(ActiveCampaign):
     """
     stream_name = 'deal_groups'
     replication_keys = ['udate']
+    bookmark_query_field = 'filters[udate][gt]'
+    bookmark_sort_param = 'orders[udate]'
     path = 'dealGroups'
     data_key = 'dealGroups'
     created_timestamp = 'cdate'
@@ -631,6 +1555,8 @@ class DealCustomFields(ActiveCampaign):
     """
     stream_name = 'deal_custom_fields'
     replication_keys = ['updated_timestamp']
+    bookmark_query_field = 'filters[updated_timestamp][gt]'
+    bookmark_sort_param = 'orders[updated_timestamp]'
     path = 'dealCustomFieldMeta'
     data_key = 'dealCustomFieldMeta'
     created_timestamp = 'created_timestamp'
@@ -642,6 +1568,8 @@ class DealCustomFieldValues(ActiveCampaign):
     """
     stream_name = 'deal_custom_field_values'
     replication_keys = ['updated_timestamp']
+    bookmark_query_field = 'filters[updated_timestamp][gt]'
+    bookmark_sort_param = 'orders[updated_timestamp]'
     path = 'dealCustomFieldData'
     data_key = 'dealCustomFieldData'
     created_timestamp = 'created_timestamp'
@@ -653,6 +1581,7 @@ class Deals(ActiveCampaign):
     """
     stream_name = 'deals'
     replication_keys = ['mdate']
+    bookmark_query_field = 'filters[updated_after]'
     path = 'deals'
     data_key = 'deals'
     created_timestamp = 'cdate'
@@ -665,6 +1594,8 @@ class EcommerceConnections(ActiveCampaign):
     stream_name = 'ecommerce_connections'
     
     replication_keys = ['udate']
+    bookmark_query_field = 'filters[udate][gt]'
+    bookmark_sort_param = 'orders[udate]'
     path = 'connections'
     data_key = 'connections'
     created_timestamp = 'cdate'
@@ -702,6 +1633,8 @@ class EcommerceOrderProducts(ActiveCampaign):
     path = 'ecomOrders/{}/orderProducts'
     data_key = 'ecomOrderProducts'
     parent = 'ecommerce_orders'
+    include = 'orderProducts'
+    include_parent_keys = ['orderid', 'ecomOrder']
 
 class Forms(ActiveCampaign):
     """
@@ -710,6 +1643,8 @@ class Forms(ActiveCampaign):
     """
     stream_name = 'forms'
     replication_keys = ['udate']
+    bookmark_query_field = 'filters[udate][gt]'
+    bookmark_sort_param = 'orders[udate]'
     path = 'forms'
     data_key = 'forms'
     created_timestamp = 'cdate'
@@ -723,6 +1658,7 @@ class Groups(ActiveCampaign):
     replication_method = 'FULL_TABLE'
     path = 'groups'
     data_key = 'groups'
+    snapshot = True
     
 class Lists(ActiveCampaign):
     """
@@ -731,6 +1667,8 @@ class Lists(ActiveCampaign):
     """
     stream_name = 'lists'
     replication_keys = ['updated_timestamp']
+    bookmark_query_field = 'filters[updated_timestamp][gt]'
+    bookmark_sort_param = 'orders[updated_timestamp]'
     path = 'lists'
     data_key = 'lists'
     created_timestamp = 'created_timestamp'
@@ -743,6 +1681,8 @@ class Messages(ActiveCampaign):
     """
     stream_name = 'messages'
     replication_keys = ['mdate']
+    bookmark_query_field = 'filters[mdate][gt]'
+    bookmark_sort_param = 'orders[mdate]'
     path = 'messages'
     data_key = 'messages'
     created_timestamp = 'cdate'
@@ -754,6 +1694,8 @@ class SavedResponses(ActiveCampaign):
     """
     stream_name = 'saved_responses'
     replication_keys = ['mdate']
+    bookmark_query_field = 'filters[mdate][gt]'
+    bookmark_sort_param = 'orders[mdate]'
     path = 'savedResponses'
     data_key = 'savedResponses'
     created_timestamp = 'cdate' 
@@ -765,6 +1707,8 @@ class Scores(ActiveCampaign):
     """
     stream_name = 'scores'
     replication_keys = ['mdate']
+    bookmark_query_field = 'filters[mdate][gt]'
+    bookmark_sort_param = 'orders[mdate]'
     path = 'scores'
     data_key = 'scores'
     created_timestamp = 'cdate' 
@@ -788,6 +1732,7 @@ class Tags(ActiveCampaign):
     replication_method = 'FULL_TABLE'
     path = 'tags'
     data_key = 'tags'
+    snapshot = True
 
 class TaskTypes(ActiveCampaign):
     """
@@ -798,6 +1743,7 @@ class TaskTypes(ActiveCampaign):
     replication_method = 'FULL_TABLE'
     path = 'dealTasktypes'
     data_key = 'dealTasktypes'
+    snapshot = True
 
 class Tasks(ActiveCampaign):
     """
@@ -806,6 +1752,8 @@ class Tasks(ActiveCampaign):
     """
     stream_name = 'tasks'
     replication_keys = ['udate']
+    bookmark_query_field = 'filters[udate][gt]'
+    bookmark_sort_param = 'orders[udate]'
     path = 'dealTasks'
     data_key = 'dealTasks'
     created_timestamp = 'cdate'
@@ -818,6 +1766,8 @@ class Templates(ActiveCampaign):
     """
     stream_name = 'templates'
     replication_keys = ['mdate']
+    bookmark_query_field = 'filters[mdate][gt]'
+    bookmark_sort_param = 'orders[mdate]'
     path = 'templates'
     data_key = 'templates'
 
@@ -830,6 +1780,7 @@ class Users(ActiveCampaign):
     replication_method = 'FULL_TABLE'
     path = 'users'
     data_key = 'users'
+    snapshot = True
 
 class Webhooks(ActiveCampaign):
     """
@@ -840,6 +1791,7 @@ class Webhooks(ActiveCampaign):
     replication_method = 'FULL_TABLE'
     path = 'webhooks'
     data_key = 'webhooks'
+    snapshot = True
 
 #Undocumented Endpoints
 
@@ -849,6 +1801,7 @@ class Activities(ActiveCampaign):
     """
     stream_name = 'activities'
     replication_keys = ['tstamp']
+    bookmark_query_field = 'after'
     path = 'activities'
     data_key = 'activities'
 
@@ -858,6 +1811,8 @@ class AutomationBlocks(ActiveCampaign):
     """
     stream_name = 'automation_blocks'
     replication_keys = ['mdate']
+    bookmark_query_field = 'filters[mdate][gt]'
+    bookmark_sort_param = 'orders[mdate]'
     path = 'automationBlocks'
     data_key = 'automationBlocks'
     created_timestamp = 'cdate'
@@ -868,6 +1823,8 @@ class BounceLogs(ActiveCampaign):
     """
     stream_name = 'bounce_logs'
     replication_keys = ['updated_timestamp']
+    bookmark_query_field = 'filters[updated_timestamp][gt]'
+    bookmark_sort_param = 'orders[updated_timestamp]'
     path = 'bounceLogs'
     data_key = 'bounceLogs'
     created_timestamp = 'created_timestamp'
@@ -878,6 +1835,7 @@ class CampaignLists(ActiveCampaign):
     """
     stream_name = 'campaign_lists'
     replication_method = 'FULL_TABLE'
+    pagination = 'keyset'
     path = 'campaignLists'
     data_key = 'campaignLists'
 
@@ -887,6 +1845,7 @@ class CampaignMessages(ActiveCampaign):
     """
     stream_name = 'campaign_messages'
     replication_method = 'FULL_TABLE'
+    pagination = 'keyset'
     path = 'campaignMessages'
     data_key = 'campaignMessages'
     
@@ -896,6 +1855,8 @@ class Configs(ActiveCampaign):
     """
     stream_name = 'configs'
     replication_keys = ['updated_timestamp']
+    bookmark_query_field = 'filters[updated_timestamp][gt]'
+    bookmark_sort_param = 'orders[updated_timestamp]'
     path = 'configs'
     data_key = 'configs'
     created_timestamp = 'created_timestamp'
@@ -906,6 +1867,8 @@ class ContactData(ActiveCampaign):
     """
     stream_name = 'contact_data'
     replication_keys = ['tstamp']
+    bookmark_query_field = 'filters[tstamp][gt]'
+    bookmark_sort_param = 'orders[tstamp]'
     path = 'contactData'
     data_key = 'contactData'
 
@@ -915,6 +1878,8 @@ class ContactEmails(ActiveCampaign):
     """
     stream_name = 'contact_emails'
     replication_keys = ['sdate']
+    bookmark_query_field = 'filters[sdate][gt]'
+    bookmark_sort_param = 'orders[sdate]'
     path = 'contactEmails'
     data_key = 'contactEmails'
 
@@ -925,6 +1890,8 @@ class ContactLists(ActiveCampaign):
     """
     stream_name = 'contact_lists'
     replication_keys = ['updated_timestamp']
+    bookmark_query_field = 'filters[updated_timestamp][gt]'
+    bookmark_sort_param = 'orders[updated_timestamp]'
     path = 'contactLists'
     data_key = 'contactLists'
     created_timestamp = 'created_timestamp'
@@ -935,6 +1902,8 @@ class ContactTags(ActiveCampaign):
     """
     stream_name = 'contact_tags'
     replication_keys = ['updated_timestamp']
+    bookmark_query_field = 'filters[updated_timestamp][gt]'
+    bookmark_sort_param = 'orders[updated_timestamp]'
     path = 'contactTags'
     data_key = 'contactTags'
     created_timestamp = 'created_timestamp'
@@ -945,6 +1914,8 @@ class ContactConversions(ActiveCampaign):
     """
     stream_name = 'contact_conversions'
     replication_keys = ['cdate']
+    bookmark_query_field = 'filters[cdate][gt]'
+    bookmark_sort_param = 'orders[cdate]'
     path = 'contactConversions'
     data_key = 'contactConversions'
 
@@ -954,6 +1925,8 @@ class Conversions(ActiveCampaign):
     """
     stream_name = 'conversions'
     replication_keys = ['udate']
+    bookmark_query_field = 'filters[udate][gt]'
+    bookmark_sort_param = 'orders[udate]'
     path = 'conversions'
     data_key = 'conversions'
     created_timestamp = 'cdate'
@@ -965,6 +1938,8 @@ class ConversionTriggers(ActiveCampaign):
     """
     stream_name = 'conversion_triggers'
     replication_keys = ['udate']
+    bookmark_query_field = 'filters[udate][gt]'
+    bookmark_sort_param = 'orders[udate]'
     path = 'conversionTriggers'
     data_key = 'conversionTriggers'
     created_timestamp = 'cdate'
@@ -975,6 +1950,8 @@ class DealActivities(ActiveCampaign):
     """
     stream_name = 'deal_activities'
     replication_keys = ['cdate']
+    bookmark_query_field = 'filters[cdate][gt]'
+    bookmark_sort_param = 'orders[cdate]'
     path = 'dealActivities'
     data_key = 'dealActivities'
 
@@ -1003,6 +1980,8 @@ class EmailActivities(ActiveCampaign):
     """
     stream_name = 'email_activities'
     replication_keys = ['tstamp']
+    bookmark_query_field = 'filters[tstamp][gt]'
+    bookmark_sort_param = 'orders[tstamp]'
     path = 'emailActivities'
     data_key = 'emailActivities'
 
@@ -1014,6 +1993,7 @@ class Goals(ActiveCampaign):
     replication_method = 'FULL_TABLE'
     path = 'goals'
     data_key = 'goals'
+    snapshot = True
 
 class SiteMessages(ActiveCampaign):
     """
@@ -1021,6 +2001,8 @@ class SiteMessages(ActiveCampaign):
     """
     stream_name = 'site_messages'
     replication_keys = ['ldate']
+    bookmark_query_field = 'filters[ldate][gt]'
+    bookmark_sort_param = 'orders[ldate]'
     path = 'siteMessages'
     data_key = 'siteMessages'
 
@@ -1030,6 +2012,8 @@ class Sms(ActiveCampaign):
     """
     stream_name = 'sms'
     replication_keys = ['tstamp']
+    bookmark_query_field = 'filters[tstamp][gt]'
+    bookmark_sort_param = 'orders[tstamp]'
     path = 'sms'
     data_key = 'sms'
 
@@ -1101,9 +2085,8 @@ SUB_STREAMS = {
 
 def flatten_streams():
     flat_streams = {}
-    # Loop through all streams
+    # Loop through all streams, reading the class attributes without instantiating the streams
     for stream in STREAMS.values():
-      stream = stream()
       flat_streams[stream.stream_name] = {
             'key_properties': stream.key_properties,
             'replication_method': stream.replication_method,
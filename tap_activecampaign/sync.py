@@ -1,7 +1,11 @@
-
+import collections
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import singer
 
 from tap_activecampaign.streams import STREAMS, SUB_STREAMS
+from tap_activecampaign.pagecache import PageCache, DEFAULT_PAGE_CACHE_MB
+from tap_activecampaign import timing, writer
 
 LOGGER = singer.get_logger()
 
@@ -10,16 +14,104 @@ LOGGER = singer.get_logger()
 #  the starting point to continue from.
 # Reference: https://github.com/singer-io/singer-python/blob/master/singer/bookmarks.py#L41-L46
 def update_currently_syncing(state, stream_name):
-    if (stream_name is None) and ('currently_syncing' in state):
-        del state['currently_syncing']
-    else:
-        singer.set_currently_syncing(state, stream_name)
-    singer.write_state(state)
+    with writer.STATE_LOCK:
+        if (stream_name is None) and ('currently_syncing' in state):
+            del state['currently_syncing']
+        else:
+            singer.set_currently_syncing(state, stream_name)
+        writer.write_state(state)
+
+
+def sync_stream(client, config, catalog, state, stream_name, selected_streams):
+    LOGGER.info('START Syncing: {}'.format(stream_name))
+
+    stream_obj = STREAMS[stream_name](client, config)
+    stream_obj.write_schema(catalog, stream_name)
+
+    with timing.phase(stream_name, 'stream'):
+        total_records = stream_obj.sync(
+            client=client,
+            catalog=catalog,
+            state=state,
+            start_date=config.get('start_date'),
+            path=stream_obj.path,
+            selected_streams=selected_streams)
+
+    LOGGER.info('FINISHED Syncing: {}, total_records: {}'.format(
+        stream_name,
+        total_records))
+    return total_records
+
+
+def get_page_cache(config, stream_names):
+    """
+    Return a PageCache for the endpoint paths read by several of the streams, or None if
+    every stream has its own path or `page_cache_mb` is 0.
+    """
+    page_cache_mb = config.get('page_cache_mb')
+    page_cache_mb = DEFAULT_PAGE_CACHE_MB if page_cache_mb in (None, '') else float(page_cache_mb)
+    if page_cache_mb <= 0:
+        return None
+    paths = collections.Counter(STREAMS[stream_name].path for stream_name in stream_names)
+    page_cache = PageCache(paths, int(page_cache_mb * 1024 * 1024))
+    if not page_cache.paths:
+        return None
+    LOGGER.info('Caching the pages of {}, shared by several streams'.format(', '.join(page_cache.paths)))
+    return page_cache
+
+
+def sync_concurrently(client, config, catalog, state, stream_names, selected_streams, max_workers):
+    """
+    Sync the streams on a pool of worker threads. All workers share the client (and its
+    rate limit) and write their messages through `writer`.
+    Streams are started in catalog order, so every stream before the first unfinished
+    one is complete. That stream is kept as `currently_syncing`, which lets an
+    interrupted run resume from it like a sequential run would.
+    """
+    unfinished = list(stream_names)
+    unfinished_lock = threading.Lock()
+    # Set once a stream fails: the worker it ran on must not start a queued stream before
+    #  the queued futures are cancelled
+    failed = threading.Event()
+
+    def run(stream_name):
+        if failed.is_set():
+            return 0
+        try:
+            total_records = sync_stream(client, config, catalog, state, stream_name, selected_streams)
+        except Exception:
+            failed.set()
+            raise
+        with unfinished_lock:
+            unfinished.remove(stream_name)
+            update_currently_syncing(state, unfinished[0] if unfinished else None)
+        return total_records
+
+    update_currently_syncing(state, unfinished[0])
+    LOGGER.info('Syncing {} streams with {} workers'.format(len(stream_names), max_workers))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(run, stream_name) for stream_name in stream_names]
+        try:
+            for future in as_completed(futures):
+                future.result()
+        except Exception:
+            # Do not start any stream that is still queued; running streams finish on exit
+            for future in futures:
+                future.cancel()
+            raise
 
 
 def sync(client, config, catalog, state):
-    start_date = config.get('start_date')
+    # Time each stage of every stream, and log the summary at the end, even if the sync fails
+    timing.start()
+    try:
+        sync_selected_streams(client, config, catalog, state)
+    finally:
+        timing.stop(config.get('timing_summary_path'))
+
 
+def sync_selected_streams(client, config, catalog, state):
     # Get selected_streams from catalog, based on state last_stream
     #   last_stream = Previous currently synced stream, if the load was interrupted
     last_stream = singer.get_currently_syncing(state)
@@ -32,27 +124,24 @@ def sync(client, config, catalog, state):
     if not selected_streams or selected_streams == []:
         return
 
+    # parent stream will sync sub stream
+    stream_names = [stream_name for stream_name in selected_streams
+                    if stream_name not in SUB_STREAMS.values()]
+    if not stream_names:
+        return
+
+    # Streams reading the same endpoint path (e.g. fields) share its pages
+    if client is not None:
+        client.page_cache = get_page_cache(config, stream_names)
+
+    max_concurrent_streams = int(config.get('max_concurrent_streams') or 1)
+    if max_concurrent_streams > 1:
+        sync_concurrently(client, config, catalog, state, stream_names,
+                          selected_streams, max_concurrent_streams)
+        return
+
     # Loop through endpoints in selected_streams
-    for stream_name in selected_streams:
-
-        # parent stream will sync sub stream
-        if stream_name in SUB_STREAMS.values():
-            continue
-        LOGGER.info('START Syncing: {}'.format(stream_name))
-        
-        stream_obj = STREAMS[stream_name](client)
-        stream_obj.write_schema(catalog, stream_name)
+    for stream_name in stream_names:
         update_currently_syncing(state, stream_name)
-        
-        total_records = stream_obj.sync(
-            client=client,
-            catalog=catalog,
-            state=state,
-            start_date=start_date,
-            path=stream_obj.path,
-            selected_streams=selected_streams)
-
+        sync_stream(client, config, catalog, state, stream_name, selected_streams)
         update_currently_syncing(state, None)
-        LOGGER.info('FINISHED Syncing: {}, total_records: {}'.format(
-            stream_name,
-            total_records))
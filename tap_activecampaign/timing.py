@@ -0,0 +1,156 @@
+import collections
+import contextlib
+import json
+import threading
+import time
+import singer
+
+LOGGER = singer.get_logger()
+
+# Stages of a stream, in the order of the summary:
+#   stream: sync_stream of a top-level stream, its children included
+#   request: client.request, from sending the request to releasing the response (network,
+#       decompression and JSON decoding), one per response
+#   rate_limit_wait / backoff_sleep: time spent waiting for the rate limiter or between retries
+#   process_records: one page of records, which is split into
+#       prepare (decamelize the keys, verify the key fields), transform (singer Transformer),
+#       bookmark (bookmark parsing and comparison), change_index (lookups) and write (write_record)
+PHASES = ('stream', 'request', 'rate_limit_wait', 'backoff_sleep', 'process_records',
+          'prepare', 'transform', 'bookmark', 'change_index', 'write')
+
+# Key of the requests made for no stream, e.g. the api token check
+NO_STREAM = '_client'
+
+
+class Timings(object):
+    """
+    Wall time, CPU time (of the thread doing the work) and count of each stage of each stream,
+    with the records written and the bytes received. Updated from every thread of a sync.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.started_cpu = time.process_time()
+        # stream: phase: [wall seconds, cpu seconds, count]
+        self.phases = collections.defaultdict(lambda: collections.defaultdict(lambda: [0.0, 0.0, 0]))
+        # stream: [records, bytes received]
+        self.totals = collections.defaultdict(lambda: [0, 0])
+
+    def add(self, stream_name, phase, wall, cpu=0.0, count=1):
+        with self.lock:
+            timing = self.phases[stream_name or NO_STREAM][phase]
+            timing[0] += wall
+            timing[1] += cpu
+            timing[2] += count
+
+    def add_records(self, stream_name, count):
+        with self.lock:
+            self.totals[stream_name or NO_STREAM][0] += count
+
+    def add_bytes(self, stream_name, count):
+        with self.lock:
+            self.totals[stream_name or NO_STREAM][1] += count
+
+    def get_stream_summary(self, stream_name):
+        phases = self.phases.get(stream_name, {})
+        records, bytes_received = self.totals.get(stream_name, (0, 0))
+        # Set by sync_stream for the top-level streams, children are synced within their parent
+        stream_seconds = phases['stream'][0] if 'stream' in phases else 0.0
+        return {
+            'type': 'stream',
+            'stream': stream_name,
+            'wall_seconds': round(stream_seconds, 6),
+            'records': records,
+            'bytes_received': bytes_received,
+            'records_per_second': round(records / stream_seconds, 1) if stream_seconds else None,
+            'phases': {phase: {'wall_seconds': round(phases[phase][0], 6),
+                               'cpu_seconds': round(phases[phase][1], 6),
+                               'count': phases[phase][2]}
+                       for phase in PHASES if phase in phases}
+        }
+
+    def get_summary(self):
+        """ Return the summary of each stream and of the run """
+        with self.lock:
+            stream_names = sorted(self.phases.keys() | self.totals.keys())
+            streams = [self.get_stream_summary(stream_name) for stream_name in stream_names]
+        wall_seconds = time.perf_counter() - self.started
+        records = sum(stream['records'] for stream in streams)
+        run_phases = {}
+        for stream in streams:
+            for phase, timing in stream['phases'].items():
+                run_timing = run_phases.setdefault(phase, {'wall_seconds': 0.0, 'cpu_seconds': 0.0, 'count': 0})
+                for key in run_timing:
+                    run_timing[key] += timing[key]
+        for timing in run_phases.values():
+            timing['wall_seconds'] = round(timing['wall_seconds'], 6)
+            timing['cpu_seconds'] = round(timing['cpu_seconds'], 6)
+        run = {
+            'type': 'run',
+            'wall_seconds': round(wall_seconds, 6),
+            # CPU time of the whole process, every thread included
+            'cpu_seconds': round(time.process_time() - self.started_cpu, 6),
+            'records': records,
+            'bytes_received': sum(stream['bytes_received'] for stream in streams),
+            'records_per_second': round(records / wall_seconds, 1) if wall_seconds else None,
+            'phases': {phase: run_phases[phase] for phase in PHASES if phase in run_phases}
+        }
+        return streams, run
+
+
+TIMINGS = None
+
+
+def start():
+    """ Start collecting the timings of a sync """
+    global TIMINGS
+    TIMINGS = Timings()
+    return TIMINGS
+
+
+def stop(path=None):
+    """
+    Log the summary of each stream and of the run as `TIMING: {json}` lines, write it to
+    `path` as JSON if given, and stop collecting
+    """
+    global TIMINGS
+    if TIMINGS is None:
+        return None
+    streams, run = TIMINGS.get_summary()
+    TIMINGS = None
+    for summary in streams + [run]:
+        LOGGER.info('TIMING: {}'.format(json.dumps(summary)))
+    if path:
+        with open(path, 'w') as summary_file:
+            json.dump({'streams': streams, 'run': run}, summary_file, indent=2)
+    return streams, run
+
+
+def add(stream_name, phase, wall, cpu=0.0, count=1):
+    timings = TIMINGS
+    if timings is not None:
+        timings.add(stream_name, phase, wall, cpu, count)
+
+
+def add_records(stream_name, count):
+    timings = TIMINGS
+    if timings is not None:
+        timings.add_records(stream_name, count)
+
+
+def add_bytes(stream_name, count):
+    timings = TIMINGS
+    if timings is not None:
+        timings.add_bytes(stream_name, count)
+
+
+@contextlib.contextmanager
+def phase(stream_name, name):
+    """ Add the wall and CPU time of the block to the phase of the stream """
+    started = time.perf_counter()
+    started_cpu = time.thread_time()
+    try:
+        yield
+    finally:
+        add(stream_name, name, time.perf_counter() - started, time.thread_time() - started_cpu)
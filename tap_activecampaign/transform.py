@@ -1,30 +1,103 @@
 import re
+from functools import lru_cache
 import singer
 import humps
 
 LOGGER = singer.get_logger()
 
+# The 59 schemas have about 550 distinct property names; the cache holds them with room for
+#  keys that are not in the schemas (e.g. custom field names)
+KEY_CACHE_SIZE = 2048
 
-def fix_records(this_json):
-    new_json = []
-    for rec in this_json:
-        if 'links' in rec:
-            if isinstance(rec['links'], dict):
-                rec.pop('links', None)
-        for key, val in rec.items():
-            if 'date' in key or 'stamp' in key or key in ('socialdata_lastcheck', 'deleted_at'):
-                if val == '0000-00-00 00:00:00':
-                    rec[key] = None
+EMPTY_DATETIME = '0000-00-00 00:00:00'
+
+
+@lru_cache(maxsize=KEY_CACHE_SIZE)
+def decamelize_key(key):
+    """ Return the snake_case key, converted once per distinct key """
+    return humps.decamelize(key)
+
+
+@lru_cache(maxsize=KEY_CACHE_SIZE)
+def is_date_key(key):
+    """ Return True if the key holds a date that can be the 0000-00-00 00:00:00 placeholder """
+    return 'date' in key or 'stamp' in key or key in ('socialdata_lastcheck', 'deleted_at')
+
+
+def get_properties(schema):
+    """
+    Return the properties of an object schema, or None if any key may be kept
+    (no schema, anyOf, patternProperties, or no/empty properties, which the Transformer
+    passes through as they are)
+    """
+    if not schema or 'patternProperties' in schema:
+        return None
+    return schema.get('properties') or None
 
-        new_json.append(rec)
 
+def decamelize_in_place(value, schema=None):
+    """
+    Rename the keys of the nested dicts and lists of `value` to snake_case, in place.
+    Same keys and key order as humps.decamelize. With a schema, nested values of keys that
+    are not in the schema are left as they are, since the Transformer removes them.
+    """
+    if isinstance(value, list):
+        item_schema = schema.get('items') if schema else None
+        for item in value:
+            if isinstance(item, (dict, list)):
+                decamelize_in_place(item, item_schema)
+    elif isinstance(value, dict):
+        properties = get_properties(schema)
+        items = list(value.items())
+        renamed = False
+        for index, (key, val) in enumerate(items):
+            new_key = decamelize_key(key)
+            if new_key != key:
+                items[index] = (new_key, val)
+                renamed = True
+            if isinstance(val, (dict, list)):
+                if properties is None:
+                    decamelize_in_place(val)
+                elif new_key in properties:
+                    decamelize_in_place(val, properties[new_key])
+        if renamed:
+            value.clear()
+            value.update(items)
+    return value
 
-def transform_json(this_json, stream_name, data_key):
-    if data_key in this_json:
-        converted_json = humps.decamelize(this_json[data_key])
+
+def get_date_keys(schema):
+    """ Return the schema keys that can hold the date placeholder, or None to check every key """
+    properties = get_properties(schema)
+    if properties is None:
+        return None
+    return [key for key in properties if is_date_key(key)]
+
+
+def fix_record(rec, date_keys=None):
+    """
+    Remove the links object and set the date placeholders to None.
+    `date_keys` limits the placeholder check to these keys (see get_date_keys).
+    """
+    if 'links' in rec:
+        if isinstance(rec['links'], dict):
+            rec.pop('links', None)
+    if date_keys is None:
+        for key, val in rec.items():
+            if val == EMPTY_DATETIME and is_date_key(key):
+                rec[key] = None
     else:
-        converted_json = humps.decamelize(this_json)
-    
-    fix_records(converted_json)
+        for key in date_keys:
+            if rec.get(key) == EMPTY_DATETIME:
+                rec[key] = None
+
+
+def prepare_record(rec, schema=None, date_keys=None):
+    """
+    Decamelize and fix one API record in place. `schema` is the stream schema, used to skip
+    nested values that are not replicated, and `date_keys` its keys from get_date_keys.
+    """
+    decamelize_in_place(rec, schema)
+    fix_record(rec, date_keys)
+    return rec
 
-    return converted_json
@@ -0,0 +1,199 @@
+import copy
+import queue
+import sys
+import threading
+import singer
+from tap_activecampaign import codec
+
+LOGGER = singer.get_logger()
+
+# All SCHEMA, RECORD and STATE messages are written through this module.
+# When several streams sync on worker threads, WRITE_LOCK keeps every message
+#  on its own line of stdout and STATE_LOCK guards the shared state dict, so a
+#  STATE message never serializes a bookmark while another thread is updating it.
+WRITE_LOCK = threading.Lock()
+STATE_LOCK = threading.RLock()
+
+# Messages waiting for the output thread before the syncing threads block
+DEFAULT_QUEUE_SIZE = 10000
+# Characters collected before one write to stdout
+WRITE_BUFFER_SIZE = 1024 * 1024
+# Seconds the output thread waits for more messages before writing a partial buffer
+FLUSH_INTERVAL = 0.1
+
+STOP = object()
+
+# Callbacks waiting for the next STATE message, run once it is written and flushed to stdout,
+#  and the total size (e.g. rows) they hold
+DELIVERY_CALLBACKS = []
+DELIVERY_SIZE = [0]
+CALLBACK_LOCK = threading.Lock()
+
+
+class Delivered(object):
+    """
+    Queued right after a STATE message: its callbacks run on the output thread once that
+    STATE message, and so every record queued before it, has been flushed to stdout.
+    """
+    def __init__(self, callbacks):
+        self.callbacks = callbacks
+
+
+def run_callbacks(callbacks):
+    for callback in callbacks:
+        try:
+            callback()
+        except Exception as err: # pylint: disable=broad-except
+            LOGGER.error('Callback after STATE message failed: {}'.format(err))
+
+
+class OutputThread(threading.Thread):
+    """
+    Serialize messages on a dedicated thread and write them to stdout in large writes.
+    Messages are written in the order they were queued, so a STATE message always follows
+    the records queued before it; stdout is flushed right after each STATE message.
+    The bounded queue blocks the syncing threads when the target reads slower than the tap fetches.
+    """
+    def __init__(self, out, queue_size=DEFAULT_QUEUE_SIZE):
+        super().__init__(name='output-writer', daemon=True)
+        self.out = out
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.error = None
+
+    def put(self, message):
+        if self.error:
+            raise self.error
+        self.queue.put(message)
+
+    def write(self, lines):
+        self.out.write(''.join(lines))
+        self.out.flush()
+
+    def run(self):
+        lines = []
+        size = 0
+        while True:
+            try:
+                message = self.queue.get(timeout=FLUSH_INTERVAL) if lines else self.queue.get()
+            except queue.Empty:
+                message = None
+            if self.error:
+                # Keep draining, so that the syncing threads do not block on a full queue
+                if message is STOP:
+                    return
+                continue
+            try:
+                if isinstance(message, Delivered):
+                    # The STATE message queued before it is already flushed
+                    run_callbacks(message.callbacks)
+                    continue
+                if message is not None and message is not STOP:
+                    line = codec.format_message(message) + '\n'
+                    lines.append(line)
+                    size += len(line)
+                if lines and (message is None or message is STOP or size >= WRITE_BUFFER_SIZE
+                              or isinstance(message, singer.StateMessage)):
+                    self.write(lines)
+                    lines = []
+                    size = 0
+            except Exception as err: # pylint: disable=broad-except
+                LOGGER.error('Output writer failed: {}'.format(err))
+                self.error = err
+            if message is STOP:
+                return
+
+
+OUTPUT = None
+
+
+def start(queue_size=None):
+    """
+    Start writing messages on the output thread. A `queue_size` of 0 keeps writing synchronously.
+    """
+    global OUTPUT
+    queue_size = DEFAULT_QUEUE_SIZE if queue_size is None else int(queue_size)
+    if queue_size <= 0 or OUTPUT:
+        return
+    OUTPUT = OutputThread(sys.stdout, queue_size)
+    OUTPUT.start()
+
+
+def stop(raise_error=True):
+    """
+    Write every queued message, stop the output thread and raise its error, if any.
+    With `raise_error` False the error is only returned, e.g. when the sync already failed.
+    """
+    global OUTPUT
+    output = OUTPUT
+    if not output:
+        return None
+    output.queue.put(STOP)
+    output.join()
+    OUTPUT = None
+    # No STATE message follows the messages written since the last one
+    with CALLBACK_LOCK:
+        del DELIVERY_CALLBACKS[:]
+        DELIVERY_SIZE[0] = 0
+    if output.error and raise_error:
+        raise output.error
+    return output.error
+
+
+def write_message(message):
+    output = OUTPUT
+    if output:
+        output.put(message)
+        return
+    line = codec.format_message(message) + '\n'
+    with WRITE_LOCK:
+        sys.stdout.write(line)
+        sys.stdout.flush()
+
+
+def write_schema(stream_name, schema, key_properties):
+    write_message(singer.SchemaMessage(
+        stream=stream_name,
+        schema=schema,
+        key_properties=key_properties))
+
+
+def write_record(stream_name, record, time_extracted=None):
+    write_message(singer.RecordMessage(
+        stream=stream_name,
+        record=record,
+        time_extracted=time_extracted))
+
+
+def after_state(callback, size=1):
+    """
+    Run `callback` once a STATE message written after this call has been flushed to stdout,
+    i.e. once the target has the messages written before the call. The callback never
+    runs if the output fails first, or if no STATE message follows.
+    `size` is added to `get_pending_size` until the next STATE message.
+    """
+    with CALLBACK_LOCK:
+        DELIVERY_CALLBACKS.append(callback)
+        DELIVERY_SIZE[0] += size
+
+
+def get_pending_size():
+    """ Return the size of the callbacks waiting for the next STATE message """
+    with CALLBACK_LOCK:
+        return DELIVERY_SIZE[0]
+
+
+def write_state(state):
+    # Hold STATE_LOCK until the message is written so that two threads cannot
+    #  emit their state snapshots out of order.
+    with STATE_LOCK:
+        with CALLBACK_LOCK:
+            callbacks = DELIVERY_CALLBACKS[:]
+            del DELIVERY_CALLBACKS[:]
+            DELIVERY_SIZE[0] = 0
+        write_message(singer.StateMessage(value=copy.deepcopy(state)))
+        if callbacks:
+            output = OUTPUT
+            if output:
+                output.put(Delivered(callbacks))
+            else:
+                run_callbacks(callbacks)
@@ -0,0 +1,77 @@
+"""
+Compare humps.decamelize + fix_record with the cached in-place decamelization of prepare_record
+(as SyncContext.prepare runs it), on pages of 100 camelCase records generated from each stream schema.
+
+    python tests/benchmarks/bench_decamelize.py [rounds]
+"""
+import copy
+import sys
+import time
+
+import humps
+
+from tap_activecampaign import transform
+from tap_activecampaign.discover import discover
+from tap_activecampaign.streams import STREAMS
+
+ROUNDS = 5
+PAGE_SIZE = 100
+
+def sample_value(schema):
+    """ Return a camelCase API value for the schema, plus a sideloaded-like key not in the schema """
+    if 'anyOf' in schema:
+        return sample_value(next(sub_schema for sub_schema in schema['anyOf'] if sub_schema.get('type') != 'null'))
+    types = schema.get('type', [])
+    types = types if isinstance(types, list) else [types]
+    if 'object' in types:
+        value = {humps.camelize(key): sample_value(sub_schema) for key, sub_schema in schema.get('properties', {}).items()}
+        value['links'] = {'relatedObject': 'https://dummy.api-us1.com/api/3/related/1'}
+        return value
+    if 'array' in types:
+        return [sample_value(schema.get('items', {})) for _ in range(3)]
+    if schema.get('format') == 'date-time':
+        return '2021-03-01 05:30:00'
+    return '12'
+
+def decamelize_with_humps(page, data_key):
+    records = humps.decamelize(page[data_key])
+    for rec in records:
+        transform.fix_record(rec)
+    return records
+
+def prepare_in_place(page, data_key, schema):
+    date_keys = transform.get_date_keys(schema)
+    for rec in page[data_key]:
+        transform.prepare_record(rec, schema, date_keys)
+    return page[data_key]
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else ROUNDS
+    pages = []
+    for catalog_entry in discover().streams:
+        stream = STREAMS[catalog_entry.stream]
+        schema = catalog_entry.schema.to_dict()
+        record = sample_value(schema)
+        pages.append((stream, schema, {stream.data_key: [copy.deepcopy(record) for _ in range(PAGE_SIZE)]}))
+
+    timings = {'humps': 0.0, 'in place': 0.0}
+    for _ in range(rounds):
+        copies = [copy.deepcopy(page) for _, _, page in pages]
+        start = time.perf_counter()
+        for (stream, _, _), page in zip(pages, copies):
+            decamelize_with_humps(page, stream.data_key)
+        timings['humps'] += time.perf_counter() - start
+
+        copies = [copy.deepcopy(page) for _, _, page in pages]
+        start = time.perf_counter()
+        for (stream, schema, _), page in zip(pages, copies):
+            prepare_in_place(page, stream.data_key, schema)
+        timings['in place'] += time.perf_counter() - start
+
+    records = rounds * len(pages) * PAGE_SIZE
+    for name, seconds in timings.items():
+        print('{:<9} {:7.3f}s  {:9.0f} records/s'.format(name, seconds, records / seconds))
+    print('speedup: {:.1f}x'.format(timings['humps'] / timings['in place']))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Compare offset and keyset pagination of a FULL_TABLE stream against a local stub API.
+
+The stub models the cost of a deep offset on the server: a page at `offset` takes
+`BASE_LATENCY + offset * OFFSET_COST` seconds, while a page after an id takes
+`BASE_LATENCY` seconds, like an indexed `WHERE id > ?` lookup.
+
+    python tests/benchmarks/bench_pagination.py [total_records]
+"""
+import bisect
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import parse_qsl, urlsplit
+
+from tap_activecampaign.client import ActiveCampaignClient
+from tap_activecampaign.discover import discover
+from tap_activecampaign.streams import CampaignMessages
+
+BASE_LATENCY = 0.002
+OFFSET_COST = 0.000002
+TOTAL_RECORDS = 20000
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    Stub of the campaignMessages endpoint
+    """
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = dict(parse_qsl(url.query))
+        ids = self.server.ids
+        limit = int(query.get('limit', 20))
+        if url.path == '/api/3/':
+            body = {}
+        elif 'orders[id]' in query:
+            last_id = int(query.get('filters[id][gt]', 0))
+            # ids are sorted, so the first id after last_id is found like an index lookup
+            start = bisect.bisect_right(ids, last_id)
+            time.sleep(BASE_LATENCY)
+            body = {'campaignMessages': [{'id': str(i)} for i in ids[start:start + limit]],
+                    'meta': {'total': str(len(ids) - start)}}
+        else:
+            offset = int(query.get('offset', 0))
+            # The server walks every skipped row
+            time.sleep(BASE_LATENCY + offset * OFFSET_COST)
+            body = {'campaignMessages': [{'id': str(i)} for i in ids[offset:offset + limit]],
+                    'meta': {'total': str(len(ids))}}
+        content = json.dumps(body).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+def run(api_url, pagination):
+    client = ActiveCampaignClient(api_url, 'dummy_token', requests_per_second=10000, burst=100)
+    stream = CampaignMessages(client, {})
+    stream.pagination = pagination
+    start = time.perf_counter()
+    with mock.patch.object(CampaignMessages, 'write_record'), \
+            mock.patch('tap_activecampaign.streams.LOGGER'):
+        total = stream.sync(client, discover(), {}, '2021-01-01T00:00:00Z', stream.path)
+    return total, time.perf_counter() - start
+
+def main():
+    total_records = int(sys.argv[1]) if len(sys.argv) > 1 else TOTAL_RECORDS
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.ids = [2 * i for i in range(1, total_records + 1)]
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    api_url = 'http://127.0.0.1:{}'.format(server.server_address[1])
+    try:
+        results = {pagination: run(api_url, pagination) for pagination in ('offset', 'keyset')}
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    for pagination, (total, seconds) in results.items():
+        print('{:<7} {:>7} records  {:6.2f}s  {:8.0f} records/s'.format(
+            pagination, total, seconds, total / seconds))
+    print('keyset speedup: {:.1f}x'.format(results['offset'][1] / results['keyset'][1]))
+
+if __name__ == '__main__':
+    main()
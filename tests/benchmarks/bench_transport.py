@@ -0,0 +1,159 @@
+"""
+Compare the requests (HTTP/1.1) and httpx (HTTP/2) transports against local stub APIs.
+
+Each stub models a high-latency link: opening a connection takes `CONNECT_LATENCY` seconds
+(TCP and TLS handshakes) and each response `LATENCY` seconds. Every run starts a new client,
+like a sync job, and requests `PAGES` pages with `CONCURRENCY` requests in flight, like
+`max_concurrent_pages`. Over HTTP/1.1 each request in flight needs its own connection; over
+HTTP/2 they share one. The HTTP/2 stub speaks h2c (HTTP/2 over cleartext, prior knowledge),
+so no certificate is needed; requires `pip install tap-activecampaign[http2]`.
+
+    python tests/benchmarks/bench_transport.py [runs]
+"""
+import asyncio
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import h2.config
+import h2.connection
+import h2.events
+
+from tap_activecampaign.client import ActiveCampaignClient
+
+CONNECT_LATENCY = 0.06
+LATENCY = 0.03
+PAGES = 40
+CONCURRENCY = 8
+RUNS = 5
+
+PAGE = json.dumps({'contacts': [{'id': str(i), 'email': 'user{}@example.com'.format(i)} for i in range(100)],
+                   'meta': {'total': '100'}}).encode('utf-8')
+
+class Http1Handler(BaseHTTPRequestHandler):
+    """
+    HTTP/1.1 stub with keep-alive connections
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def setup(self):
+        self.server.connections += 1
+        time.sleep(CONNECT_LATENCY)
+        super().setup()
+
+    def do_GET(self):
+        time.sleep(LATENCY)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(PAGE)))
+        self.end_headers()
+        self.wfile.write(PAGE)
+
+class H2Protocol(asyncio.Protocol):
+    """
+    h2c stub answering each stream after LATENCY, within the flow control windows
+    """
+    connections = 0
+
+    def __init__(self):
+        self.conn = h2.connection.H2Connection(h2.config.H2Configuration(client_side=False))
+        self.transport = None
+        self.ready = None
+        self.pending = {} # stream_id: body left to send
+
+    def connection_made(self, transport):
+        H2Protocol.connections += 1
+        self.transport = transport
+        self.ready = asyncio.ensure_future(asyncio.sleep(CONNECT_LATENCY))
+        self.conn.initiate_connection()
+        self.transport.write(self.conn.data_to_send())
+
+    def data_received(self, data):
+        for event in self.conn.receive_data(data):
+            if isinstance(event, h2.events.RequestReceived):
+                asyncio.ensure_future(self.respond(event.stream_id))
+            elif isinstance(event, h2.events.WindowUpdated):
+                self.flush()
+            elif isinstance(event, h2.events.StreamReset):
+                self.pending.pop(event.stream_id, None)
+        self.transport.write(self.conn.data_to_send())
+
+    async def respond(self, stream_id):
+        await self.ready
+        await asyncio.sleep(LATENCY)
+        self.conn.send_headers(stream_id, [(':status', '200'), ('content-type', 'application/json'),
+                                           ('content-length', str(len(PAGE)))])
+        self.pending[stream_id] = PAGE
+        self.flush()
+
+    def flush(self):
+        for stream_id, body in list(self.pending.items()):
+            size = min(len(body), self.conn.local_flow_control_window(stream_id), self.conn.max_outbound_frame_size)
+            while size > 0:
+                self.conn.send_data(stream_id, body[:size])
+                body = body[size:]
+                size = min(len(body), self.conn.local_flow_control_window(stream_id), self.conn.max_outbound_frame_size)
+            if body:
+                self.pending[stream_id] = body
+            else:
+                self.conn.end_stream(stream_id)
+                del self.pending[stream_id]
+        self.transport.write(self.conn.data_to_send())
+
+def start_h2_server():
+    loop = asyncio.new_event_loop()
+    server = loop.run_until_complete(loop.create_server(H2Protocol, '127.0.0.1', 0))
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return loop, server
+
+def run(api_url, transport, runs):
+    """ Return the seconds of each run of PAGES pages with a new client """
+    durations = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        client = ActiveCampaignClient(api_url, 'dummy_token', requests_per_second=10000, burst=100,
+                                      pool_size=CONCURRENCY, transport=transport)
+        with client, ThreadPoolExecutor(CONCURRENCY) as executor:
+            list(executor.map(lambda page: client.get('contacts', params='offset={}&limit=100'.format(page * 100),
+                                                      data_key='contacts'),
+                              range(PAGES)))
+        durations.append(time.perf_counter() - start)
+    return durations
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else RUNS
+    http1_server = ThreadingHTTPServer(('127.0.0.1', 0), Http1Handler)
+    http1_server.connections = 0
+    threading.Thread(target=http1_server.serve_forever, daemon=True).start()
+    loop, h2_server = start_h2_server()
+
+    try:
+        with mock.patch('tap_activecampaign.client.LOGGER'), mock.patch('singer.metrics.log'):
+            results = {
+                'requests': (run('http://127.0.0.1:{}'.format(http1_server.server_address[1]), 'requests', runs),
+                             lambda: http1_server.connections),
+                'h2c': (run('http://127.0.0.1:{}'.format(h2_server.sockets[0].getsockname()[1]), 'h2c', runs),
+                        lambda: H2Protocol.connections),
+            }
+    finally:
+        http1_server.shutdown()
+        http1_server.server_close()
+        loop.call_soon_threadsafe(h2_server.close)
+        loop.call_soon_threadsafe(loop.stop)
+
+    print('{} runs of {} pages, {} in flight, {:.0f}ms to connect, {:.0f}ms per response'.format(
+        runs, PAGES, CONCURRENCY, CONNECT_LATENCY * 1000, LATENCY * 1000))
+    for transport, (durations, connections) in results.items():
+        print('{:<9} {:6.3f}s per run  {:6.1f} pages/s  {:3} connections'.format(
+            transport, sum(durations) / runs, PAGES * runs / sum(durations), connections()))
+    print('HTTP/2 speedup: {:.2f}x'.format(sum(results['requests'][0]) / sum(results['h2c'][0])))
+
+if __name__ == '__main__':
+    main()
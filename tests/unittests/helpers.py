@@ -0,0 +1,61 @@
+"""
+Mock client and sync helper shared by the tests that sync a stream against canned pages
+"""
+import threading
+from unittest import mock
+from tap_activecampaign.discover import discover
+from tap_activecampaign.streams import ActiveCampaign
+
+START_DATE = '2021-01-01T00:00:00Z'
+
+
+def parse_query(params):
+    """ Return the params of a querystring as a dict """
+    return dict(param.split('=') for param in params.split('&'))
+
+
+class MockClient:
+    """
+    Client answering each request with the page returned by `get_page(path, query)`.
+    The (path, querystring) of every request is appended to `requests`.
+    """
+    base_url = 'https://dummy.api-us1.com/api/3/'
+
+    def __init__(self):
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def get(self, path, params=None, endpoint=None):
+        with self.lock:
+            self.requests.append((path, params))
+        return self.get_page(path, parse_query(params))
+
+    def get_page(self, path, query):
+        raise NotImplementedError
+
+    def get_paths(self):
+        """ Return the paths requested, in order """
+        return [path for path, _ in self.requests]
+
+    def get_querystrings(self):
+        """ Return the querystrings requested, in order """
+        return [params for _, params in self.requests]
+
+
+def sync_stream(stream, state=None, catalog=None, get_written=None, **kwargs):
+    """
+    Sync `stream` through its client and return (written, total): the records written by
+    every stream, as returned by `get_written(stream_name, record)` (the record by default),
+    and the total returned by the sync. `kwargs` are passed to the sync, e.g. selected_streams.
+    """
+    written = []
+    lock = threading.Lock()
+
+    def write_record(stream_name, record, time_extracted):
+        with lock:
+            written.append(get_written(stream_name, record) if get_written else record)
+
+    with mock.patch.object(ActiveCampaign, 'write_record', side_effect=write_record):
+        total = stream.sync(stream.client, catalog or discover(), state if state is not None else {},
+                            START_DATE, stream.path, **kwargs)
+    return written, total
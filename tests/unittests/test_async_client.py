@@ -0,0 +1,147 @@
+import asyncio
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from tap_activecampaign import client
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    Local stub of the ActiveCampaign API
+    """
+    flaky_calls = 0
+
+    def log_message(self, *args):
+        pass
+
+    def send_json(self, status_code, body):
+        content = json.dumps(body).encode('utf-8')
+        self.send_response(status_code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def do_GET(self):
+        self.server.headers_seen.append(dict(self.headers))
+        if self.headers.get('Api-Token') != 'dummy_token':
+            self.send_json(403, {'message': 'No Result found for Subscriber with id 0'})
+        elif self.path == '/api/3/':
+            self.send_json(200, {})
+        elif self.path.startswith('/api/3/contacts'):
+            self.send_json(200, {'contacts': [{'id': '1'}], 'meta': {'total': '1'}, 'path': self.path})
+        elif self.path == '/api/3/invalid':
+            self.send_json(422, {'errors': [{'title': 'The connection service was not provided.'}]})
+        elif self.path == '/api/3/flaky':
+            StubHandler.flaky_calls += 1
+            if StubHandler.flaky_calls < 3:
+                self.send_json(500, {})
+            else:
+                self.send_json(200, {'flaky': StubHandler.flaky_calls})
+        elif self.path == '/api/3/down':
+            self.send_json(503, {})
+        elif self.path == '/api/3/slow':
+            time.sleep(0.5)
+            self.send_json(200, {})
+        else:
+            self.send_json(404, {})
+
+@unittest.skipIf(client.get_aiohttp() is None, 'aiohttp is not installed')
+class TestAsyncActiveCampaignClient(unittest.TestCase):
+    """
+    Test AsyncActiveCampaignClient against a local stub HTTP server
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+        cls.server.headers_seen = []
+        cls.api_url = 'http://127.0.0.1:{}'.format(cls.server.server_address[1])
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        StubHandler.flaky_calls = 0
+        self.server.headers_seen.clear()
+        # Do not wait between retries
+        patcher = mock.patch('tap_activecampaign.client.backoff.full_jitter', return_value=0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_client(self, coroutine_function, api_token='dummy_token', request_timeout=None):
+        async def run():
+            async with client.AsyncActiveCampaignClient(
+                    self.api_url, api_token, 'test_ua', request_timeout, requests_per_second=100) as async_client:
+                return await coroutine_function(async_client)
+        return asyncio.run(run())
+
+    def test_get_records_and_headers(self):
+        """
+        Test that `get` returns the JSON page and sends the same headers as the sync client
+        """
+        response = self.run_client(lambda async_client: async_client.get('contacts', params='offset=0&limit=100', endpoint='contacts'))
+
+        self.assertEqual(response['contacts'], [{'id': '1'}])
+        self.assertEqual(response['path'], '/api/3/contacts?offset=0&limit=100')
+        headers = self.server.headers_seen[-1]
+        self.assertEqual(headers['Api-Token'], 'dummy_token')
+        self.assertEqual(headers['Accept'], 'application/json')
+        self.assertEqual(headers['User-Agent'], 'test_ua')
+
+    def test_concurrent_requests(self):
+        """
+        Test that several pages can be awaited together on one event loop
+        """
+        async def get_pages(async_client):
+            return await asyncio.gather(*[
+                async_client.get('contacts', params='offset={}'.format(offset)) for offset in range(0, 500, 100)])
+        responses = self.run_client(get_pages)
+
+        self.assertEqual([response['path'] for response in responses],
+                         ['/api/3/contacts?offset={}'.format(offset) for offset in range(0, 500, 100)])
+
+    def test_422_error_message(self):
+        """
+        Test that error responses are mapped with `raise_for_error`
+        """
+        with self.assertRaises(client.ActiveCampaignUnprocessableEntityError) as e:
+            self.run_client(lambda async_client: async_client.get('invalid'))
+        self.assertEqual(str(e.exception), 'HTTP-error-code: 422, Error: The connection service was not provided.')
+
+    def test_invalid_token(self):
+        """
+        Test that the token check on enter raises the mapped 403 error without retrying
+        """
+        with self.assertRaises(client.ActiveCampaignForbiddenError):
+            self.run_client(lambda async_client: async_client.get('contacts'), api_token='invalid')
+        self.assertEqual(len(self.server.headers_seen), 1)
+
+    def test_5xx_retry(self):
+        """
+        Test that 5xx errors are retried and the request succeeds once the server recovers
+        """
+        response = self.run_client(lambda async_client: async_client.get('flaky'))
+        self.assertEqual(response, {'flaky': 3})
+
+    def test_5xx_backoff_max_tries(self):
+        """
+        Test that 5xx errors are retried `MAX_TRIES` times
+        """
+        with self.assertRaises(client.Server5xxError):
+            self.run_client(lambda async_client: async_client.get('down'))
+        # Token check plus 5 tries
+        self.assertEqual(len(self.server.headers_seen), 1 + client.MAX_TRIES)
+
+    def test_timeout_backoff(self):
+        """
+        Test that timeouts are retried `MAX_TRIES` times
+        """
+        with self.assertRaises(asyncio.TimeoutError):
+            self.run_client(lambda async_client: async_client.get('slow'), request_timeout=0.1)
+        self.assertEqual(len(self.server.headers_seen), 1 + client.MAX_TRIES)
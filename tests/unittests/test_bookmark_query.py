@@ -0,0 +1,76 @@
+import unittest
+from unittest import mock
+from tap_activecampaign import client
+from tap_activecampaign.streams import STREAMS, ContactTags, Deals, Tags
+
+class TestBookmarkQueryField(unittest.TestCase):
+    """
+    Test server-side bookmark filters of incremental streams
+    """
+    def test_incremental_streams_filter_on_server(self):
+        """
+        Test that each incremental stream, except the ecommerce streams, sends a server-side filter
+        """
+        unfiltered = {'ecommerce_customers', 'ecommerce_orders', 'ecommerce_order_activities'}
+        for stream_name, stream_class in STREAMS.items():
+            if stream_class.replication_method == 'INCREMENTAL' and stream_name not in unfiltered:
+                self.assertIsNotNone(stream_class.bookmark_query_field, stream_name)
+            if stream_class.replication_method == 'FULL_TABLE':
+                self.assertIsNone(stream_class.bookmark_query_field, stream_name)
+
+    def test_query_value_is_day_before_bookmark(self):
+        """
+        Test that the filter value is the date one day before the bookmark
+        """
+        stream = ContactTags(mock.Mock(), {})
+        self.assertEqual(stream.get_querystring(0, 100, '2021-03-01T05:30:00.000000Z'),
+                         'offset=0&limit=100&filters[updated_timestamp][gt]=2021-02-28')
+        stream = Deals(mock.Mock(), {})
+        self.assertEqual(stream.get_querystring(0, 100, '2021-03-01T05:30:00Z'),
+                         'offset=0&limit=100&filters[updated_after]=2021-02-28')
+
+    def test_bookmark_pagination_query(self):
+        """
+        Test that a stream paged by bookmark is sorted by it and requested after the cursor from its offset
+        """
+        stream = ContactTags(mock.Mock(), {})
+        self.assertTrue(stream.is_bookmark_pageable('updated_timestamp'))
+        self.assertFalse(Deals(mock.Mock(), {}).is_bookmark_pageable('mdate'))
+        stream.bookmark_pagination = True
+        self.assertEqual(stream.get_querystring(0, 100, '2021-03-01T05:30:00.000000Z'),
+                         'offset=0&limit=100&filters[updated_timestamp][gt]=2021-02-28&orders[updated_timestamp]=ASC')
+        stream.cursor_value = '2021-03-02T10:00:00+01:00'
+        stream.cursor_offset = 100
+        self.assertEqual(stream.get_querystring(300, 100, '2021-03-01T05:30:00.000000Z'),
+                         'offset=100&limit=100&filters[updated_timestamp][gt]=2021-03-02T10:00:00%2B01:00&orders[updated_timestamp]=ASC')
+
+    def test_rejected_filter_falls_back(self):
+        """
+        Test that a filter rejected with 422 is dropped with the sort and the page requested again without them
+        """
+        mock_client = mock.Mock()
+        mock_client.get.side_effect = [client.ActiveCampaignUnprocessableEntityError('HTTP-error-code: 422'), {'contactTags': []}]
+        stream = ContactTags(mock_client, {})
+        stream.bookmark_pagination = True
+        querystring = stream.get_querystring(0, 100, '2021-03-01T00:00:00Z')
+
+        self.assertEqual(stream.get_page(stream.path, querystring), {'contactTags': []})
+        self.assertEqual(mock_client.get.call_args[1]['params'], 'offset=0&limit=100')
+        self.assertIsNone(stream.bookmark_query_field)
+        self.assertIsNone(stream.bookmark_sort_param)
+        self.assertFalse(stream.bookmark_pagination)
+        # Other instances of the stream keep their filter
+        self.assertEqual(ContactTags.bookmark_query_field, 'filters[updated_timestamp][gt]')
+        self.assertEqual(stream.get_querystring(100, 100, '2021-03-01T00:00:00Z'), 'offset=100&limit=100')
+
+    def test_error_without_filter_is_raised(self):
+        """
+        Test that a 400 error of a request without server-side filter is raised
+        """
+        mock_client = mock.Mock()
+        mock_client.get.side_effect = client.ActiveCampaignBadRequestError('HTTP-error-code: 400')
+        stream = Tags(mock_client, {})
+
+        with self.assertRaises(client.ActiveCampaignBadRequestError):
+            stream.get_page(stream.path, stream.get_querystring(0, 100, '2021-03-01T00:00:00Z'))
+        self.assertEqual(mock_client.get.call_count, 1)
@@ -0,0 +1,132 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+import tap_activecampaign
+from tap_activecampaign import writer
+
+class SlowOutput(io.StringIO):
+    """
+    stdout that records the number of writes
+    """
+    def __init__(self):
+        super().__init__()
+        self.writes = 0
+
+    def write(self, text):
+        self.writes += 1
+        return super().write(text)
+
+class BrokenOutput(io.StringIO):
+    def write(self, text):
+        raise BrokenPipeError(32, 'Broken pipe')
+
+class TestBufferedWriter(unittest.TestCase):
+    """
+    Test that messages written on the output thread keep their order and are flushed on stop
+    """
+    def tearDown(self):
+        if writer.OUTPUT:
+            writer.stop()
+
+    def start(self, out, queue_size=None):
+        with mock.patch('sys.stdout', out):
+            writer.start(queue_size)
+
+    def messages(self, out):
+        return [json.loads(line) for line in out.getvalue().splitlines()]
+
+    def test_order_and_flush_on_stop(self):
+        """
+        Test that records of concurrent streams keep their order and each state follows its records
+        """
+        out = SlowOutput()
+        self.start(out, queue_size=10)
+        state = {'bookmarks': {}}
+
+        def sync_stream(stream_name):
+            for i in range(500):
+                writer.write_record(stream_name, {'id': i})
+                if i % 100 == 99:
+                    with writer.STATE_LOCK:
+                        state['bookmarks'][stream_name] = i
+                        writer.write_state(state)
+
+        threads = [threading.Thread(target=sync_stream, args=(name,)) for name in ('tags', 'deals', 'contacts')]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        writer.stop()
+
+        messages = self.messages(out)
+        self.assertIsNone(writer.OUTPUT)
+        self.assertEqual(len(messages), 3 * 505)
+        last_ids = {}
+        for message in messages:
+            if message['type'] == 'RECORD':
+                stream_name = message['stream']
+                self.assertEqual(message['record']['id'], last_ids.get(stream_name, -1) + 1)
+                last_ids[stream_name] = message['record']['id']
+            else:
+                # No bookmark is ahead of the records written before the state
+                for stream_name, bookmark in message['value']['bookmarks'].items():
+                    self.assertLessEqual(bookmark, last_ids[stream_name])
+        self.assertLess(out.writes, len(messages))
+
+    def test_synchronous_without_thread(self):
+        """
+        Test that messages are written synchronously when the output thread is not started
+        """
+        out = io.StringIO()
+        with mock.patch('sys.stdout', out):
+            writer.start(0)
+            writer.write_record('tags', {'id': 1})
+        self.assertIsNone(writer.OUTPUT)
+        self.assertEqual(self.messages(out)[0]['record'], {'id': 1})
+
+    def test_write_error_is_raised(self):
+        """
+        Test that a failed write is raised to the syncing thread and on stop, without blocking
+        """
+        self.start(BrokenOutput(), queue_size=5)
+        with self.assertRaises(BrokenPipeError):
+            for i in range(1000):
+                writer.write_record('tags', {'id': i})
+                writer.write_state({'bookmarks': {'tags': i}})
+        with self.assertRaises(BrokenPipeError):
+            writer.stop()
+        self.assertIsNone(writer.OUTPUT)
+
+    def test_sync_error_is_not_replaced(self):
+        """
+        Test that when the sync fails, its error is raised rather than the error of the output thread
+        """
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        paths = {}
+        for name, content in (('config', {'api_url': 'https://dummy', 'api_token': 'dummy', 'start_date': '2021-01-01T00:00:00Z',
+                                          'user_agent': 'test'}),
+                              ('catalog', {'streams': []})):
+            paths[name] = os.path.join(directory, '{}.json'.format(name))
+            with open(paths[name], 'w') as json_file:
+                json.dump(content, json_file)
+
+        def failing_sync(**kwargs):
+            writer.write_record('tags', {'id': 1})
+            while not writer.OUTPUT.error: # the output thread fails on the first write
+                time.sleep(0.01)
+            raise ValueError('sync failed')
+
+        argv = ['tap-activecampaign', '--config', paths['config'], '--catalog', paths['catalog']]
+        with mock.patch('sys.argv', argv), mock.patch('sys.stdout', BrokenOutput()), \
+                mock.patch('tap_activecampaign.client.ActiveCampaignClient.check_api_token', return_value=True), \
+                mock.patch('tap_activecampaign.sync.sync', side_effect=failing_sync):
+            with self.assertRaises(ValueError):
+                tap_activecampaign.main()
+        self.assertIsNone(writer.OUTPUT)
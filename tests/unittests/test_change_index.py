@@ -0,0 +1,137 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+from singer import utils
+import helpers
+from tap_activecampaign import changeindex, writer
+from tap_activecampaign.discover import discover
+from tap_activecampaign.streams import Addresses, Deals, Tags
+
+def tags(version=1, count=250):
+    return [{'id': str(i), 'tag': 'tag {}'.format(i if i != 7 else '7 v{}'.format(version)),
+             'links': {'contactGoalTags': 'https://x'}} for i in range(1, count + 1)]
+
+def tag_keys(count=250):
+    return [changeindex.get_record_key({'id': i}, ['id']) for i in range(1, count + 1)]
+
+class TestChangeIndex(unittest.TestCase):
+    """
+    Test that the change index writes only new or changed records
+    """
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'changes.db')
+        changeindex.open_index(self.path)
+        self.addCleanup(changeindex.close_index)
+
+    def process(self, stream_class, records, config=None):
+        stream = stream_class(mock.Mock(), config or {})
+        written = []
+        with mock.patch.object(stream_class, 'write_record',
+                               side_effect=lambda stream_name, record, time_extracted: written.append(record)):
+            _, count = stream.process_records(discover(), stream.stream_name, records, utils.now())
+        self.assertEqual(count, len(written))
+        # The STATE message after the page delivers its records
+        with mock.patch('sys.stdout', io.StringIO()):
+            writer.write_state({})
+        return written
+
+    def test_only_changed_records_are_written(self):
+        """
+        Test that a second page with the same records writes only the new and changed ones
+        """
+        self.assertEqual(len(self.process(Tags, tags())), 250)
+        self.assertEqual(self.process(Tags, tags()), [])
+
+        written = self.process(Tags, tags(version=2, count=252))
+        self.assertEqual([record['id'] for record in written], [7, 251, 252])
+        self.assertEqual(written[0]['tag'], 'tag 7 v2')
+
+    def test_failed_output_is_written_again(self):
+        """
+        Test that records are only indexed once the STATE message after them is written,
+        so the records lost by a failing output are written again on the next run
+        """
+        class BrokenOutput(object):
+            def write(self, data):
+                raise BrokenPipeError(32, 'Broken pipe')
+
+            def flush(self):
+                pass
+
+        stream = Tags(mock.Mock(), {})
+        with mock.patch('sys.stdout', BrokenOutput()):
+            writer.start(10)
+            try:
+                stream.process_records(discover(), stream.stream_name, tags(), utils.now())
+                writer.write_state({})
+            except BrokenPipeError: # raised by the writer once the output thread failed
+                pass
+            self.assertIsInstance(writer.stop(raise_error=False), BrokenPipeError)
+
+        self.assertEqual(changeindex.INDEX.get_hashes('tags', tag_keys()), {})
+        self.assertEqual(len(self.process(Tags, tags())), 250)
+        self.assertEqual(self.process(Tags, tags()), [])
+
+    def test_state_bounds_undelivered_rows(self):
+        """
+        Test that a stream writes a STATE message once MAX_UNDELIVERED_ROWS rows wait for one,
+        so the hashes of a long FULL_TABLE stream are stored while it pages
+        """
+        class MockClient(helpers.MockClient):
+            def get_page(self, path, query):
+                offset = int(query['offset'])
+                return {'tags': tags()[offset:offset + 100], 'meta': {'total': '250'}}
+
+        stream = Tags(MockClient(), {})
+        output = io.StringIO()
+        with mock.patch.object(changeindex, 'MAX_UNDELIVERED_ROWS', 100), mock.patch('sys.stdout', output):
+            stream.sync(stream.client, discover(), {}, '2021-01-01T00:00:00Z', stream.path)
+
+        messages = [json.loads(line) for line in output.getvalue().splitlines()]
+        # After the first two pages; the last one waits for the STATE message after the stream
+        self.assertEqual(len([message for message in messages if message['type'] == 'STATE']), 2)
+        self.assertEqual(writer.get_pending_size(), 50)
+        self.assertEqual(len(changeindex.INDEX.get_hashes('tags', tag_keys())), 200)
+        with mock.patch('sys.stdout', output):
+            writer.write_state({})
+        self.assertEqual(writer.get_pending_size(), 0)
+        self.assertEqual(len(changeindex.INDEX.get_hashes('tags', tag_keys())), 250)
+
+    def test_streams(self):
+        """
+        Test that FULL_TABLE streams use the index by default, or the streams of `change_index_streams`
+        """
+        self.assertIsNotNone(Tags(None, {}).get_change_index())
+        self.assertIsNone(Deals(None, {}).get_change_index())
+        self.assertIsNotNone(Deals(None, {'change_index_streams': 'deals, addresses'}).get_change_index())
+        self.assertIsNone(Addresses(None, {'change_index_streams': ['deals']}).get_change_index())
+
+    def test_compact(self):
+        """
+        Test that compaction removes the records not seen for `max_age_days`
+        """
+        self.process(Tags, tags(count=10))
+        index = changeindex.INDEX
+        index.run_at = int(time.time())
+        with mock.patch('time.time', return_value=time.time() + 3 * 86400):
+            self.assertEqual(index.compact(max_age_days=7), 0)
+            self.assertEqual(index.compact(max_age_days=2), 10)
+        self.assertEqual(len(self.process(Tags, tags(count=10))), 10)
+
+    def test_compact_command(self):
+        """
+        Test that the compaction command removes every record of a stream
+        """
+        self.process(Tags, tags(count=10))
+        changeindex.close_index()
+        with mock.patch('sys.argv', ['tap-activecampaign-index', self.path, '--stream', 'tags']):
+            changeindex.main()
+        changeindex.open_index(self.path)
+        self.assertEqual(len(self.process(Tags, tags(count=10))), 10)
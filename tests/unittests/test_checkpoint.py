@@ -0,0 +1,204 @@
+import unittest
+from unittest import mock
+from urllib.parse import unquote
+from singer.utils import strptime_to_utc
+import helpers
+from tap_activecampaign.discover import discover
+from tap_activecampaign.streams import BookmarkCheckpoint, ContactTags, Tags, is_sort_honoured
+
+def contact_tag(record_id, minute):
+    return {'id': str(record_id), 'tag': '1', 'contact': '1',
+            'updatedTimestamp': '2021-03-01T{:02d}:{:02d}:00-00:00'.format(minute // 60, minute % 60)}
+
+def get_updated(record):
+    return strptime_to_utc(record['updatedTimestamp'])
+
+class MockClient(helpers.MockClient):
+    """
+    Client returning the contact tags after `filters[updated_timestamp][gt]`, sorted by
+    `orders[updated_timestamp]` unless `honours_sort` is False, else in the order given.
+    `on_request` is called with the number of the request before it is answered.
+    """
+    def __init__(self, records, data_key='contactTags', honours_sort=True, on_request=None):
+        super().__init__()
+        self.records = records
+        self.data_key = data_key
+        self.honours_sort = honours_sort
+        self.on_request = on_request
+
+    def get_page(self, path, query):
+        if self.on_request:
+            self.on_request(len(self.requests))
+        records = self.records
+        after = query.get('filters[updated_timestamp][gt]')
+        if after:
+            records = [record for record in records if get_updated(record) > strptime_to_utc(unquote(after))]
+        order = query.get('orders[updated_timestamp]')
+        if self.honours_sort and order:
+            records = sorted(records, key=get_updated, reverse=order == 'DESC')
+        offset = int(query['offset'])
+        page = [dict(record) for record in records[offset:offset + int(query['limit'])]]
+        return {self.data_key: page, 'meta': {'total': str(len(records))}}
+
+class TestBookmarkCheckpoint(unittest.TestCase):
+    """
+    Test the safe bookmark tracked by BookmarkCheckpoint
+    """
+    def test_safe_value_is_before_last_value(self):
+        """
+        Test that the safe bookmark is the last value before the highest value seen
+        """
+        checkpoint = BookmarkCheckpoint(pages=1, seconds=300)
+        checkpoint.add_page(['a', 'b', 'b', 'c'])
+        self.assertEqual(checkpoint.get_value_to_save(), 'b')
+        # Nothing new to save
+        checkpoint.add_page(['c', 'c'])
+        self.assertIsNone(checkpoint.get_value_to_save())
+        checkpoint.add_page(['c', 'd'])
+        self.assertEqual(checkpoint.get_value_to_save(), 'c')
+
+    def test_out_of_order_disables_checkpoint(self):
+        """
+        Test that a value lower than the previous one turns checkpointing off
+        """
+        checkpoint = BookmarkCheckpoint(pages=1, seconds=300)
+        checkpoint.add_page(['a', 'c', 'b'])
+        self.assertFalse(checkpoint.ordered)
+        self.assertIsNone(checkpoint.get_value_to_save())
+
+    def test_checkpoint_interval(self):
+        """
+        Test that the bookmark is saved every `pages` pages
+        """
+        checkpoint = BookmarkCheckpoint(pages=2, seconds=300)
+        checkpoint.add_page(['a', 'b'])
+        self.assertIsNone(checkpoint.get_value_to_save())
+        checkpoint.add_page(['c'])
+        self.assertEqual(checkpoint.get_value_to_save(), 'b')
+
+    def test_sort_verification(self):
+        """
+        Test that the sort is honoured only if the descending page reverses the ascending one
+        """
+        self.assertTrue(is_sort_honoured(['a', 'b', 'b'], ['c', 'b', 'b']))
+        self.assertTrue(is_sort_honoured(['a'], ['b']))
+        # The same page for both orders, ascending by chance
+        self.assertFalse(is_sort_honoured(['a', 'b', 'c'], ['a', 'b', 'c']))
+        # A single value tells nothing about the order
+        self.assertFalse(is_sort_honoured(['a', 'a'], ['a', 'a']))
+        self.assertFalse(is_sort_honoured(['a', 'b'], ['b', None]))
+        self.assertFalse(is_sort_honoured([], []))
+
+class TestMidStreamCheckpoint(unittest.TestCase):
+    """
+    Test that streams paged by bookmark write the bookmark while paging and lose no records
+    """
+    def sync_contact_tags(self, client, bookmark='2021-02-01T00:00:00Z'):
+        state = {'bookmarks': {'contact_tags': bookmark}}
+        written_bookmarks = []
+        with mock.patch('tap_activecampaign.writer.write_state', side_effect=lambda state: written_bookmarks.append(state['bookmarks']['contact_tags'])):
+            written_ids, _ = helpers.sync_stream(ContactTags(client, {'checkpoint_pages': 1}), state,
+                                                 get_written=lambda stream_name, record: record['id'])
+        return written_bookmarks, written_ids
+
+    def test_sorted_pages_write_checkpoints(self):
+        """
+        Test that each page starts after the safe bookmark of the previous one, from offset 0,
+        and that the safe bookmark is written after each page and the max bookmark at the end
+        """
+        client = MockClient([contact_tag(record_id, record_id) for record_id in range(1, 251)])
+        written_bookmarks, written_ids = self.sync_contact_tags(client)
+
+        self.assertEqual(client.get_querystrings(), [
+            'offset=0&limit=100&filters[updated_timestamp][gt]=2021-01-31&orders[updated_timestamp]=ASC',
+            'offset=0&limit=100&filters[updated_timestamp][gt]=2021-01-31&orders[updated_timestamp]=DESC',
+            'offset=0&limit=100&filters[updated_timestamp][gt]=2021-03-01T01:39:00-00:00&orders[updated_timestamp]=ASC',
+            'offset=0&limit=100&filters[updated_timestamp][gt]=2021-03-01T03:18:00-00:00&orders[updated_timestamp]=ASC'
+        ])
+        self.assertEqual(written_bookmarks, [
+            '2021-03-01T01:39:00.000000Z',
+            '2021-03-01T03:18:00.000000Z',
+            '2021-03-01T04:09:00.000000Z',
+            '2021-03-01T04:10:00.000000Z'
+        ])
+        # The records with the last bookmark of a page are requested again, but written once
+        self.assertEqual(written_ids, list(range(1, 251)))
+
+    def test_record_updated_while_paging_is_not_lost(self):
+        """
+        Test that a record updated after the first page moves to the end instead of shifting the next pages
+        """
+        records = [contact_tag(record_id, record_id) for record_id in range(1, 251)]
+
+        def update_record(request_number):
+            if request_number == 3:
+                records[4] = dict(records[4], updatedTimestamp='2021-03-02T00:00:00-00:00')
+
+        written_bookmarks, written_ids = self.sync_contact_tags(MockClient(records, on_request=update_record))
+
+        self.assertEqual(sorted(set(written_ids)), list(range(1, 251)))
+        # Written again with its new bookmark
+        self.assertEqual(written_ids.count(5), 2)
+        self.assertEqual(written_bookmarks[-1], '2021-03-02T00:00:00.000000Z')
+
+    def test_page_of_one_bookmark_moves_the_offset(self):
+        """
+        Test that a page whose records all have the same bookmark is followed by the next offset after the cursor
+        """
+        records = [contact_tag(record_id, min(record_id, 60)) for record_id in range(1, 201)] + \
+            [contact_tag(record_id, record_id) for record_id in range(201, 231)]
+        client = MockClient(records)
+        _, written_ids = self.sync_contact_tags(client)
+
+        self.assertEqual(client.get_querystrings()[2:], [
+            'offset=0&limit=100&filters[updated_timestamp][gt]=2021-03-01T00:59:00-00:00&orders[updated_timestamp]=ASC',
+            'offset=100&limit=100&filters[updated_timestamp][gt]=2021-03-01T00:59:00-00:00&orders[updated_timestamp]=ASC'
+        ])
+        self.assertEqual(written_ids, list(range(1, 231)))
+
+    def test_unsorted_pages_write_bookmark_at_end(self):
+        """
+        Test that a stream whose records are not sorted is paged by offset and writes the bookmark only after the last page
+        """
+        minutes = [(record_id * 7) % 150 + 1 for record_id in range(1, 151)]
+        client = MockClient([contact_tag(record_id, minute) for record_id, minute in enumerate(minutes, 1)],
+                            honours_sort=False)
+        written_bookmarks, written_ids = self.sync_contact_tags(client)
+
+        self.assertEqual(written_bookmarks, ['2021-03-01T02:30:00.000000Z'])
+        # The default order is kept after the first page
+        self.assertEqual(client.get_querystrings()[-1], 'offset=100&limit=100&filters[updated_timestamp][gt]=2021-01-31')
+        self.assertEqual(written_ids, list(range(1, 151)))
+
+    def test_ignored_sort_writes_bookmark_at_end(self):
+        """
+        Test that pages ascending by chance from an endpoint ignoring the sort param write no checkpoints
+        """
+        client = MockClient([contact_tag(record_id, record_id) for record_id in range(1, 151)], honours_sort=False)
+        written_bookmarks, written_ids = self.sync_contact_tags(client)
+
+        self.assertEqual(written_bookmarks, ['2021-03-01T02:30:00.000000Z'])
+        self.assertEqual(client.get_querystrings()[-1], 'offset=100&limit=100&filters[updated_timestamp][gt]=2021-01-31')
+        self.assertEqual(written_ids, list(range(1, 151)))
+
+    def test_single_page_is_not_verified(self):
+        """
+        Test that a stream of a single page does not request the descending page
+        """
+        client = MockClient([])
+        client.get = mock.Mock(return_value={'contactTags': [contact_tag(1, 1), contact_tag(2, 2)], 'meta': {'total': '2'}})
+        stream = ContactTags(client, {'checkpoint_pages': 1})
+        with mock.patch.object(ContactTags, 'write_record'), mock.patch('tap_activecampaign.writer.write_state'):
+            stream.sync(stream.client, discover(), {}, '2021-01-01T00:00:00Z', stream.path)
+        self.assertEqual(client.get.call_count, 1)
+        self.assertIsNone(stream.checkpoint.verified)
+
+    def test_full_table_stream_has_no_checkpoint(self):
+        """
+        Test that streams without sort param do not track checkpoints
+        """
+        stream = Tags(MockClient([], 'tags'), {})
+        self.assertIsNone(stream.bookmark_sort_param)
+        helpers.sync_stream(stream)
+        self.assertIsNone(stream.checkpoint)
+        self.assertFalse(stream.bookmark_pagination)
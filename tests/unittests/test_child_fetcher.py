@@ -0,0 +1,135 @@
+import random
+import time
+import unittest
+from unittest import mock
+import helpers
+from tap_activecampaign.streams import EcommerceOrders
+
+ORDERS = 250
+LIMIT = 100
+PRODUCTS_PER_ORDER = 2
+
+def updated_date(order_id):
+    # Orders 1-100 were updated before the bookmark used in the tests
+    return '2021-02-01T00:00:00-05:00' if order_id <= 100 else '2021-03-01T00:00:00-05:00'
+
+class MockClient(helpers.MockClient):
+    """
+    Client returning `ORDERS` orders with `PRODUCTS_PER_ORDER` products each, answering after a random delay
+    """
+    def __init__(self, fail_order=None):
+        super().__init__()
+        self.fail_order = fail_order
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def get_page(self, path, query):
+        offset = int(query['offset'])
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(random.uniform(0, 0.005))
+        with self.lock:
+            self.in_flight -= 1
+
+        if path == 'ecomOrders':
+            ids = range(offset + 1, min(offset + LIMIT, ORDERS) + 1)
+            return {'ecomOrders': [{'id': str(i), 'updatedDate': updated_date(i)} for i in ids],
+                    'meta': {'total': str(ORDERS)}}
+        order_id = int(path.split('/')[1])
+        if order_id == self.fail_order:
+            raise ConnectionError('order {}'.format(order_id))
+        return {'ecomOrderProducts': [{'id': str(order_id * 10 + i), 'orderid': str(order_id)}
+                                      for i in range(PRODUCTS_PER_ORDER)],
+                'meta': {'total': str(PRODUCTS_PER_ORDER)}}
+
+class TestChildFetcher(unittest.TestCase):
+    """
+    Test that `max_concurrent_children` syncs the children of each parent on worker threads
+    """
+    def sync_orders(self, config, client=None, state=None):
+        client = client or MockClient()
+        with mock.patch('tap_activecampaign.writer.write_message'):
+            written, _ = helpers.sync_stream(
+                EcommerceOrders(client, config), state,
+                get_written=lambda stream_name, record: (stream_name, record['id'], record.get('orderid')),
+                selected_streams=['ecommerce_orders', 'ecommerce_order_products'])
+        return client, written
+
+    def test_children_of_every_parent_are_synced(self):
+        """
+        Test that concurrent child syncs write the same records as a sequential sync, with the parent pages in order
+        """
+        client, written = self.sync_orders({'max_concurrent_children': 4})
+        _, sequential_written = self.sync_orders({})
+
+        self.assertCountEqual(written, sequential_written)
+        products = [record for record in written if record[0] == 'ecommerce_order_products']
+        self.assertEqual(len(products), ORDERS * PRODUCTS_PER_ORDER)
+        orders = [int(record[1]) for record in written if record[0] == 'ecommerce_orders']
+        self.assertEqual(orders, list(range(1, ORDERS + 1)))
+        self.assertGreater(client.max_in_flight, 1)
+
+    def test_parent_keeps_paging(self):
+        """
+        Test that the next parent page is requested before the children of the previous page are synced
+        """
+        client, _ = self.sync_orders({'max_concurrent_children': 2})
+        second_page = client.get_paths().index('ecomOrders', 1)
+        self.assertLess(second_page, LIMIT + 1)
+
+    def test_child_error_is_raised(self):
+        """
+        Test that a failed child sync is raised by the parent sync
+        """
+        with self.assertRaises(ConnectionError):
+            self.sync_orders({'max_concurrent_children': 4}, MockClient(fail_order=120))
+
+    def test_children_of_emitted_parents_only(self):
+        """
+        Test that the children of parents older than the bookmark are not synced
+        """
+        state = {'bookmarks': {'ecommerce_orders': '2021-02-15T00:00:00Z'}}
+        client, written = self.sync_orders({'max_concurrent_children': 4}, state=state)
+
+        orders = [int(record[1]) for record in written if record[0] == 'ecommerce_orders']
+        self.assertEqual(orders, list(range(101, ORDERS + 1)))
+        child_paths = [path for path in client.get_paths() if path != 'ecomOrders']
+        self.assertCountEqual(child_paths, ['ecomOrders/{}/orderProducts'.format(i) for i in range(101, ORDERS + 1)])
+
+    def test_child_sync_index(self):
+        """
+        Test that `child_sync_index` skips the children of parents that did not change since their last sync
+        """
+        state = {'bookmarks': {'ecommerce_orders': '2021-02-15T00:00:00Z'},
+                 'child_index': {'ecommerce_order_products': {
+                     '120': '2021-03-01T05:00:00.000000Z', # unchanged
+                     '130': '2021-02-20T00:00:00.000000Z', # changed since
+                     '50': '2021-02-01T05:00:00.000000Z'}}} # before the bookmark
+        client, _ = self.sync_orders({'child_sync_index': True}, state=state)
+
+        child_paths = [path for path in client.get_paths() if path != 'ecomOrders']
+        self.assertEqual(len(child_paths), ORDERS - 100 - 1)
+        self.assertNotIn('ecomOrders/120/orderProducts', child_paths)
+        self.assertIn('ecomOrders/130/orderProducts', child_paths)
+        # Every parent is up to the final bookmark, the state keeps none of them
+        self.assertEqual(state['bookmarks']['ecommerce_orders'], '2021-03-01T05:00:00.000000Z')
+        self.assertEqual(state['child_index']['ecommerce_order_products'], {})
+
+        client, _ = self.sync_orders({'child_sync_index': True}, state=state)
+        self.assertEqual([path for path in client.get_paths() if path != 'ecomOrders'], [])
+        self.assertEqual(state['child_index']['ecommerce_order_products'], {})
+
+    def test_bookmark_prunes_child_index(self):
+        """
+        Test that writing the parent bookmark removes the parents up to it from the child index
+        """
+        stream = EcommerceOrders(MockClient(), {})
+        state = {'child_index': {'ecommerce_order_products': {
+            '120': '2021-02-20T00:00:00.000000Z',
+            '130': '2021-02-25T00:00:00.000000Z',
+            '140': '2021-03-01T05:00:00.000000Z'}}}
+        with mock.patch('tap_activecampaign.writer.write_state') as mock_write_state:
+            stream.write_bookmark(state, 'ecommerce_orders', '2021-02-25T00:00:00.000000Z')
+        self.assertEqual(state['child_index']['ecommerce_order_products'], {'140': '2021-03-01T05:00:00.000000Z'})
+        mock_write_state.assert_called_once_with(state)
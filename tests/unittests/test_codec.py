@@ -0,0 +1,82 @@
+import decimal
+import json
+import unittest
+from datetime import datetime, timezone
+from unittest import mock
+import singer
+from tap_activecampaign import codec
+
+RECORD = {'id': 1, 'name': 'Zoë “quoted” \\ ✓', 'value': 10.5, 'tags': [1, None, True],
+          'nested': {'a': 'b'}}
+
+class TestCodec(unittest.TestCase):
+    """
+    Test that every codec decodes and encodes the same documents as singer-python
+    """
+    def codecs(self):
+        return [codec.StdlibCodec(), codec.OrjsonCodec(), codec.UjsonCodec()]
+
+    def message(self, record):
+        return singer.RecordMessage(stream='tags', record=record,
+                                    time_extracted=datetime(2021, 3, 1, 5, 30, tzinfo=timezone.utc))
+
+    def test_stdlib_matches_singer(self):
+        """
+        Test that the json codec writes the same line as singer.messages.format_message
+        """
+        message = self.message(dict(RECORD, amount=decimal.Decimal('12.3400000000000000001')))
+        with mock.patch.object(codec, 'CODEC', codec.StdlibCodec()):
+            self.assertEqual(codec.format_message(message), singer.messages.format_message(message))
+
+    def test_encode_matches_singer(self):
+        """
+        Test that each codec encodes records, Decimals and large integers to the same JSON as singer
+        """
+        records = [RECORD, dict(RECORD, amount=decimal.Decimal('12.3400000000000000001')),
+                   dict(RECORD, big=2 ** 70), {1: 'non string key'}]
+        for json_codec in self.codecs():
+            if json_codec.name != 'json' and codec.CODECS[json_codec.name][1] is None:
+                continue
+            for record in records:
+                message = self.message(record)
+                expected = json.loads(singer.messages.format_message(message), parse_float=decimal.Decimal)
+                actual = json.loads(json_codec.dumps(message.asdict()), parse_float=decimal.Decimal)
+                self.assertEqual(actual, expected)
+
+    def test_datetime_raises_like_singer(self):
+        """
+        Test that a datetime in a record fails to encode, as it does in singer-python
+        """
+        message = self.message({'id': 1, 'cdate': datetime(2021, 3, 1)})
+        with self.assertRaises(TypeError):
+            singer.messages.format_message(message)
+        for json_codec in self.codecs():
+            with self.assertRaises(TypeError):
+                json_codec.dumps(message.asdict())
+
+    def test_decode(self):
+        """
+        Test that each codec decodes bytes and str, including values the native codecs reject
+        """
+        documents = [json.dumps(RECORD).encode('utf-8'), json.dumps(RECORD, ensure_ascii=False),
+                     '{"big": 123456789012345678901234567890, "nan": NaN}']
+        for json_codec in self.codecs():
+            if json_codec.name != 'json' and codec.CODECS[json_codec.name][1] is None:
+                continue
+            for document in documents:
+                expected = json.loads(document)
+                actual = json_codec.loads(document)
+                self.assertEqual(json.dumps(actual, sort_keys=True), json.dumps(expected, sort_keys=True))
+            with self.assertRaises(ValueError):
+                json_codec.loads(b'{"id": ')
+
+    def test_get_codec(self):
+        """
+        Test that auto selects an installed codec, a missing codec falls back to json and an unknown one raises
+        """
+        self.assertEqual(codec.get_codec('json').name, 'json')
+        with mock.patch.dict(codec.CODECS, {'orjson': (codec.OrjsonCodec, None), 'ujson': (codec.UjsonCodec, None)}):
+            self.assertEqual(codec.get_codec(None).name, 'json')
+            self.assertEqual(codec.get_codec('orjson').name, 'json')
+        with self.assertRaises(ValueError):
+            codec.get_codec('yaml')
@@ -0,0 +1,161 @@
+import io
+import json
+import threading
+import time
+import unittest
+from unittest import mock
+from tap_activecampaign import writer
+from tap_activecampaign.sync import sync, sync_concurrently, STREAMS
+
+class MockCatalogEntry:
+    def __init__(self, stream):
+        self.stream = stream
+
+class MockCatalog:
+    def __init__(self, streams):
+        self.streams = streams
+
+    def get_selected_streams(self, state):
+        return [MockCatalogEntry(stream) for stream in self.streams]
+
+def mock_stream_class(synced, lock):
+    class MockStream:
+        path = 'dummy_path'
+
+        def __init__(self, client=None, config=None):
+            self.client = client
+
+        def write_schema(self, catalog, stream_name):
+            self.stream_name = stream_name
+
+        def sync(self, client, catalog, state, start_date, path, selected_streams=None):
+            with lock:
+                synced.append(self.stream_name)
+            return 1
+    return MockStream
+
+def writing_stream_class(barrier, started, fail_streams=(), records=200):
+    """
+    Stream writing its schema and records through `writer`, waiting on `barrier` halfway, so
+    that it only finishes if another stream is in flight at the same time
+    """
+    class WritingStream:
+        path = 'dummy_path'
+
+        def __init__(self, client=None, config=None):
+            self.client = client
+
+        def write_schema(self, catalog, stream_name):
+            self.stream_name = stream_name
+            writer.write_schema(stream_name, {'properties': {'id': {'type': 'integer'}}}, ['id'])
+
+        def sync(self, client, catalog, state, start_date, path, selected_streams=None):
+            started.append(self.stream_name)
+            for record_id in range(records):
+                writer.write_record(self.stream_name, {'id': record_id})
+                if record_id == records // 2:
+                    barrier.wait(timeout=10)
+                    if self.stream_name in fail_streams:
+                        raise RuntimeError('{} failed'.format(self.stream_name))
+                    # Leave time for the failure of the other stream to cancel the queued streams
+                    time.sleep(0.2)
+            return records
+    return WritingStream
+
+class TestConcurrentSync(unittest.TestCase):
+    """
+    Test that `max_concurrent_streams` syncs every top level stream and keeps `currently_syncing` resumable
+    """
+    def setUp(self):
+        self.synced = []
+        stream_class = mock_stream_class(self.synced, threading.Lock())
+        self.streams = {name: stream_class for name in ['contacts', 'deals', 'tags', 'ecommerce_orders', 'ecommerce_order_products']}
+
+    @mock.patch('tap_activecampaign.writer.write_state')
+    def test_concurrent_sync_all_streams(self, mock_write_state):
+        """
+        Test that every selected stream except sub streams is synced and `currently_syncing` is cleared at the end
+        """
+        catalog = MockCatalog(list(self.streams))
+        state = {}
+        with mock.patch.dict(STREAMS, self.streams, clear=True):
+            sync(None, {'start_date': '2021-01-01T00:00:00Z', 'max_concurrent_streams': 3}, catalog, state)
+
+        self.assertCountEqual(self.synced, ['contacts', 'deals', 'tags', 'ecommerce_orders'])
+        self.assertNotIn('currently_syncing', state)
+
+    @mock.patch('tap_activecampaign.writer.write_state')
+    def test_currently_syncing_is_first_unfinished_stream(self, mock_write_state):
+        """
+        Test that `currently_syncing` always points at the first stream that has not finished
+        """
+        written = []
+        mock_write_state.side_effect = lambda state: written.append(state.get('currently_syncing'))
+        catalog = MockCatalog(['contacts', 'deals', 'tags'])
+        state = {}
+        with mock.patch.dict(STREAMS, self.streams, clear=True):
+            sync(None, {'start_date': '2021-01-01T00:00:00Z', 'max_concurrent_streams': 1}, catalog, state)
+        self.assertEqual(written, ['contacts', None, 'deals', None, 'tags', None])
+
+        written.clear()
+        state = {}
+        with mock.patch.dict(STREAMS, self.streams, clear=True):
+            sync_concurrently(None, {}, catalog, state, ['contacts', 'deals', 'tags'], ['contacts', 'deals', 'tags'], 1)
+        self.assertEqual(written, ['contacts', 'deals', 'tags', None])
+
+class TestConcurrentSyncOutput(unittest.TestCase):
+    """
+    Test concurrent streams writing through the output thread of `writer`
+    """
+    def setUp(self):
+        self.out = io.StringIO()
+        with mock.patch('sys.stdout', self.out):
+            writer.start(queue_size=10)
+
+    def tearDown(self):
+        if writer.OUTPUT:
+            writer.stop()
+
+    def sync_streams(self, stream_names, fail_streams=()):
+        started = []
+        stream_class = writing_stream_class(threading.Barrier(2), started, fail_streams)
+        catalog = MockCatalog(stream_names)
+        with mock.patch.dict(STREAMS, {name: stream_class for name in stream_names}, clear=True):
+            try:
+                sync(None, {'start_date': '2021-01-01T00:00:00Z', 'max_concurrent_streams': 2}, catalog, {})
+            finally:
+                writer.stop()
+        return started, [json.loads(line) for line in self.out.getvalue().splitlines()]
+
+    def test_streams_in_flight_write_whole_ordered_messages(self):
+        """
+        Test that two streams are in flight at once and each message is a whole line, in order for each stream
+        """
+        started, messages = self.sync_streams(['contacts', 'deals'])
+
+        self.assertCountEqual(started, ['contacts', 'deals'])
+        records = [message for message in messages if message['type'] == 'RECORD']
+        for stream_name in ('contacts', 'deals'):
+            stream_messages = [message for message in messages if message.get('stream') == stream_name]
+            self.assertEqual(stream_messages[0]['type'], 'SCHEMA')
+            self.assertEqual([message['record']['id'] for message in stream_messages[1:]], list(range(200)))
+        # Both streams wrote half of their records before either wrote the other half
+        streams = [message['stream'] for message in records]
+        self.assertLess(streams.index('deals'), len(streams) - 1 - streams[::-1].index('contacts'))
+        self.assertLess(streams.index('contacts'), len(streams) - 1 - streams[::-1].index('deals'))
+        self.assertEqual(messages[-1], {'type': 'STATE', 'value': {}})
+
+    def test_failing_stream_cancels_queued_streams(self):
+        """
+        Test that a stream failing on a worker raises and the queued streams never start
+        """
+        with self.assertRaises(RuntimeError):
+            self.sync_streams(['contacts', 'deals', 'tags'], fail_streams=['contacts'])
+
+        messages = [json.loads(line) for line in self.out.getvalue().splitlines()]
+        self.assertNotIn('tags', [message.get('stream') for message in messages])
+        # The stream running on the other worker finished
+        deals_ids = [message['record']['id'] for message in messages
+                     if message['type'] == 'RECORD' and message['stream'] == 'deals']
+        self.assertEqual(deals_ids, list(range(200)))
+        self.assertEqual(messages[-1], {'type': 'STATE', 'value': {'currently_syncing': 'contacts'}})
@@ -0,0 +1,63 @@
+import unittest
+from datetime import datetime, timezone
+from singer import Transformer
+from tap_activecampaign import datetimes
+
+VALUES = [
+    '2021-03-01 05:30:00',
+    '2021-03-01T05:30:00-05:00',
+    '2021-03-01T05:30:00+05:30',
+    '2021-03-01T05:30:00+0530',
+    '2021-03-01T23:30:00-05:00',
+    '2020-12-31T23:59:59Z',
+    '2021-03-01T05:30:00.123Z',
+    '2021-03-01T05:30:00.123456+00:00',
+    '2021-03-01T05:30:00.000000Z',
+    '2021-03-01T05:30',
+    '2021-03-01',
+    '2020-02-29 00:00:00',
+    'March 1, 2021 05:30 PM',
+    '2021-03-01T05:30:00.1234567Z',
+]
+
+class TestDatetimes(unittest.TestCase):
+    """
+    Test the cached datetime parsing against the singer Transformer
+    """
+    def test_same_as_singer_transformer(self):
+        """
+        Test that each format is transformed to the same string as the singer Transformer
+        """
+        for value in VALUES:
+            with Transformer() as transformer:
+                expected = transformer._transform_datetime(value)
+            self.assertEqual(datetimes.transform_datetime(value), expected, value)
+            self.assertEqual(datetimes.ActiveCampaignTransformer()._transform_datetime(value), expected, value)
+
+    def test_empty_and_invalid_values(self):
+        """
+        Test that empty, placeholder and invalid dates are None
+        """
+        for value in (None, '', '0000-00-00 00:00:00', '2021-02-30 00:00:00', 'not a date'):
+            self.assertIsNone(datetimes.parse_datetime(value), value)
+            self.assertIsNone(datetimes.transform_datetime(value), value)
+
+    def test_parse_to_utc(self):
+        """
+        Test that offsets are converted to UTC and naive values are UTC
+        """
+        expected = datetime(2021, 3, 1, 10, 30, tzinfo=timezone.utc)
+        self.assertEqual(datetimes.parse_datetime('2021-03-01T05:30:00-05:00'), expected)
+        self.assertEqual(datetimes.parse_datetime('2021-03-01 10:30:00'), expected)
+        self.assertEqual(datetimes.parse_datetime('2021-03-01T10:30:00.000000Z'), expected)
+        self.assertLess(datetimes.parse_datetime('2021-03-01T05:29:59-05:00'), expected)
+
+    def test_repeated_values_are_cached(self):
+        """
+        Test that a repeated value is parsed once
+        """
+        datetimes.parse_datetime.cache_clear()
+        for _ in range(3):
+            datetimes.transform_datetime('2019-07-04 12:00:00')
+            datetimes.parse_datetime('2019-07-04 12:00:00')
+        self.assertEqual(datetimes.parse_datetime.cache_info().misses, 1)
@@ -26,6 +26,9 @@ class Mockresponse:
     def json(self):
         return self.text
 
+    def close(self):
+        pass
+
 def mock_send_400(*args, **kwargs):
     return Mockresponse("", 400, raise_error=True)
 
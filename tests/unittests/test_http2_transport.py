@@ -0,0 +1,107 @@
+import functools
+import gzip
+import json
+import unittest
+from unittest import mock
+import requests
+from tap_activecampaign import client, http2
+
+PAGE = {'contacts': [{'id': str(i), 'email': 'user{}@example.com'.format(i)} for i in range(1, 21)],
+        'meta': {'total': '20'}}
+
+class TestTransportSelection(unittest.TestCase):
+    """
+    Test that requests stays the default transport and the fallback
+    """
+    def test_default_transport(self):
+        """
+        Test that the default transport is a requests session
+        """
+        self.assertIsInstance(client.get_session(None, 10), requests.Session)
+        self.assertIsInstance(client.get_session('requests', 10), requests.Session)
+        with self.assertRaises(ValueError):
+            client.get_session('http3', 10)
+
+    def test_fallback_without_httpx(self):
+        """
+        Test that `http2` uses requests, with a warning, when httpx is not installed
+        """
+        with mock.patch.object(http2, 'httpx', None), mock.patch.object(client.LOGGER, 'warning') as mock_warning:
+            session = client.get_session('http2', 10)
+        self.assertIsInstance(session, requests.Session)
+        self.assertEqual(mock_warning.call_count, 1)
+
+@unittest.skipUnless(http2.is_available(), 'httpx with HTTP/2 support is not installed')
+class TestHttp2Transport(unittest.TestCase):
+    """
+    Test that requests sent over HTTP/2 with httpx go through the same error mapping and backoff
+    """
+    def get_client(self, handler):
+        self.requests = []
+
+        def record(request):
+            self.requests.append(request)
+            return handler(request)
+
+        transport = http2.httpx.MockTransport(record)
+        with mock.patch.object(http2, 'Http2Session', functools.partial(http2.Http2Session, transport=transport)):
+            _client = client.ActiveCampaignClient('https://dummy.api-us1.com', 'dummy_token', 'test_ua',
+                                                 transport='http2')
+        self.addCleanup(_client.__exit__, None, None, None)
+        return _client
+
+    def test_pages(self):
+        """
+        Test that pages are decoded whole or streamed, with the querystring and headers of the tap
+        """
+        body = gzip.compress(json.dumps(PAGE).encode('utf-8'))
+        _client = self.get_client(lambda request: http2.httpx.Response(
+            200, content=body, headers={'Content-Encoding': 'gzip'}))
+
+        self.assertEqual(_client.get('contacts', params='filters[id][gt]=0&limit=100'), PAGE)
+        page = _client.get('contacts', params='filters[id][gt]=0&limit=100', data_key='contacts')
+        self.assertEqual(page['contacts'], PAGE['contacts'])
+
+        request = self.requests[-1]
+        self.assertEqual(request.url.raw_path, b'/api/3/contacts?filters[id][gt]=0&limit=100')
+        self.assertEqual(request.headers['Api-Token'], 'dummy_token')
+        self.assertEqual(request.headers['User-Agent'], 'test_ua')
+        self.assertIn('gzip', request.headers['Accept-Encoding'])
+        self.assertEqual(_client.transport_stats.responses, 3) # check_api_token, then the pages
+
+    @mock.patch('time.sleep')
+    def test_error_mapping(self, mock_sleep):
+        """
+        Test that 404 raises ActiveCampaignNotFoundError and 429 is retried MAX_TRIES times
+        """
+        _client = self.get_client(lambda request: http2.httpx.Response(
+            404 if 'missing' in str(request.url) else 429, json={'message': 'error'}))
+        _client.check_api_token = mock.Mock(return_value=True)
+
+        with self.assertRaises(client.ActiveCampaignNotFoundError):
+            _client.get('missing')
+        self.assertEqual(len(self.requests), 1)
+        with self.assertRaises(client.Server429Error):
+            _client.get('contacts')
+        self.assertEqual(len(self.requests), 1 + client.MAX_TRIES)
+
+    @mock.patch('time.sleep')
+    def test_connection_errors_are_retried(self, mock_sleep):
+        """
+        Test that httpx connection errors and timeouts are raised as requests exceptions and retried
+        """
+        def handler(request):
+            if len(self.requests) == 1:
+                raise http2.httpx.ConnectError('connection refused')
+            if len(self.requests) == 2:
+                raise http2.httpx.ReadTimeout('timed out')
+            return http2.httpx.Response(200, json=PAGE)
+
+        _client = self.get_client(handler)
+        _client.check_api_token = mock.Mock(return_value=True)
+        self.assertEqual(_client.get('contacts'), PAGE)
+        self.assertEqual(len(self.requests), 3)
+
+        with mock.patch.object(http2.httpx.MockTransport, 'handle_request', side_effect=http2.httpx.ReadTimeout('timed out')):
+            with self.assertRaises(requests.exceptions.Timeout):
+                _client.get('contacts')
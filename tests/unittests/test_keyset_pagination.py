@@ -0,0 +1,125 @@
+import unittest
+from unittest import mock
+import helpers
+from tap_activecampaign import client
+from tap_activecampaign.streams import CampaignMessages, Contacts
+
+class MockClient(helpers.MockClient):
+    """
+    Client returning `total` campaign messages, paged by offset or by last id.
+    Ids have gaps, so an id cursor and an offset point to different records.
+    Records are sorted by id for `orders[id]=ASC`, else in `default_order` (by id by default).
+    """
+    def __init__(self, total, keyset=True, reject_keyset=False, default_order=None):
+        super().__init__()
+        self.ids = [3 * i for i in range(1, total + 1)]
+        self.keyset = keyset
+        self.reject_keyset = reject_keyset
+        self.default_order = default_order or self.ids
+
+    def get_page(self, path, query):
+        limit = int(query['limit'])
+        if self.reject_keyset and 'orders[id]' in query:
+            raise client.ActiveCampaignUnprocessableEntityError('HTTP-error-code: 422')
+        ids = self.ids if query.get('orders[id]') == 'ASC' else self.default_order
+        if self.keyset and 'filters[id][gt]' in query:
+            last_id = int(query['filters[id][gt]'])
+            ids = [i for i in ids if i > last_id]
+            total = len(ids)
+        else:
+            # Without keyset support the id filter is ignored and a missing offset is 0
+            total = len(ids)
+            ids = ids[int(query.get('offset', 0)):]
+        return {
+            'campaignMessages': [{'id': str(i)} for i in ids[:limit]],
+            'meta': {'total': str(total)}
+        }
+
+class TestKeysetPagination(unittest.TestCase):
+    """
+    Test that keyset streams page by the last id and fall back to offsets
+    """
+    def sync_campaign_messages(self, client):
+        stream = CampaignMessages(client, {})
+        written, total = helpers.sync_stream(stream, get_written=lambda stream_name, record: int(record['id']))
+        return stream, written, total
+
+    def test_pages_by_last_id(self):
+        """
+        Test that each page after the first is requested after the last id of the previous page
+        """
+        mock_client = MockClient(250)
+        stream, written, total = self.sync_campaign_messages(mock_client)
+
+        self.assertEqual(written, mock_client.ids)
+        self.assertEqual(total, 250)
+        self.assertTrue(stream.keyset_pagination)
+        self.assertEqual(mock_client.get_querystrings(), [
+            'limit=100&orders[id]=ASC',
+            'limit=100&orders[id]=ASC&filters[id][gt]=300',
+            'limit=100&orders[id]=ASC&filters[id][gt]=600'])
+
+    def test_full_last_page(self):
+        """
+        Test that a full last page is followed by one empty page
+        """
+        mock_client = MockClient(200)
+        _, written, total = self.sync_campaign_messages(mock_client)
+
+        self.assertEqual(written, mock_client.ids)
+        self.assertEqual(total, 200)
+        self.assertEqual(len(mock_client.get_querystrings()), 3)
+
+    def test_ignored_keyset_falls_back_to_offset(self):
+        """
+        Test that a page repeating ids is discarded and requested again by offset
+        """
+        mock_client = MockClient(150, keyset=False)
+        stream, written, total = self.sync_campaign_messages(mock_client)
+
+        self.assertFalse(stream.keyset_pagination)
+        self.assertEqual(mock_client.get_querystrings(), [
+            'limit=100&orders[id]=ASC',
+            'limit=100&orders[id]=ASC&filters[id][gt]=300',
+            'offset=100&limit=100&orders[id]=ASC'])
+        self.assertEqual(written, mock_client.ids)
+        self.assertEqual(total, 150)
+
+    def test_fallback_keeps_id_order(self):
+        """
+        Test that the offset pages after the fallback stay in id order when the default order is not by id
+        """
+        mock_client = MockClient(250, keyset=False, default_order=[3 * i for i in range(250, 0, -1)])
+        stream, written, total = self.sync_campaign_messages(mock_client)
+
+        self.assertFalse(stream.keyset_pagination)
+        self.assertEqual(mock_client.get_querystrings()[2:], [
+            'offset=100&limit=100&orders[id]=ASC',
+            'offset=200&limit=100&orders[id]=ASC'])
+        self.assertEqual(written, mock_client.ids)
+        self.assertEqual(total, 250)
+
+    def test_rejected_keyset_falls_back_to_offset(self):
+        """
+        Test that keyset params rejected with 422 are dropped and the page requested by offset
+        """
+        mock_client = MockClient(150, reject_keyset=True)
+        stream, written, total = self.sync_campaign_messages(mock_client)
+
+        self.assertFalse(stream.keyset_pagination)
+        self.assertEqual(mock_client.get_querystrings(), [
+            'limit=100&orders[id]=ASC',
+            'offset=0&limit=100',
+            'offset=100&limit=100'])
+        self.assertEqual(written, mock_client.ids)
+        self.assertEqual(total, 150)
+
+    def test_contacts_keyset_params(self):
+        """
+        Test that contacts use the `id_greater` filter next to the bookmark filter
+        """
+        stream = Contacts(mock.Mock(), {})
+        stream.keyset_pagination = True
+        stream.last_id = 1200
+        self.assertEqual(stream.get_querystring(100, 100, '2021-03-01T00:00:00Z'),
+                         'limit=100&orders[id]=ASC&id_greater=1200&filters[updated_after]=2021-02-28')
@@ -0,0 +1,78 @@
+import unittest
+from unittest import mock
+import helpers
+from tap_activecampaign.streams import Addresses
+
+class MockClient(helpers.MockClient):
+    """
+    Client returning `total` addresses, one page per offset
+    """
+    def __init__(self, total):
+        super().__init__()
+        self.total = total
+
+    def get_page(self, path, query):
+        offset, limit = int(query['offset']), int(query['limit'])
+        ids = range(offset + 1, min(offset + limit, self.total) + 1)
+        return {'addresses': [{'id': str(i)} for i in ids], 'meta': {'total': str(self.total)}}
+
+    def get_requested(self):
+        """ Return the (offset, limit) of each request """
+        return [(int(query['offset']), int(query['limit']))
+                for query in map(helpers.parse_query, self.get_querystrings())]
+
+class TestOffsetCheckpoint(unittest.TestCase):
+    """
+    Test that FULL_TABLE streams save and resume from offset checkpoints
+    """
+    def sync_addresses(self, client, state, config):
+        stream = Addresses(client, {'offset_checkpoints': 'true', **config})
+        written_offsets = []
+        with mock.patch('tap_activecampaign.writer.write_state', side_effect=lambda state: written_offsets.append(dict(state['offsets']).get('addresses'))):
+            written_records, _ = helpers.sync_stream(stream, state, get_written=lambda stream_name, record: int(record['id']))
+        return written_records, written_offsets
+
+    def test_offsets_written_while_paging(self):
+        """
+        Test that the next offset and total are saved every `checkpoint_pages` pages and removed at the end
+        """
+        state = {}
+        written_records, written_offsets = self.sync_addresses(MockClient(450), state, {'checkpoint_pages': 2})
+
+        self.assertEqual(written_records, list(range(1, 451)))
+        self.assertEqual(written_offsets, [{'offset': 200, 'total': 450}, {'offset': 400, 'total': 450}, None])
+        self.assertEqual(state['offsets'], {})
+
+    def test_resume_from_offset(self):
+        """
+        Test that the stream resumes from the saved offset when the total did not move
+        """
+        client = MockClient(452)
+        state = {'offsets': {'addresses': {'offset': 300, 'total': 450}}}
+        written_records, _ = self.sync_addresses(client, state, {'offset_checkpoint_tolerance': 5})
+
+        self.assertEqual(client.get_requested(), [(0, 1), (300, 100), (400, 100)])
+        self.assertEqual(written_records, list(range(301, 453)))
+
+    def test_restart_when_total_moved(self):
+        """
+        Test that the stream restarts from offset 0 when the total moved more than the tolerance
+        """
+        client = MockClient(460)
+        state = {'offsets': {'addresses': {'offset': 300, 'total': 450}}}
+        written_records, _ = self.sync_addresses(client, state, {'offset_checkpoint_tolerance': 5})
+
+        self.assertEqual(client.get_requested()[:2], [(0, 1), (0, 100)])
+        self.assertEqual(written_records, list(range(1, 461)))
+
+    def test_disabled_by_default(self):
+        """
+        Test that no offset is saved or used unless `offset_checkpoints` is set
+        """
+        client = MockClient(150)
+        state = {'offsets': {'addresses': {'offset': 100, 'total': 150}}}
+        with mock.patch('tap_activecampaign.writer.write_state') as mock_write_state:
+            helpers.sync_stream(Addresses(client, {}), state)
+
+        self.assertEqual(client.get_requested()[0], (0, 100))
+        mock_write_state.assert_not_called()
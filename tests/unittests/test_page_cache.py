@@ -0,0 +1,125 @@
+import json
+import threading
+import time
+import unittest
+from unittest import mock
+from tap_activecampaign import client
+from tap_activecampaign.discover import discover
+from tap_activecampaign.pagecache import PageCache
+from tap_activecampaign.streams import ContactCustomFields, ContactCustomFieldOptions, ContactCustomFieldRels
+from tap_activecampaign.sync import get_page_cache
+
+FIELDS = 150
+
+class MockResponse:
+    def __init__(self, content):
+        self.status_code = 200
+        self.content = content
+
+    def close(self):
+        pass
+
+def fields_page(method, url, **kwargs):
+    """ Page of /fields with the options and rels of its fields sideloaded """
+    query = dict(param.split('=') for param in kwargs['params'].split('&'))
+    offset, limit = int(query['offset']), int(query['limit'])
+    ids = range(offset + 1, min(offset + limit, FIELDS) + 1)
+    page = {
+        'fields': [{'id': str(i), 'title': 'Field {}'.format(i), 'links': {'options': 'https://x'}} for i in ids],
+        'fieldOptions': [{'id': str(i), 'field': str(i), 'label': 'Option {}'.format(i)} for i in ids],
+        'fieldRels': [{'id': str(i), 'field': str(i), 'relid': '0'} for i in ids],
+        'meta': {'total': str(FIELDS)}
+    }
+    return MockResponse(json.dumps(page).encode('utf-8'))
+
+class TestPageCache(unittest.TestCase):
+    """
+    Test that streams sharing an endpoint path read each page once
+    """
+    def test_page_dropped_after_last_reader(self):
+        """
+        Test that a page is cached until every stream sharing the path has read it
+        """
+        cache = PageCache({'fields': 3, 'tags': 1})
+        fetch = mock.Mock(return_value=b'{"fields": []}')
+        for _ in range(3):
+            self.assertEqual(cache.get('fields', 'offset=0', fetch), b'{"fields": []}')
+        self.assertEqual(fetch.call_count, 1)
+        self.assertEqual((cache.hits, cache.misses, cache.size), (2, 1, 0))
+        self.assertFalse(cache.is_cached('tags'))
+
+    def test_memory_bound(self):
+        """
+        Test that the least recently used pages are evicted over `max_bytes` and larger pages are not cached
+        """
+        cache = PageCache({'fields': 2}, max_bytes=10)
+        for offset in range(3):
+            cache.get('fields', offset, lambda: b'x' * 4)
+        self.assertEqual(list(cache.pages), [('fields', 1), ('fields', 2)])
+        self.assertEqual(cache.size, 8)
+        cache.get('fields', 3, lambda: b'x' * 11)
+        self.assertNotIn(('fields', 3), cache.pages)
+
+    def test_concurrent_readers_share_one_request(self):
+        """
+        Test that threads asking for a page that is being fetched wait for that request
+        """
+        cache = PageCache({'fields': 4})
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            time.sleep(0.05)
+            return b'page'
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get('fields', 'offset=0', fetch))) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [b'page'] * 4)
+
+    def test_failed_fetch_is_retried_by_waiter(self):
+        """
+        Test that a waiting thread fetches the page itself when the first request failed
+        """
+        cache = PageCache({'fields': 2})
+        with self.assertRaises(ConnectionError):
+            cache.get('fields', 'offset=0', mock.Mock(side_effect=ConnectionError))
+        self.assertEqual(cache.get('fields', 'offset=0', lambda: b'page'), b'page')
+        self.assertEqual(cache.fetching, {})
+
+    def test_get_page_cache(self):
+        """
+        Test that only the paths shared by selected streams are cached, unless `page_cache_mb` is 0
+        """
+        streams = ['contact_custom_fields', 'contact_custom_field_options', 'tags']
+        self.assertEqual(get_page_cache({}, streams).paths, {'fields': 2})
+        self.assertIsNone(get_page_cache({'page_cache_mb': 0}, streams))
+        self.assertIsNone(get_page_cache({}, ['contact_custom_fields', 'tags']))
+
+    @mock.patch('tap_activecampaign.writer.write_message')
+    @mock.patch('tap_activecampaign.client.ActiveCampaignClient.check_api_token')
+    @mock.patch('requests.Session.request', side_effect=fields_page)
+    def test_fields_streams_share_pages(self, mocked_request, mock_api_token, mock_write_message):
+        """
+        Test that the three streams of /fields write their records from one request per page
+        """
+        _client = client.ActiveCampaignClient('dummy_url', 'dummy_token')
+        stream_names = ['contact_custom_fields', 'contact_custom_field_options', 'contact_custom_field_rels']
+        _client.page_cache = get_page_cache({}, stream_names)
+        catalog = discover()
+
+        written = {}
+        for stream_class in (ContactCustomFields, ContactCustomFieldOptions, ContactCustomFieldRels):
+            stream = stream_class(_client, {})
+            with mock.patch.object(stream_class, 'write_record',
+                                   side_effect=lambda stream_name, record, time_extracted: written.setdefault(stream_name, []).append(record)):
+                stream.sync(_client, catalog, {}, '2021-01-01T00:00:00Z', stream.path)
+
+        self.assertEqual(mocked_request.call_count, 2)
+        for stream_name in stream_names:
+            self.assertEqual([record['id'] for record in written[stream_name]], list(range(1, FIELDS + 1)))
+        self.assertEqual(_client.page_cache.size, 0)
@@ -0,0 +1,62 @@
+import random
+import time
+import unittest
+import helpers
+from tap_activecampaign.streams import Tags, Contacts
+
+TOTAL = 450
+LIMIT = 100
+
+class MockClient(helpers.MockClient):
+    """
+    Client returning `TOTAL` tags, answering each page after a random delay
+    """
+    def __init__(self):
+        super().__init__()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def get_page(self, path, query):
+        offset = int(query['offset'])
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(random.uniform(0, 0.01))
+        with self.lock:
+            self.in_flight -= 1
+        ids = range(offset + 1, min(offset + LIMIT, TOTAL) + 1)
+        return {
+            'tags': [{'id': str(i), 'tag': 'tag {}'.format(i)} for i in ids],
+            'meta': {'total': str(TOTAL)}
+        }
+
+class TestPagePrefetch(unittest.TestCase):
+    """
+    Test that `max_concurrent_pages` prefetches pages but processes them in offset order
+    """
+    def sync_tags(self, config):
+        client = MockClient()
+        written, total = helpers.sync_stream(Tags(client, config), get_written=lambda stream_name, record: record['id'])
+        return client, written, total
+
+    def test_prefetch_keeps_offset_order(self):
+        """
+        Test that prefetched pages write the same records in the same order as a sequential sync
+        """
+        client, written, total = self.sync_tags({'max_concurrent_pages': 3})
+        _, sequential_written, sequential_total = self.sync_tags({})
+
+        self.assertEqual(written, list(range(1, TOTAL + 1)))
+        self.assertEqual(written, sequential_written)
+        self.assertEqual(total, sequential_total)
+        self.assertCountEqual([int(helpers.parse_query(params)['offset']) for params in client.get_querystrings()],
+                              [0, 100, 200, 300, 400])
+        self.assertLessEqual(client.max_in_flight, 3)
+
+    def test_querystring_has_bookmark_query_field(self):
+        """
+        Test that the page querystring contains paging and bookmark query params
+        """
+        stream = Contacts(MockClient(), {})
+        querystring = stream.get_querystring(200, LIMIT, '2021-01-01T00:00:00Z')
+        self.assertEqual(querystring, 'offset=200&limit=100&filters[updated_after]=2020-12-31')
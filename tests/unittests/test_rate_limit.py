@@ -0,0 +1,109 @@
+import asyncio
+import unittest
+from unittest import mock
+from tap_activecampaign.ratelimit import TokenBucket
+from tap_activecampaign.client import ActiveCampaignClient
+
+class FakeClock:
+    """
+    Clock whose time only moves when the limiter sleeps
+    """
+    def __init__(self):
+        self.now = 0.0
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+class TestTokenBucket(unittest.TestCase):
+    """
+    Test the token bucket rate limiter with a fake clock
+    """
+    def test_requests_are_spaced_at_rate(self):
+        """
+        Test that with burst 1 the requests are spaced exactly 1/rate seconds apart
+        """
+        clock = FakeClock()
+        bucket = TokenBucket(rate=5, burst=1, clock=clock.time, sleep=clock.sleep)
+        times = []
+        for _ in range(6):
+            bucket.acquire()
+            times.append(round(clock.now, 6))
+
+        self.assertEqual(times, [0.0, 0.2, 0.4, 0.6, 0.8, 1.0])
+        self.assertEqual(bucket.wait_count, 5)
+        self.assertAlmostEqual(bucket.wait_seconds, 1.0)
+
+    def test_burst_then_rate(self):
+        """
+        Test that a full bucket allows `burst` requests without waiting and then refills at `rate`
+        """
+        clock = FakeClock()
+        bucket = TokenBucket(rate=5, burst=3, clock=clock.time, sleep=clock.sleep)
+        waits = [bucket.acquire() for _ in range(5)]
+
+        self.assertEqual(waits[:3], [0.0, 0.0, 0.0])
+        self.assertAlmostEqual(waits[3], 0.2)
+        self.assertAlmostEqual(waits[4], 0.2)
+        self.assertEqual(bucket.acquire_count, 5)
+
+    def test_refill_is_capped_at_burst(self):
+        """
+        Test that an idle bucket never holds more than `burst` tokens
+        """
+        clock = FakeClock()
+        bucket = TokenBucket(rate=5, burst=2, clock=clock.time, sleep=clock.sleep)
+        clock.now = 100.0
+        waits = [bucket.acquire() for _ in range(3)]
+
+        self.assertEqual(waits[:2], [0.0, 0.0])
+        self.assertAlmostEqual(waits[2], 0.2)
+
+    def test_reservations_queue_up(self):
+        """
+        Test that concurrent reservations made at the same instant are given increasing waits
+        """
+        clock = FakeClock()
+        bucket = TokenBucket(rate=5, burst=1, clock=clock.time, sleep=clock.sleep)
+        waits = [bucket.reserve() for _ in range(4)]
+
+        self.assertEqual([round(wait, 6) for wait in waits], [0.0, 0.2, 0.4, 0.6])
+
+    def test_acquire_async(self):
+        """
+        Test that `acquire_async` reserves tokens from the same bucket
+        """
+        clock = FakeClock()
+        bucket = TokenBucket(rate=5, burst=1, clock=clock.time, sleep=clock.sleep)
+        with mock.patch('tap_activecampaign.ratelimit.asyncio.sleep', new_callable=mock.AsyncMock) as mock_sleep:
+            waits = asyncio.run(self._acquire_many(bucket, 2))
+
+        self.assertEqual(waits[0], 0.0)
+        self.assertAlmostEqual(waits[1], 0.2)
+        mock_sleep.assert_awaited_once()
+
+    async def _acquire_many(self, bucket, count):
+        return [await bucket.acquire_async() for _ in range(count)]
+
+    def test_invalid_config(self):
+        """
+        Test that a zero rate or burst raises ValueError
+        """
+        with self.assertRaises(ValueError):
+            TokenBucket(rate=0)
+        with self.assertRaises(ValueError):
+            TokenBucket(rate=5, burst=0)
+
+    def test_client_rate_limit_config(self):
+        """
+        Test that the client builds its limiter from `requests_per_second` and `burst`
+        """
+        client = ActiveCampaignClient('dummy_url', 'dummy_token', requests_per_second='2.5', burst='4')
+        self.assertEqual(client.rate_limiter.rate, 2.5)
+        self.assertEqual(client.rate_limiter.burst, 4)
+
+        client = ActiveCampaignClient('dummy_url', 'dummy_token')
+        self.assertEqual(client.rate_limiter.rate, 5)
+        self.assertEqual(client.rate_limiter.burst, 1)
@@ -0,0 +1,47 @@
+import unittest
+from unittest import mock
+from singer import utils
+from tap_activecampaign.discover import discover
+from tap_activecampaign.streams import Deals
+
+def deal(deal_id, mdate, cdate='2021-03-02T10:00:00-05:00'):
+    return {'id': deal_id, 'title': 'Deal {}'.format(deal_id), 'mdate': mdate, 'cdate': cdate,
+            'nextdate': '0000-00-00 00:00:00', 'links': {'dealActivities': 'https://x'},
+            'customFields': {'fieldName': 'x'}}
+
+class TestRecordPipeline(unittest.TestCase):
+    """
+    Test that process_records prepares, checks, transforms and writes API records in one pass
+    """
+    def process(self, records):
+        stream = Deals(mock.Mock(), {})
+        written = []
+        with mock.patch.object(Deals, 'write_record', side_effect=lambda stream_name, record, time_extracted: written.append(record)):
+            max_bookmark_value, count = stream.process_records(
+                discover(), 'deals', records, utils.now(), bookmark_field='mdate',
+                max_bookmark_value='2021-03-01T00:00:00Z', last_datetime='2021-03-01T00:00:00Z')
+        return written, max_bookmark_value, count
+
+    def test_records_are_prepared_and_written(self):
+        """
+        Test that links are removed, zero dates are None and an empty bookmark is the created date
+        """
+        records = [deal('1', '2021-03-03 00:00:00'), deal('2', None), deal('3', '2021-02-01 00:00:00')]
+        written, max_bookmark_value, count = self.process(records)
+
+        self.assertEqual(count, 2)
+        self.assertEqual([record['id'] for record in written], [1, 2])
+        self.assertEqual(written[1]['mdate'], '2021-03-02T15:00:00.000000Z')
+        self.assertIsNone(written[0]['nextdate'])
+        self.assertNotIn('links', written[0])
+        self.assertEqual(max_bookmark_value, '2021-03-03T00:00:00.000000Z')
+        # The API records are decamelized in place for the children and checkpoints
+        self.assertNotIn('links', records[0])
+        self.assertEqual(records[1]['mdate'], '2021-03-02T10:00:00-05:00')
+
+    def test_missing_key_raises(self):
+        """
+        Test that a record without its key field raises RuntimeError
+        """
+        with self.assertRaises(RuntimeError):
+            self.process([deal('1', '2021-03-03 00:00:00'), deal(None, '2021-03-03 00:00:00')])
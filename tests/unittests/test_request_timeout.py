@@ -84,6 +84,9 @@ class MockResponse():
     def json(self):
         return self.text
 
+    def close(self):
+        pass
+
 class TestRequestTimeoutValue(unittest.TestCase):
     '''
     Test that request timeout parameter works properly in various cases
@@ -0,0 +1,106 @@
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+import tap_activecampaign
+from tap_activecampaign import schema
+from tap_activecampaign.discover import discover
+from tap_activecampaign.streams import flatten_streams
+
+class TestSchemaBundle(unittest.TestCase):
+    """
+    Test that discovery reads the schemas from the bundle without network access
+    """
+    def test_bundle_is_fresh(self):
+        """
+        Test that the packaged bundle is the one built from the schema files
+        """
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = schema.build_schema_bundle(os.path.join(directory, 'bundle.json'))
+        with open(path) as built, open(schema.get_abs_path(schema.SCHEMA_BUNDLE)) as packaged:
+            self.assertEqual(json.load(packaged), json.load(built),
+                             'Run `python -m tap_activecampaign.schema` to rebuild the schema bundle')
+        flat_streams = flatten_streams()
+        self.assertEqual(schema.load_schema_bundle(flat_streams), schema.load_schema_files(flat_streams))
+
+    def test_stale_bundle(self):
+        """
+        Test that a bundle not matching the schema files is ignored, and get_schemas reads the files
+        """
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = schema.build_schema_bundle(os.path.join(directory, 'bundle.json'))
+        flat_streams = flatten_streams()
+        self.assertIsNotNone(schema.load_schema_bundle(flat_streams, path))
+
+        self.assertIsNone(schema.load_schema_bundle(dict(flat_streams, new_stream={}), path))
+
+        # An edit keeping the size of a schema file, after the bundle was built
+        schema_dir = os.path.join(directory, 'schemas')
+        shutil.copytree(os.path.dirname(schema.get_schema_path('tags')), schema_dir)
+        tags_path = os.path.join(schema_dir, 'tags.json')
+        with open(tags_path) as file:
+            content = file.read()
+        with open(tags_path, 'w') as file:
+            file.write(content.replace('"string"', '"number"', 1))
+        mtime = os.path.getmtime(path) + 10
+        os.utime(tags_path, (mtime, mtime))
+        with mock.patch.object(schema, 'get_schema_path',
+                               side_effect=lambda stream_name: os.path.join(schema_dir, '{}.json'.format(stream_name))):
+            self.assertIsNone(schema.load_schema_bundle(flat_streams, path))
+            # Touched without any change
+            with open(tags_path, 'w') as file:
+                file.write(content)
+            os.utime(tags_path, (mtime, mtime))
+            self.assertIsNotNone(schema.load_schema_bundle(flat_streams, path))
+
+        with mock.patch.object(schema, 'load_schema_bundle', return_value=None):
+            schemas, _ = schema.get_schemas()
+        self.assertEqual(schemas, schema.load_schema_files(flat_streams))
+
+    def test_lazy_catalog(self):
+        """
+        Test that catalog entries are built when first used, and the catalog lists every stream in order
+        """
+        catalog = discover()
+        self.assertIs(catalog.get_stream('tags'), catalog.get_stream('tags'))
+        self.assertEqual(list(catalog.entries), ['tags'])
+        self.assertIsNone(catalog.get_stream('missing'))
+        self.assertEqual([entry.stream for entry in catalog.streams], list(flatten_streams()))
+        self.assertIs(catalog.get_stream('tags'), catalog.streams[[entry.stream for entry in catalog.streams].index('tags')])
+
+    @mock.patch('tap_activecampaign.client.ActiveCampaignClient.__enter__', side_effect=AssertionError('network'))
+    def test_discover_without_credentials(self, mock_enter):
+        """
+        Test that --discover writes the catalog without credentials and without opening the client
+        """
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        config_path = os.path.join(directory, 'config.json')
+        with open(config_path, 'w') as config_file:
+            json.dump({}, config_file)
+
+        output = io.StringIO()
+        with mock.patch('sys.argv', ['tap-activecampaign', '--config', config_path, '--discover']), \
+                mock.patch('sys.stdout', output):
+            tap_activecampaign.main()
+
+        catalog = json.loads(output.getvalue())
+        self.assertEqual(len(catalog['streams']), len(flatten_streams()))
+        self.assertFalse(mock_enter.called)
+
+    def test_discover_does_not_import_the_client(self):
+        """
+        Test that discovery imports neither the client nor the sync modules
+        """
+        code = ('import sys; from tap_activecampaign.discover import discover; discover(); '
+                'print(sorted(set(sys.modules) & {"tap_activecampaign.client", "tap_activecampaign.sync", '
+                '"tap_activecampaign.http2", "aiohttp", "httpx"}))')
+        output = subprocess.run([sys.executable, '-c', code], check=True, stdout=subprocess.PIPE).stdout
+        self.assertEqual(json.loads(output.decode('utf-8').replace("'", '"')), [])
@@ -0,0 +1,83 @@
+import unittest
+from unittest import mock
+import helpers
+from tap_activecampaign.client import ActiveCampaignBadRequestError
+from tap_activecampaign.streams import EcommerceOrders
+
+ORDERS = 150
+LIMIT = 100
+
+def products(order_id):
+    return [{'id': str(order_id * 10 + i), 'orderid': str(order_id), 'name': 'Product {}'.format(i)} for i in range(2)]
+
+class MockClient(helpers.MockClient):
+    """
+    Client returning `ORDERS` orders, with their products sideloaded when `include` is `sideload`
+    (None ignores include= and 'reject' answers 400)
+    """
+    def __init__(self, sideload='sideload'):
+        super().__init__()
+        self.sideload = sideload
+
+    def get_page(self, path, query):
+        if path != 'ecomOrders':
+            order_id = int(path.split('/')[1])
+            return {'ecomOrderProducts': products(order_id), 'meta': {'total': '2'}}
+        if 'include' in query and self.sideload == 'reject':
+            raise ActiveCampaignBadRequestError('include is not supported')
+        offset = int(query['offset'])
+        ids = range(offset + 1, min(offset + LIMIT, ORDERS) + 1)
+        # Orders 1-50 were updated before the bookmark used in the tests
+        page = {'ecomOrders': [{'id': str(i), 'updatedDate': '2021-02-01T00:00:00Z' if i <= 50 else '2021-03-01T00:00:00Z',
+                                'orderProducts': [str(i * 10), str(i * 10 + 1)]} for i in ids],
+                'meta': {'total': str(ORDERS)}}
+        if query.get('include') == 'orderProducts' and self.sideload == 'sideload':
+            page['ecomOrderProducts'] = [product for i in ids for product in products(i)]
+        return page
+
+class TestSideload(unittest.TestCase):
+    """
+    Test that the `sideload` config reads the products of each order from the orders pages
+    """
+    def sync_orders(self, config, client):
+        state = {'bookmarks': {'ecommerce_orders': '2021-02-15T00:00:00Z'}}
+        with mock.patch('tap_activecampaign.writer.write_message'):
+            written, _ = helpers.sync_stream(
+                EcommerceOrders(client, config), state, get_written=lambda stream_name, record: (stream_name, record),
+                selected_streams=['ecommerce_orders', 'ecommerce_order_products'])
+        return written
+
+    def test_products_are_sideloaded(self):
+        """
+        Test that sideloaded products are written for the orders written, without a request per order
+        """
+        client = MockClient()
+        written = self.sync_orders({'sideload': True}, client)
+        requested_written = self.sync_orders({}, MockClient())
+
+        self.assertEqual(client.get_paths(), ['ecomOrders', 'ecomOrders'])
+        self.assertTrue(all('include=orderProducts' in params for params in client.get_querystrings()))
+        self.assertEqual(written, requested_written)
+        product_orders = {record['orderid'] for stream_name, record in written if stream_name == 'ecommerce_order_products'}
+        self.assertEqual(product_orders, set(range(51, ORDERS + 1)))
+
+    def test_include_is_ignored(self):
+        """
+        Test that products are requested for each order when the page has no sideloaded products
+        """
+        client = MockClient(sideload=None)
+        written = self.sync_orders({'sideload': True}, client)
+
+        self.assertEqual(written, self.sync_orders({}, MockClient()))
+        self.assertEqual(len(client.requests), 2 + ORDERS - 50)
+        self.assertNotIn('include', client.requests[-1][1])
+
+    def test_include_is_rejected(self):
+        """
+        Test that products are requested for each order when the endpoint rejects include
+        """
+        client = MockClient(sideload='reject')
+        written = self.sync_orders({'sideload': True}, client)
+
+        self.assertEqual(written, self.sync_orders({}, MockClient()))
+        self.assertEqual([params for path, params in client.requests if 'include' in params], [client.requests[0][1]])
@@ -0,0 +1,132 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import helpers
+from tap_activecampaign import client, writer
+from tap_activecampaign.discover import discover
+from tap_activecampaign.streams import Tags
+
+class MockClient(helpers.MockClient):
+    """
+    Client returning `total` tags with an ETag, answering 304 when the ETag matches.
+    The offset and ETag of every conditional request are appended to `conditional_requests`.
+    """
+    def __init__(self, total=150, version=1, etag=True):
+        super().__init__()
+        self.total = total
+        self.version = version
+        self.etag = etag
+        self.conditional_requests = []
+
+    def get_conditional(self, path, params, etag=None, last_modified=None, endpoint=None):
+        offset = int(helpers.parse_query(params)['offset'])
+        page_etag = '"v{}-{}"'.format(self.version, offset) if self.etag else None
+        self.conditional_requests.append((offset, etag))
+        if etag and etag == page_etag:
+            return None, page_etag, None
+        ids = range(offset + 1, min(offset + 100, self.total) + 1)
+        page = {'tags': [{'id': str(i), 'tag': 'tag {} v{}'.format(i, self.version)} for i in ids],
+                'meta': {'total': str(self.total)}}
+        return json.dumps(page).encode('utf-8'), page_etag, None
+
+class TestSnapshot(unittest.TestCase):
+    """
+    Test that small FULL_TABLE streams are replayed or skipped from their snapshot when unchanged
+    """
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def sync_tags(self, mock_client, **config):
+        written, total = helpers.sync_stream(Tags(mock_client, dict(config, snapshot_dir=self.directory)))
+        self.assertEqual(total, len(written))
+        # The STATE message after the stream delivers its records
+        with mock.patch('sys.stdout', io.StringIO()):
+            writer.write_state({})
+        return written
+
+    def test_unchanged_stream_is_replayed(self):
+        """
+        Test that an unchanged stream is written from the snapshot after 304 answers
+        """
+        first = self.sync_tags(MockClient())
+        self.assertEqual(len(first), 150)
+        self.assertTrue(os.path.exists(os.path.join(self.directory, 'tags.json')))
+
+        mock_client = MockClient()
+        self.assertEqual(self.sync_tags(mock_client), first)
+        self.assertEqual(mock_client.conditional_requests, [(0, '"v1-0"'), (100, '"v1-100"')])
+
+    def test_unchanged_stream_is_skipped(self):
+        """
+        Test that `snapshot_mode` skip writes no records when the content hash did not change
+        """
+        self.sync_tags(MockClient(etag=False))
+        mock_client = MockClient(etag=False)
+        self.assertEqual(self.sync_tags(mock_client, snapshot_mode='skip'), [])
+        self.assertEqual(len(mock_client.conditional_requests), 2)
+
+    def test_failed_output_is_not_skipped(self):
+        """
+        Test that the snapshot is only saved once the STATE message after the records is written,
+        so `snapshot_mode` skip writes again the records lost by a failing output
+        """
+        class BrokenOutput(object):
+            def write(self, data):
+                raise BrokenPipeError(32, 'Broken pipe')
+
+            def flush(self):
+                pass
+
+        stream = Tags(MockClient(etag=False), {'snapshot_dir': self.directory})
+        with mock.patch('sys.stdout', BrokenOutput()):
+            writer.start(10)
+            try:
+                stream.sync(stream.client, discover(), {}, '2021-01-01T00:00:00Z', stream.path)
+                writer.write_state({})
+            except BrokenPipeError: # raised by the writer once the output thread failed
+                pass
+            self.assertIsInstance(writer.stop(raise_error=False), BrokenPipeError)
+
+        self.assertFalse(os.path.exists(os.path.join(self.directory, 'tags.json')))
+        self.assertEqual(len(self.sync_tags(MockClient(etag=False), snapshot_mode='skip')), 150)
+        self.assertEqual(self.sync_tags(MockClient(etag=False), snapshot_mode='skip'), [])
+
+    def test_changed_stream(self):
+        """
+        Test that a changed stream writes the new records and updates the snapshot
+        """
+        self.sync_tags(MockClient())
+        written = self.sync_tags(MockClient(total=120, version=2), snapshot_mode='skip')
+        self.assertEqual(len(written), 120)
+        self.assertEqual(written[0]['tag'], 'tag 1 v2')
+        self.assertEqual(self.sync_tags(MockClient(total=120, version=2), snapshot_mode='skip'), [])
+
+    def test_fresh_snapshot_without_requests(self):
+        """
+        Test that a snapshot younger than `snapshot_max_age` is used without requests
+        """
+        first = self.sync_tags(MockClient())
+        mock_client = MockClient(version=2)
+        self.assertEqual(self.sync_tags(mock_client, snapshot_max_age=900), first)
+        self.assertEqual(mock_client.conditional_requests, [])
+
+    @mock.patch('tap_activecampaign.client.ActiveCampaignClient.check_api_token')
+    @mock.patch('requests.Session.request')
+    def test_conditional_request(self, mocked_request, mock_api_token):
+        """
+        Test that get_conditional sends the validators and returns None content for 304 Not Modified
+        """
+        mocked_request.return_value = mock.Mock(status_code=304, headers={'ETag': '"v1"'})
+        _client = client.ActiveCampaignClient('dummy_url', 'dummy_token')
+
+        result = _client.get_conditional('tags', 'offset=0&limit=100', etag='"v1"', last_modified='Mon, 01 Mar 2021 00:00:00 GMT')
+
+        self.assertEqual(result, (None, '"v1"', None))
+        headers = mocked_request.call_args[1]['headers']
+        self.assertEqual(headers['If-None-Match'], '"v1"')
+        self.assertEqual(headers['If-Modified-Since'], 'Mon, 01 Mar 2021 00:00:00 GMT')
@@ -0,0 +1,124 @@
+import json
+import unittest
+from unittest.mock import patch
+from tap_activecampaign import client
+from tap_activecampaign.jsonstream import PageParser, TruncatedPageError
+
+PAGE = {
+    'campaignMessages': [
+        {'id': str(i), 'html': '<p class="x">{} \\ {{[escaped]}} é ☃</p>'.format(i), 'links': {'campaign': 'https://x/{}'.format(i)}}
+        for i in range(1, 21)],
+    'messages': [{'id': str(i), 'html': '<div>' + '"}]' * 1000 + '</div>'} for i in range(5)],
+    'meta': {'total': '20'}
+}
+BODY = json.dumps(PAGE, ensure_ascii=False).encode('utf-8')
+
+def chunked(body, size):
+    return [body[i:i + size] for i in range(0, len(body), size)]
+
+class MockStreamResponse:
+    def __init__(self, body, chunk_size=7):
+        self.body = body
+        self.chunk_size = chunk_size
+        self.status_code = 200
+        self.url = 'https://dummy.api-us1.com/api/3/campaignMessages'
+        self.closed = False
+
+    def iter_content(self, chunk_size=None):
+        return iter(chunked(self.body, self.chunk_size))
+
+    def close(self):
+        self.closed = True
+
+class TestPageParser(unittest.TestCase):
+    """
+    Test the incremental page parser
+    """
+    def test_records_for_any_chunk_size(self):
+        """
+        Test that the records and meta are the same as `json.loads` whatever the chunk boundaries
+        """
+        for size in (1, 2, 3, 5, 64, 4096, len(BODY)):
+            parser = PageParser(chunked(BODY, size), 'campaignMessages')
+            self.assertEqual(list(parser), PAGE['campaignMessages'], size)
+            self.assertEqual(parser.values, {'meta': {'total': '20'}})
+            self.assertTrue(parser.has_data_key)
+
+    def test_records_are_yielded_as_they_arrive(self):
+        """
+        Test that the first record is yielded before the rest of the body is read
+        """
+        chunks = iter(chunked(BODY, 64))
+        parser = PageParser(chunks, 'campaignMessages')
+        self.assertEqual(next(iter(parser)), PAGE['campaignMessages'][0])
+        self.assertIsNotNone(next(chunks, None))
+
+    def test_truncated_body(self):
+        """
+        Test that a body cut anywhere raises TruncatedPageError
+        """
+        for cut in range(0, len(BODY), 97):
+            with self.assertRaises(TruncatedPageError, msg=cut):
+                list(PageParser(chunked(BODY[:cut], 50), 'campaignMessages'))
+
+    def test_invalid_json(self):
+        """
+        Test that invalid JSON raises a ValueError with the position
+        """
+        with self.assertRaises(ValueError) as e:
+            list(PageParser([b'{"tags": [{"id": "1"} {"id": "2"}]}'], 'tags'))
+        self.assertNotIsInstance(e.exception, TruncatedPageError)
+        self.assertIn('Invalid JSON at character 22 after 1 records', str(e.exception))
+
+class TestStreamingRequest(unittest.TestCase):
+    """
+    Test `request` in streaming mode
+    """
+    @patch("tap_activecampaign.client.ActiveCampaignClient.check_api_token")
+    @patch("requests.Session.request")
+    def test_streaming_page(self, mocked_request, mock_api_token):
+        """
+        Test that `request` with `data_key` returns the records and meta, without the sideloaded objects
+        """
+        response = MockStreamResponse(BODY)
+        mocked_request.return_value = response
+        _client = client.ActiveCampaignClient('dummy_url', 'dummy_token')
+
+        page = _client.get('campaignMessages', data_key='campaignMessages')
+
+        self.assertEqual(page, {'campaignMessages': PAGE['campaignMessages'], 'meta': {'total': '20'}})
+        self.assertTrue(response.closed)
+
+        # Sideloads in `keep_keys` are decoded as well
+        mocked_request.return_value = MockStreamResponse(BODY)
+        page = _client.get('campaignMessages', data_key='campaignMessages', keep_keys=['messages'])
+        self.assertEqual(page, PAGE)
+
+    @patch("time.sleep")
+    @patch("tap_activecampaign.client.ActiveCampaignClient.check_api_token")
+    @patch("requests.Session.request")
+    def test_truncated_page_is_retried(self, mocked_request, mock_api_token, mock_sleep):
+        """
+        Test that a truncated body raises ActiveCampaignIncompleteResponseError and is retried
+        """
+        mocked_request.side_effect = [MockStreamResponse(BODY[:500]), MockStreamResponse(BODY)]
+        _client = client.ActiveCampaignClient('dummy_url', 'dummy_token')
+
+        page = _client.get('campaignMessages', data_key='campaignMessages')
+
+        self.assertEqual(page['campaignMessages'], PAGE['campaignMessages'])
+        self.assertEqual(mocked_request.call_count, 2)
+
+    @patch("time.sleep")
+    @patch("tap_activecampaign.client.ActiveCampaignClient.check_api_token")
+    @patch("requests.Session.request")
+    def test_truncated_page_backoff_max_tries(self, mocked_request, mock_api_token, mock_sleep):
+        """
+        Test that a body truncated on every try raises ActiveCampaignIncompleteResponseError after `MAX_TRIES`
+        """
+        mocked_request.side_effect = lambda *args, **kwargs: MockStreamResponse(BODY[:500])
+        _client = client.ActiveCampaignClient('dummy_url', 'dummy_token')
+
+        with self.assertRaises(client.ActiveCampaignIncompleteResponseError):
+            _client.get('campaignMessages', data_key='campaignMessages')
+        self.assertEqual(mocked_request.call_count, client.MAX_TRIES)
@@ -0,0 +1,60 @@
+import unittest
+from unittest import mock
+from singer import Transformer
+import helpers
+from tap_activecampaign.datetimes import ActiveCampaignTransformer
+from tap_activecampaign.discover import discover
+from tap_activecampaign.streams import ContactTags, SyncContext
+
+class MockClient(helpers.MockClient):
+    """
+    Client returning `total` contact tags, one day apart
+    """
+    def __init__(self, total):
+        super().__init__()
+        self.total = total
+
+    def get_page(self, path, query):
+        offset, limit = int(query['offset']), int(query['limit'])
+        ids = range(offset + 1, min(offset + limit, self.total) + 1)
+        return {
+            'contactTags': [{'id': str(i), 'tag': '1', 'contact': str(i),
+                             'updatedTimestamp': '2021-{:02d}-{:02d}T00:00:00-05:00'.format(1 + i // 28 % 12, 1 + i % 28)} for i in ids],
+            'meta': {'total': str(self.total)}
+        }
+
+class TestSyncContext(unittest.TestCase):
+    """
+    Test that the schema, metadata and transformer are built once per stream sync
+    """
+    def sync_contact_tags(self, catalog):
+        stream = ContactTags(MockClient(250), {})
+        written, _ = helpers.sync_stream(stream, {'bookmarks': {'contact_tags': '2021-03-01T00:00:00Z'}}, catalog)
+        return stream, written
+
+    @mock.patch('tap_activecampaign.streams.ActiveCampaignTransformer', wraps=ActiveCampaignTransformer)
+    def test_one_transformer_per_sync(self, mock_transformer):
+        """
+        Test that one transformer and one schema lookup are used for all pages of a stream
+        """
+        catalog = discover()
+        with mock.patch.object(catalog, 'get_stream', wraps=catalog.get_stream) as mock_get_stream:
+            stream, written = self.sync_contact_tags(catalog)
+
+        self.assertEqual(mock_transformer.call_count, 1)
+        self.assertEqual(mock_get_stream.call_count, 1)
+        self.assertIsNone(stream.context)
+        self.assertTrue(written)
+
+    def test_records_match_fresh_transformer(self):
+        """
+        Test that the records written are the ones transformed by a new transformer for each record
+        """
+        catalog = discover()
+        _, written = self.sync_contact_tags(catalog)
+
+        context = SyncContext(catalog, 'contact_tags')
+        for record in written:
+            with Transformer() as transformer:
+                self.assertEqual(transformer.transform(dict(record), context.schema, context.metadata), record)
+            self.assertGreater(record['updated_timestamp'], '2021-03-01T00:00:00.000000Z')
@@ -0,0 +1,119 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import parse_qsl, urlsplit
+from tap_activecampaign import timing
+from tap_activecampaign.client import ActiveCampaignClient
+from tap_activecampaign.discover import discover
+from tap_activecampaign.sync import sync
+
+TOTAL = 150
+
+class Handler(BaseHTTPRequestHandler):
+    """ Local API answering pages of tags, after a 429 for the first page """
+    def do_GET(self):
+        query = dict(parse_qsl(urlsplit(self.path).query))
+        offset, limit = int(query.get('offset', 0)), int(query.get('limit', 100))
+        if offset == 0 and not self.server.throttled and 'limit' in query:
+            self.server.throttled = True
+            body, status = {'message': 'Too many requests'}, 429
+        else:
+            ids = range(offset + 1, min(offset + limit, TOTAL) + 1)
+            body, status = {'tags': [{'id': str(i), 'tag': 'tag {}'.format(i)} for i in ids],
+                            'meta': {'total': str(TOTAL)}}, 200
+        content = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+class TestTiming(unittest.TestCase):
+    """
+    Test that the time of each stage of a sync is summarized per stream and per run
+    """
+    def test_not_started(self):
+        """
+        Test that the timings are not collected outside of a sync
+        """
+        timing.add('tags', 'request', 1.0)
+        with timing.phase('tags', 'request'):
+            pass
+        self.assertIsNone(timing.TIMINGS)
+        self.assertIsNone(timing.stop())
+
+    def test_summary(self):
+        """
+        Test that phases of several threads are added up, and the run sums the streams
+        """
+        timings = timing.start()
+        self.addCleanup(timing.stop)
+        threads = [threading.Thread(target=timing.add, args=('tags', 'transform', 0.5), kwargs={'count': 10})
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        timing.add('tags', 'stream', 4.0)
+        timing.add_records('tags', 40)
+        timing.add('deals', 'transform', 1.0, count=5)
+        timing.add_bytes(None, 100)
+
+        streams, run = timings.get_summary()
+        tags = next(stream for stream in streams if stream['stream'] == 'tags')
+        self.assertEqual(tags['phases']['transform'], {'wall_seconds': 2.0, 'cpu_seconds': 0.0, 'count': 40})
+        self.assertEqual(tags['records_per_second'], 10.0)
+        self.assertEqual(run['phases']['transform']['count'], 45)
+        self.assertEqual(run['bytes_received'], 100)
+        self.assertEqual([stream['stream'] for stream in streams], [timing.NO_STREAM, 'deals', 'tags'])
+
+    @mock.patch('tap_activecampaign.writer.write_state')
+    @mock.patch('tap_activecampaign.writer.write_schema')
+    @mock.patch('tap_activecampaign.writer.write_record')
+    @mock.patch('time.sleep')
+    def test_sync_summary(self, mock_sleep, mock_write_record, mock_write_schema, mock_write_state):
+        """
+        Test that sync writes the summary of a stream: requests, waits, backoff, records, bytes and phases
+        """
+        server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        server.throttled = False
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'timing.json')
+
+        client = ActiveCampaignClient('http://127.0.0.1:{}'.format(server.server_port), 'dummy_token',
+                                      requests_per_second=5, burst=1)
+        client.rate_limiter.sleep = lambda seconds: None
+        catalog = discover()
+        catalog.get_selected_streams = lambda state: [catalog.get_stream('tags')]
+        with mock.patch.object(timing.LOGGER, 'info') as mock_info:
+            sync(client, {'start_date': '2021-01-01T00:00:00Z', 'timing_summary_path': path}, catalog, {})
+
+        with open(path) as summary_file:
+            summary = json.load(summary_file)
+        tags = summary['streams'][-1]
+        self.assertEqual(tags['stream'], 'tags')
+        self.assertEqual(tags['records'], TOTAL)
+        self.assertGreater(tags['bytes_received'], 0)
+        phases = tags['phases']
+        self.assertEqual(phases['request']['count'], 3) # 429, then 2 pages
+        self.assertEqual(phases['backoff_sleep']['count'], 1)
+        self.assertEqual(phases['process_records']['count'], 2)
+        for phase in ('prepare', 'transform', 'bookmark', 'write'):
+            self.assertEqual(phases[phase]['count'], TOTAL)
+        self.assertEqual(phases['rate_limit_wait']['count'], 2) # the first request has the burst token
+        self.assertEqual(summary['run']['records'], TOTAL)
+
+        lines = [call[0][0] for call in mock_info.call_args_list if call[0][0].startswith('TIMING: ')]
+        self.assertEqual([json.loads(line[len('TIMING: '):])['type'] for line in lines][-2:], ['stream', 'run'])
@@ -0,0 +1,86 @@
+import copy
+import json
+import unittest
+import humps
+from singer import Transformer, metadata
+from tap_activecampaign import transform
+from tap_activecampaign.discover import discover
+
+def sample_value(schema, depth=0):
+    """
+    Return a camelCase API value for the schema, with extra keys that are not in the schema
+    """
+    types = schema.get('type', [])
+    types = types if isinstance(types, list) else [types]
+    if 'anyOf' in schema:
+        return sample_value(next(sub_schema for sub_schema in schema['anyOf'] if sub_schema.get('type') != 'null'), depth)
+    if 'object' in types:
+        value = {humps.camelize(key): sample_value(sub_schema, depth + 1)
+                 for key, sub_schema in schema.get('properties', {}).items()}
+        value['notInSchema'] = {'nestedKey': [{'deepKey': 1}]}
+        return value
+    if 'array' in types:
+        return [sample_value(schema.get('items', {}), depth + 1) for _ in range(2)]
+    if schema.get('format') == 'date-time':
+        return '0000-00-00 00:00:00' if depth == 0 and len(types) > 1 else '2021-03-01 05:30:00'
+    if 'integer' in types:
+        return '12'
+    if 'number' in types:
+        return '1.5'
+    if 'boolean' in types:
+        return '1'
+    return 'someValue'
+
+def decamelize_with_humps(records):
+    converted = humps.decamelize(records)
+    for rec in converted:
+        transform.fix_record(rec)
+    return converted
+
+def prepare_records(records, schema=None):
+    """ Prepare the records like SyncContext.prepare """
+    date_keys = transform.get_date_keys(schema)
+    for rec in records:
+        transform.prepare_record(rec, schema, date_keys)
+    return records
+
+class TestPrepareRecord(unittest.TestCase):
+    """
+    Test that the in-place decamelization writes the same records as humps.decamelize
+    """
+    def test_same_records_for_all_schemas(self):
+        """
+        Test that each stream's records are identical, including the key order, after the Transformer
+        """
+        catalog = discover()
+        self.assertEqual(len(catalog.streams), 59)
+        for catalog_entry in catalog.streams:
+            schema = catalog_entry.schema.to_dict()
+            stream_metadata = metadata.to_map(catalog_entry.metadata)
+            record = sample_value(schema)
+            record['links'] = {'relatedKey': 'https://x'}
+            record['extraCamelKey'] = {'innerKey': 'value'}
+            records = [record, copy.deepcopy(record)]
+
+            expected = decamelize_with_humps(copy.deepcopy(records))
+            actual = prepare_records(records, schema)
+
+            with Transformer() as transformer:
+                expected_records = [transformer.transform(rec, schema, stream_metadata) for rec in expected]
+                actual_records = [transformer.transform(rec, schema, stream_metadata) for rec in actual]
+            self.assertEqual(json.dumps(actual_records), json.dumps(expected_records), catalog_entry.stream)
+
+    def test_same_output_without_schema(self):
+        """
+        Test that without a schema every nested key is decamelized, like humps.decamelize
+        """
+        records = [{'contactId': '1', 'fieldValues': [{'fieldId': '2', 'deepList': [[{'innerKey': 1}], 'x']}],
+                    'udate': '0000-00-00 00:00:00', 'cdate': '2021-03-01', 'links': {'contactTags': 'x'},
+                    'ID': 'upper', '123': 'numeric', 'snake_key': 1}]
+        expected = decamelize_with_humps(copy.deepcopy(records))
+        actual = prepare_records(records)
+
+        self.assertEqual(json.dumps(actual), json.dumps(expected))
+        self.assertIs(actual, records)
+        self.assertIsNone(actual[0]['udate'])
+        self.assertNotIn('links', actual[0])
@@ -0,0 +1,114 @@
+import gzip
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+import requests
+from tap_activecampaign import client
+
+BODY = json.dumps({'tags': [{'id': str(i), 'tag': 'tag {}'.format(i)} for i in range(100)],
+                   'meta': {'total': '100'}}).encode('utf-8')
+
+class Handler(BaseHTTPRequestHandler):
+    """ Local API answering gzipped pages over keep-alive connections, and 404 for `missing` """
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.ports.add(self.client_address[1])
+        self.server.headers.append(dict(self.headers))
+        if 'missing' in self.path:
+            body, status = json.dumps({'message': 'No Result found'}).encode('utf-8'), 404
+        else:
+            body, status = gzip.compress(BODY), 200
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        if status == 200:
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+class TestTransport(unittest.TestCase):
+    """
+    Test that the client pools and releases its connections and asks for compressed responses
+    """
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.ports = set()
+        self.server.headers = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.client = client.ActiveCampaignClient(
+            'http://127.0.0.1:{}'.format(self.server.server_port), 'dummy_token', 'test_ua')
+        self.addCleanup(self.client.__exit__, None, None, None)
+
+    def test_get_pool_size(self):
+        """
+        Test that the pool fits the requests that can run at once, unless `http_pool_size` is set
+        """
+        self.assertEqual(client.get_pool_size({}), client.DEFAULT_POOL_SIZE)
+        self.assertEqual(client.get_pool_size({'max_concurrent_streams': 4, 'max_concurrent_pages': '3',
+                                               'max_concurrent_children': 2}), 20)
+        self.assertEqual(client.get_pool_size({'http_pool_size': '3', 'max_concurrent_streams': 4}), 3)
+
+    def test_compressed_pages_reuse_one_connection(self):
+        """
+        Test that gzipped pages are decoded, counted on the wire and decoded, and read over one connection
+        """
+        for data_key in (None, 'tags', None):
+            page = self.client.get('tags', params='offset=0', data_key=data_key)
+            self.assertEqual(len(page['tags']), 100)
+
+        self.assertEqual(len(self.server.ports), 1)
+        self.assertIn('gzip', self.server.headers[-1]['Accept-Encoding'])
+        self.assertEqual(self.server.headers[-1]['Api-Token'], 'dummy_token')
+        stats = self.client.transport_stats
+        self.assertEqual(stats.responses, 4)
+        self.assertEqual(stats.decoded_bytes, 4 * len(BODY))
+        self.assertLess(stats.wire_bytes, stats.decoded_bytes / 5)
+
+    def test_error_response_is_released(self):
+        """
+        Test that the connection of an error response returns to the pool
+        """
+        self.client.get('tags')
+        with self.assertRaises(client.ActiveCampaignNotFoundError):
+            self.client.get('missing')
+        self.client.get('tags')
+        self.assertEqual(len(self.server.ports), 1)
+
+    @mock.patch('requests.Response.close')
+    @mock.patch('requests.Session.request')
+    def test_invalid_json_is_released(self, mocked_request, mocked_close):
+        """
+        Test that a response whose body is not valid JSON is closed
+        """
+        response = requests.Response()
+        response.status_code = 200
+        response._content = b'{"tags": [unterminated'
+        mocked_request.return_value = response
+        with mock.patch.object(client.ActiveCampaignClient, 'check_api_token', return_value=True):
+            with self.assertRaises(Exception):
+                self.client.get('tags')
+        self.assertEqual(mocked_close.call_count, 1)
+
+    @mock.patch('requests.Session.request', return_value=mock.Mock(status_code=304, headers={}))
+    def test_static_headers(self, mocked_request):
+        """
+        Test that the headers are built once, and the headers of a request are added to them
+        """
+        with mock.patch.object(client.ActiveCampaignClient, 'check_api_token', return_value=True):
+            self.client.get_conditional('tags', 'offset=0', etag='"v1"')
+            self.client.get_conditional('tags', 'offset=0')
+            self.client.get_conditional('tags', 'offset=100')
+
+        first, second, third = [call[1]['headers'] for call in mocked_request.call_args_list]
+        self.assertEqual(first, {'Api-Token': 'dummy_token', 'Accept': 'application/json',
+                                 'User-Agent': 'test_ua', 'If-None-Match': '"v1"'})
+        self.assertEqual(second, {'Api-Token': 'dummy_token', 'Accept': 'application/json', 'User-Agent': 'test_ua'})
+        self.assertEqual(second, third)